@@ -0,0 +1,201 @@
+"""Cobertura de estocagem e suprimento de todos os OPs, vetorizada com NumPy.
+
+``carregar_base`` lê as colunas numéricas de ``orgao_provedor`` uma única vez
+para arrays (uma posição por OP); ``calcular`` deriva deles, de uma vez para
+todos os OPs, o suprimento estimado pelo efetivo, a cobertura (capacidade ÷
+fator de consumo), os déficits, as razões FC/FS e o ranking de criticidade.
+Os percentuais de ``calcular`` simulam cenários (ex.: efetivo +20%) sobre a
+mesma base, servidos por ``/api/analise/simulacao``.
+"""
+import numpy as np
+
+# Suprimento mensal estimado por militar apoiado (ton/dia x dias úteis)
+FATOR_SUPRIMENTO_FRIGO = 0.0004
+FATOR_SUPRIMENTO_SECOS = 0.00055
+DIAS_SUPRIMENTO = 22
+
+# Metas de cobertura, em fatores de consumo mensais
+COBERTURA_MIN_ESTOQUE = 3
+COBERTURA_MIN_FRIGO = 4
+
+# Limites aceitos para os percentuais da simulação
+VARIACAO_MIN = -90.0
+VARIACAO_MAX = 500.0
+
+
+def suprimento_estimado(efetivo):
+    """(frigorificados, secos) mensais estimados para o efetivo, em toneladas."""
+    return (round(efetivo * FATOR_SUPRIMENTO_FRIGO * DIAS_SUPRIMENTO, 2),
+            round(efetivo * FATOR_SUPRIMENTO_SECOS * DIAS_SUPRIMENTO, 2))
+
+
+class BaseCapacidade:
+    """Colunas numéricas dos OPs em arrays alinhados (NULL vira 0)."""
+
+    CAMPOS = {
+        'efetivo': 'efetivo_atendimento',
+        'consumo_secos': 'consumo_secos_mensal',
+        'consumo_frigo': 'consumo_frigorificados_mensal',
+        'suprimento_secos': 'suprimento_secos_mensal',
+        'suprimento_frigo': 'suprimento_frigorificados_mensal',
+        'capacidade_seco': 'capacidade_total_toneladas',
+        'capacidade_frigo': 'capacidade_total_toneladas_seco',
+        'area_disponivel': 'area_edificavel_disponivel',
+    }
+
+    def __init__(self, ids, siglas, subordinacoes, colunas):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.siglas = list(siglas)
+        self.subordinacoes = np.asarray(list(subordinacoes), dtype=object)
+        for nome, valores in colunas.items():
+            setattr(self, nome, np.asarray(valores, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mascara(self, ids=None, subordinacao=None):
+        """Seleção booleana por ids de OP e/ou subordinação."""
+        selecao = np.ones(len(self), dtype=bool)
+        if ids is not None:
+            selecao &= np.isin(self.ids, list(ids))
+        if subordinacao:
+            selecao &= self.subordinacoes == subordinacao
+        return selecao
+
+
+def carregar_base(db, efetivo_automatico=None):
+    """Lê ``orgao_provedor`` para uma ``BaseCapacidade``.
+
+    ``efetivo_automatico(sigla)``, se informado, supre o efetivo dos OPs sem
+    efetivo salvo (mesma regra de ``visualizar_orgao``).
+    """
+    colunas_sql = ', '.join(BaseCapacidade.CAMPOS.values())
+    rows = db.execute(f'''
+        SELECT id, sigla, nome, subordinacao, {colunas_sql}
+        FROM orgao_provedor ORDER BY id
+    ''').fetchall()
+    colunas = {nome: [r[coluna] or 0 for r in rows] for nome, coluna in BaseCapacidade.CAMPOS.items()}
+    if efetivo_automatico is not None:
+        colunas['efetivo'] = [valor or efetivo_automatico(r['sigla'] or r['nome'] or '') or 0
+                              for valor, r in zip(colunas['efetivo'], rows)]
+    return BaseCapacidade([r['id'] for r in rows], [r['sigla'] or r['nome'] for r in rows],
+                          [r['subordinacao'] for r in rows], colunas)
+
+
+def _dividir(numerador, denominador):
+    """numerador / denominador, com 0 onde o denominador é 0."""
+    return np.divide(numerador, denominador, out=np.zeros_like(numerador), where=denominador > 0)
+
+
+def _ranking(valores, validos):
+    """Posição (1 = mais crítico) pelo menor valor; inválidos ficam no fim."""
+    chave = np.where(validos, valores, np.inf)
+    ordem = np.argsort(chave, kind='stable')
+    posicoes = np.empty(len(valores), dtype=np.int64)
+    posicoes[ordem] = np.arange(1, len(valores) + 1)
+    return posicoes
+
+
+def calcular(base, efetivo=0.0, consumo=0.0, capacidade=0.0):
+    """Métricas de todos os OPs da base, opcionalmente num cenário simulado.
+
+    ``efetivo``, ``consumo`` e ``capacidade`` são variações percentuais. O
+    fator de consumo acompanha o efetivo apoiado (consumo por militar
+    constante) e ainda pode variar por ``consumo``; o suprimento declarado é
+    mantido e só o estimado pelo efetivo acompanha a variação.
+    """
+    fator_efetivo = 1 + efetivo / 100
+    fator_consumo = fator_efetivo * (1 + consumo / 100)
+    fator_capacidade = 1 + capacidade / 100
+
+    efetivo_op = base.efetivo * fator_efetivo
+    consumo_secos = base.consumo_secos * fator_consumo
+    consumo_frigo = base.consumo_frigo * fator_consumo
+    capacidade_seco = base.capacidade_seco * fator_capacidade
+    capacidade_frigo = base.capacidade_frigo * fator_capacidade
+
+    # Suprimento não informado (0/NULL) é estimado pelo efetivo
+    suprimento_frigo = np.where(base.suprimento_frigo > 0, base.suprimento_frigo,
+                                efetivo_op * FATOR_SUPRIMENTO_FRIGO * DIAS_SUPRIMENTO)
+    suprimento_secos = np.where(base.suprimento_secos > 0, base.suprimento_secos,
+                                efetivo_op * FATOR_SUPRIMENTO_SECOS * DIAS_SUPRIMENTO)
+
+    cobertura_secos = _dividir(capacidade_seco, consumo_secos)
+    cobertura_frigo = _dividir(capacidade_frigo, consumo_frigo)
+    com_consumo_frigo = consumo_frigo > 0
+    return {
+        'efetivo': efetivo_op,
+        'consumo_secos': consumo_secos,
+        'consumo_frigo': consumo_frigo,
+        'suprimento_secos': suprimento_secos,
+        'suprimento_frigo': suprimento_frigo,
+        'capacidade_seco': capacidade_seco,
+        'capacidade_frigo': capacidade_frigo,
+        'cobertura_secos': cobertura_secos,
+        'cobertura_frigo': cobertura_frigo,
+        'estoque_ok': (cobertura_secos >= COBERTURA_MIN_ESTOQUE) & (cobertura_frigo >= COBERTURA_MIN_ESTOQUE),
+        # Déficit apenas quando existe consumo declarado (mesma regra de op_analytics)
+        'deficit_frigo': com_consumo_frigo & (cobertura_frigo < COBERTURA_MIN_FRIGO),
+        'falta_frigo_ton': np.where(com_consumo_frigo,
+                                    np.maximum(COBERTURA_MIN_FRIGO * consumo_frigo - capacidade_frigo, 0), 0),
+        'consumo_suprimento_secos': _dividir(consumo_secos, suprimento_secos) * 100,
+        'consumo_suprimento_frigo': _dividir(consumo_frigo, suprimento_frigo) * 100,
+        'saldo_secos': suprimento_secos - consumo_secos,
+        'saldo_frigo': suprimento_frigo - consumo_frigo,
+        'ranking_frigo': _ranking(cobertura_frigo, com_consumo_frigo),
+        'tem_area': base.area_disponivel > 0,
+    }
+
+
+def resumir(metricas, selecao):
+    """Totais e contagens das métricas nos OPs selecionados."""
+    cobertura = metricas['cobertura_frigo'][selecao & (metricas['consumo_frigo'] > 0)]
+    return {
+        'ops': int(selecao.sum()),
+        'efetivo': float(metricas['efetivo'][selecao].sum()),
+        'consumo_secos': float(metricas['consumo_secos'][selecao].sum()),
+        'consumo_frigo': float(metricas['consumo_frigo'][selecao].sum()),
+        'suprimento_secos': float(metricas['suprimento_secos'][selecao].sum()),
+        'suprimento_frigo': float(metricas['suprimento_frigo'][selecao].sum()),
+        'ops_estoque_ok': int(metricas['estoque_ok'][selecao].sum()),
+        'ops_deficit_frigo': int(metricas['deficit_frigo'][selecao].sum()),
+        'falta_frigo_ton': float(metricas['falta_frigo_ton'][selecao].sum()),
+        'cobertura_frigo_mediana': float(np.median(cobertura)) if cobertura.size else 0.0,
+    }
+
+
+def _valores_op(metricas, i):
+    valores = {}
+    for nome, array in metricas.items():
+        valor = array[i]
+        if array.dtype == bool:
+            valores[nome] = bool(valor)
+        elif np.issubdtype(array.dtype, np.integer):
+            valores[nome] = int(valor)
+        else:
+            valores[nome] = round(float(valor), 2)
+    return valores
+
+
+def simular(base, selecao, efetivo=0.0, consumo=0.0, capacidade=0.0):
+    """Cenário atual x simulado para os OPs selecionados, dos mais críticos aos menos."""
+    atual = calcular(base)
+    simulado = calcular(base, efetivo=efetivo, consumo=consumo, capacidade=capacidade)
+    indices = np.flatnonzero(selecao)
+    indices = indices[np.argsort(simulado['ranking_frigo'][indices], kind='stable')]
+    ops = []
+    for i in indices:
+        ops.append({
+            'id': int(base.ids[i]),
+            'sigla': base.siglas[i],
+            'subordinacao': base.subordinacoes[i],
+            'atual': _valores_op(atual, i),
+            'simulado': _valores_op(simulado, i),
+            'entra_em_deficit': bool(simulado['deficit_frigo'][i] and not atual['deficit_frigo'][i]),
+            'sai_do_deficit': bool(atual['deficit_frigo'][i] and not simulado['deficit_frigo'][i]),
+        })
+    return {
+        'parametros': {'efetivo': efetivo, 'consumo': consumo, 'capacidade': capacidade},
+        'resumo': {'atual': resumir(atual, selecao), 'simulado': resumir(simulado, selecao)},
+        'ops': ops,
+    }
@@ -1,21 +1,30 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_from_directory, flash, session, send_file, Response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, send_from_directory, flash, session, send_file, Response, g, has_request_context, before_render_template, stream_with_context
 import os
 import logging
 from logging.handlers import RotatingFileHandler
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+from werkzeug.local import LocalProxy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import database
+import indicadores
+import cache_painel
+import listagem_ops
+import analise_capacidade
+import historico_indicadores
+import relatorio_csv
+import exportacao_xlsx
+import backup_banco
+import tarefas
+import dados_referencia
+from dados_referencia import normalizar_sigla_chave
 from datetime import datetime
 import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 import functools
-import pandas as pd
 import unicodedata
-import io
-import shutil
-import tempfile
+import time
 
 app = Flask(__name__)
 
@@ -121,6 +130,7 @@ def delete_foto(foto_id):
         caminho = row['caminho_arquivo']
         full_path = os.path.join(app.config['UPLOAD_FOLDER'], caminho.replace('/', os.sep))
         db.execute('DELETE FROM fotos WHERE id = ?', (foto_id,))
+        database.incrementar_versao_dados(db)
         db.commit()
         if os.path.exists(full_path):
             try:
@@ -183,121 +193,100 @@ ESPECIALIDADES = [
     'Administrativo', 'Saneamento', 'Suprimento', 'Contabilidade', 'Informática', 'Direito', 'Farmácia', 'Dentista', 'Mecânica Automotiva', 'Mecânica de Armamento', 'Mecânico Operador', 'Outro'
 ]
 
-# Carregar dados do CODOM.xlsx
-def carregar_dados_codom():
-    """Carrega os dados do arquivo CODOM.xlsx"""
+def migrar_banco():
+    """Aplica as migrações pendentes numa conexão própria (fora do pool)."""
+    conn = database.conectar()
     try:
-        # Lê o arquivo Excel
-        df = pd.read_excel('CODOM.xlsx', engine='openpyxl')
-        
-        # Criar dicionário de mapeamento para OMs
-        dados_oms = {}
-        # Criar dicionário de mapeamento para UG/CODOM por sigla
-        dados_ug_codom = {}
-        # Criar dicionário de mapeamento CODOM -> Subordinação (se presente na planilha)
-        dados_subordinacao = {}
-        
-        for _, row in df.iterrows():
-            sigla = str(row.get('SIGLA', '')).strip()
-            codom = str(row.get('CODOM', '')).strip()
-            ug = str(row.get('UG', '')).strip()
-            subordinacao = ''
-            # Tentar ler coluna 'SUBORDINACAO' ou 'SUBORDINAÇÃO' (variações na planilha)
-            if 'SUBORDINACAO' in row.index:
-                subordinacao = str(row.get('SUBORDINACAO', '')).strip()
-            elif 'SUBORDINAÇÃO' in row.index:
-                subordinacao = str(row.get('SUBORDINAÇÃO', '')).strip()
-            
-            # Adicionar à lista de OMs para seleção
-            if sigla and sigla != 'nan' and sigla not in dados_oms:
-                dados_oms[sigla] = {
-                    'CODOM': codom,
-                    'UG': ug,
-                    'SUBORDINACAO': subordinacao
-                }
-            
-            # Mapear UG/CODOM/Subordinação por sigla (último valor encontrado)
-            if sigla and sigla != 'nan':
-                dados_ug_codom[sigla] = {
-                    'CODOM': codom,
-                    'UG': ug,
-                    'SUBORDINACAO': subordinacao
-                }
-            
-            # Mapear CODOM -> Subordinação para buscas diretas
-            if codom and codom != 'nan' and subordinacao:
-                dados_subordinacao[codom] = subordinacao
-        
-        return dados_oms, dados_ug_codom, dados_subordinacao
+        database.migrar(conn)
     except Exception as e:
-        print(f"Erro ao carregar CODOM.xlsx: {e}")
-        return {}, {}, {}
+        print(f"✗ Erro ao migrar banco de dados: {e}")
+        raise
+    finally:
+        conn.close()
 
 
-def normalizar_sigla_chave(valor):
-    """Normaliza siglas para comparações tolerantes."""
-    if valor is None:
-        return ''
-    texto = ''.join(c for c in unicodedata.normalize('NFKD', str(valor)) if not unicodedata.combining(c))
-    texto = texto.upper().replace('º', '').replace('ª', '')
-    texto = ' '.join(texto.split())
-    return texto
+# Schema em dia ao importar o app, também sob o gunicorn (wsgi.py): com o banco
+# atualizado, custa uma leitura de PRAGMA user_version por boot de worker
+migrar_banco()
 
+def sincronizar_efetivo_referencia(referencias):
+    """Regrava ``orgao_provedor.efetivo_referencia`` a partir de uma carga de referência.
 
-def carregar_dados_vinculo_efetivo():
-    """Carrega vínculos (Vinculo_OM) e efetivos (Efetivo) do arquivo Dados.xlsx."""
+    A coluna guarda o efetivo que o painel mostra para OPs sem efetivo declarado,
+    para a listagem ordenar pelo mesmo valor que exibe (listagem_ops.ORDENACOES).
+    Roda no boot e na thread de recarga, numa conexão própria (fora do pool);
+    cargas incompletas são ignoradas para não zerar a coluna.
+    """
+    if not referencias.completa:
+        return
+    conn = database.conectar()
     try:
-        xl = pd.ExcelFile('Dados.xlsx', engine='openpyxl')
-        df_vinculo = xl.parse('Vinculo_OM')
-        df_efetivo = xl.parse('Efetivo')
+        alteradas = database.gravar_efetivo_referencia(
+            conn, lambda sigla: referencias.dados_automaticos_op(sigla).get('efetivo_total', 0))
+        if alteradas:
+            # Exportações em cache (tarefas.py) são chaveadas pela versão dos dados
+            database.incrementar_versao_dados(conn)
+        conn.commit()
     except Exception as e:
-        print(f"Erro ao carregar Dados.xlsx: {e}")
-        return {}, {}, {}
-
-    vinculo_por_op = {}
-    efetivo_por_om = {}
-    rm_por_op = {}
-
-    # Mapeia OMs apoiadas por OP (usando chave normalizada)
-    for _, row in df_vinculo.iterrows():
-        om_sigla = str(row.get('SIGLA OM', '')).strip()
-        op_sigla = str(row.get('SIGLA OM VINC OP', '')).strip()
-        cod_om = str(row.get('COD OM', '')).strip()
-        ug_om = str(row.get('COD UG', '')).strip()
-        codom_op = str(row.get('COD OM VINC OP', '')).strip()
-        ug_op = str(row.get('COD UG VINC OP', '')).strip()
-        rm = str(row.get('RM', '')).strip()
-
-        chave_op = normalizar_sigla_chave(op_sigla)
-        if chave_op and om_sigla:
-            vinculo_por_op.setdefault(chave_op, []).append({
-                'sigla': om_sigla,
-                'codom': cod_om,
-                'ug': ug_om,
-                'codom_op': codom_op,
-                'ug_op': ug_op
-            })
-
-        if chave_op and rm:
-            rm_por_op[chave_op] = rm
-
-    # Mapeia efetivo médio por OM (chave normalizada)
-    for _, row in df_efetivo.iterrows():
-        om_sigla = str(row.get('SIGLA OM', '')).strip()
-        chave_om = normalizar_sigla_chave(om_sigla)
-        efetivo = row.get('MEDIA EFETIVO ATIVA')
-        if chave_om and pd.notna(efetivo):
-            try:
-                efetivo_por_om[chave_om] = int(float(efetivo))
-            except Exception:
-                continue
+        conn.rollback()
+        print(f"✗ Erro ao atualizar efetivo de referência das OPs: {e}")
+        return
+    finally:
+        conn.close()
+    if alteradas:
+        print(f"✓ Efetivo de referência atualizado em {alteradas} OP(s) (versão {referencias.versao})")
+
+
+# Dados de referência (CODOM.xlsx / Dados.xlsx): snapshot compilado no boot e recarga
+# automática quando as planilhas mudam, sem reiniciar o worker
+_inicio_referencias = time.perf_counter()
+REFERENCIAS = dados_referencia.ReferenciasRecarregaveis(ao_recarregar=sincronizar_efetivo_referencia)
+print(f"✓ Dados de referência carregados ({REFERENCIAS.carregar().origem}) em "
+      f"{(time.perf_counter() - _inicio_referencias) * 1000:.0f} ms")
+sincronizar_efetivo_referencia(REFERENCIAS.atual())
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REFERENCIAS.reiniciar_apos_fork)
+
+
+def referencias_atuais():
+    """Carga de referência da requisição atual (a mesma do início ao fim da requisição)."""
+    if has_request_context():
+        if 'referencias' not in g:
+            g.referencias = REFERENCIAS.atual()
+        return g.referencias
+    return REFERENCIAS.atual()
+
+
+@app.before_request
+def verificar_referencias():
+    REFERENCIAS.verificar_alteracoes()
+
 
-    return vinculo_por_op, efetivo_por_om, rm_por_op
+def efetivo_automatico_op(sigla_op):
+    """Efetivo das OMs apoiadas pela OP segundo as planilhas de referência."""
+    return referencias_atuais().dados_automaticos_op(sigla_op or '').get('efetivo_total', 0) or 0
 
-# Carregar dados ao iniciar
-DADOS_OMS, DADOS_UG_CODOM, DADOS_SUBORDINACAO = carregar_dados_codom()
-LISTA_OMS = sorted(DADOS_OMS.keys())
-DADOS_VINCULO_OP, DADOS_EFETIVO_OM, DADOS_RM_OP = carregar_dados_vinculo_efetivo()
+
+# Snapshot diário dos indicadores (histórico das tendências), disparado pelas
+# próprias requisições a partir de SNAPSHOT_HORARIO; o cron pode usar
+# ``python historico_indicadores.py registrar`` no lugar
+SNAPSHOTS = historico_indicadores.AgendadorSnapshot()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=SNAPSHOTS.reiniciar_apos_fork)
+
+# Exportações pesadas e backups em segundo plano (/admin/jobs), fora da thread
+# da requisição; o resultado fica em disco e serve pedidos idênticos
+TAREFAS = tarefas.ExecutorTarefas()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=TAREFAS.reiniciar_apos_fork)
+
+
+@app.before_request
+def verificar_snapshot_diario():
+    SNAPSHOTS.verificar()
 
 # Mapa canônico de postos/graduações para exibição ordenada
 POSTO_MAP = {
@@ -356,93 +345,69 @@ def find_orgao_existente(nome, sigla):
 
 def get_oms_apoiadas_por_op(sigla_op):
     chave = normalizar_sigla_chave(sigla_op)
-    return DADOS_VINCULO_OP.get(chave, [])
+    return referencias_atuais().DADOS_VINCULO_OP.get(chave, [])
 
 
 def get_dados_automaticos_op(sigla_op):
-    alvo_sigla = normalizar_sigla_chave(sigla_op)
-    if not alvo_sigla:
-        return {
-            'oms_apoiadas': [],
-            'oms_detalhes': [],
-            'efetivo_total': 0,
-            'efetivos_por_om': {},
-            'subordinacao': ''
-        }
-
-    oms = get_oms_apoiadas_por_op(sigla_op)
-    efetivo_total = 0
-    efetivos_por_om = {}
-    oms_detalhes = []
-
-    for om in oms:
-        sigla_om = (om.get('sigla') or '').strip()
-        if not sigla_om:
-            continue
-
-        chave_om = normalizar_sigla_chave(sigla_om)
-        efetivo_val = DADOS_EFETIVO_OM.get(chave_om)
-        if efetivo_val is not None:
-            try:
-                efetivo_val = int(efetivo_val)
-            except Exception:
-                efetivo_val = 0
-            efetivos_por_om[sigla_om] = efetivo_val
-            efetivo_total += efetivo_val
-
-        detalhes = dict(om)
-        detalhes['sigla'] = sigla_om
-        dados_codom = DADOS_UG_CODOM.get(sigla_om) or DADOS_UG_CODOM.get(chave_om) or {}
-        detalhes.update(dados_codom)
-        oms_detalhes.append(detalhes)
-
-    subordinacao = ''
-    dados_op = DADOS_UG_CODOM.get(sigla_op) or DADOS_UG_CODOM.get(alvo_sigla) or {}
-    subordinacao = dados_op.get('SUBORDINACAO') or dados_op.get('SUBORDINAÇÃO') or ''
-    if not subordinacao:
-        subordinacao = DADOS_RM_OP.get(alvo_sigla, '')
+    """OMs apoiadas, efetivo e subordinação da OP segundo as planilhas de referência.
 
-    return {
-        'oms_apoiadas': [om.get('sigla') for om in oms if om.get('sigla')],
-        'oms_detalhes': oms_detalhes,
-        'efetivo_total': efetivo_total,
-        'efetivos_por_om': efetivos_por_om,
-        'subordinacao': subordinacao
-    }
+    Pré-calculado na carga das referências e memorizado por sigla; o resultado é
+    imutável (MappingProxyType/tuplas) e compartilhado entre requisições.
+    """
+    return referencias_atuais().dados_automaticos_op(sigla_op or '')
 
 # Função para obter UG e CODOM baseado na sigla (MELHORADA)
 def get_ug_codom(sigla):
-    # Normaliza usando helper que remove acentos e espaços duplicados
-    sigla_normalizada = normalizar_sigla_chave(sigla)
+    # Normaliza usando helper que remove acentos e espaços duplicados; o índice devolve
+    # a primeira sigla igual, contida ou que contém a busca (mesma ordem da planilha)
+    resultado = referencias_atuais().indice_siglas.buscar(normalizar_sigla_chave(sigla))
+    return resultado if resultado is not None else {'UG': '', 'CODOM': ''}
+
+# Listas usadas só por alguns templates: entram no contexto apenas na renderização
+# dos templates que as declaram em CONTEXTO_POR_TEMPLATE. Registre aqui (com
+# o template) o valor de que um template passar a precisar.
+PROVEDORES_CONTEXTO = {
+    'ARMA_QUADROS': lambda: ARMA_QUADROS,
+    'ESPECIALIDADES': lambda: ESPECIALIDADES,
+}
+
+# Template -> nomes de PROVEDORES_CONTEXTO de que ele precisa (includes e
+# templates base herdam o contexto do template renderizado)
+CONTEXTO_POR_TEMPLATE = {
+    'cadastro_op.html': ('ARMA_QUADROS', 'ESPECIALIDADES'),
+}
 
-    for key, value in DADOS_UG_CODOM.items():
-        key_normalizada = normalizar_sigla_chave(key)
-        if sigla_normalizada == key_normalizada:
-            return value
-        if sigla_normalizada in key_normalizada or key_normalizada in sigla_normalizada:
-            return value
 
-    return {'UG': '', 'CODOM': ''}
+def _valor_preguicoso(calcular):
+    """Proxy que chama ``calcular`` no primeiro acesso e reaproveita o resultado."""
+    valor = []
+
+    def obter():
+        if not valor:
+            valor.append(calcular())
+        return valor[0]
+    return LocalProxy(obter)
+
 
 # Adicione ao contexto do template
 @app.context_processor
 def utility_processor():
+    # Apenas helpers baratos; 'now' só é calculado se o template o usar
     return dict(
         get_posto_display=get_posto_display,
         get_sigla_orgao=get_sigla_orgao,
         get_ug_codom=get_ug_codom,
         ORGÃOS_PROVEDORES=ORGÃOS_PROVEDORES,
-        DADOS_OMS=DADOS_OMS,
-        DADOS_UG_CODOM=DADOS_UG_CODOM,
-        DADOS_SUBORDINACAO=DADOS_SUBORDINACAO,
-        LISTA_OMS=LISTA_OMS,
-        POSTO_MAP=POSTO_MAP,
-        POSTO_KEYS=POSTO_KEYS,
-        ARMA_QUADROS=ARMA_QUADROS,
-        ESPECIALIDADES=ESPECIALIDADES,
-        now=datetime.now()
+        now=_valor_preguicoso(datetime.now)
     )
 
+
+@before_render_template.connect_via(app)
+def contexto_do_template(sender, template, context, **extra):
+    for nome in CONTEXTO_POR_TEMPLATE.get(template.name, ()):
+        if nome not in context:
+            context[nome] = PROVEDORES_CONTEXTO[nome]()
+
 # Rota para buscar UG/CODOM via AJAX
 @app.route('/api/buscar_ug_codom')
 def api_buscar_ug_codom():
@@ -450,9 +415,108 @@ def api_buscar_ug_codom():
     resultado = get_ug_codom(sigla)
     return jsonify(resultado)
 
+# Autocomplete do catálogo de OMs (paginado e ordenado por relevância)
+@app.route('/api/oms/buscar')
+@login_required
+def api_buscar_oms():
+    indice = referencias_atuais().indice_oms
+
+    # ?siglas=A,B devolve os dados exatos dessas OMs (pré-seleção no formulário)
+    siglas = request.args.get('siglas')
+    if siglas is not None:
+        lista = [s.strip() for s in siglas.split(',') if s.strip()]
+        itens = indice.obter(lista)
+        return jsonify({'total': len(itens), 'resultados': itens})
+
+    q = request.args.get('q', '')
+    pagina = max(request.args.get('pagina', 1, type=int) or 1, 1)
+    por_pagina = min(max(request.args.get('por_pagina', 50, type=int) or 50, 1), 200)
+    total, itens = indice.buscar(q, pagina, por_pagina)
+    return jsonify({
+        'q': q,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total': total,
+        'tem_mais': pagina * por_pagina < total,
+        'resultados': itens
+    })
+
+# Máximo de siglas por chamada em /api/om/provedores
+LIMITE_LOTE_PROVEDORES = int(os.getenv('LIMITE_LOTE_PROVEDORES', '1000'))
+
+
+def montar_provedores_cadastro(db):
+    """OM (chave normalizada) -> OPs cadastradas cujo histórico a lista."""
+    indice = {}
+    for r in db.execute('''
+        SELECT DISTINCT l.chave_om, o.id, o.sigla, o.nome
+        FROM op_om_apoiada l
+        JOIN orgao_provedor o ON o.id = l.op_id
+        WHERE l.chave_om != ''
+        ORDER BY o.id
+    '''):
+        indice.setdefault(r['chave_om'], []).append({'id': r['id'], 'sigla': r['sigla'] or '', 'nome': r['nome'] or ''})
+    return indice
+
+
+def get_provedores_om(siglas):
+    """Para cada OM, as OPs que a apoiam segundo o cadastro (histórico) e a planilha Vinculo_OM."""
+    db = database.get_db()
+    cadastro = cache_painel.painel.obter_ou_calcular(
+        ('provedores_cadastro', database.versao_dados(db)), lambda: montar_provedores_cadastro(db))
+    planilha = referencias_atuais().provedores_por_om
+
+    resultados = []
+    for sigla in siglas:
+        chave_om = normalizar_sigla_chave(sigla)
+        provedores = {}
+        for op in cadastro.get(chave_om, ()):
+            provedores[normalizar_sigla_chave(op['sigla'] or op['nome'])] = {
+                'id': op['id'], 'sigla': op['sigla'], 'nome': op['nome'],
+                'codom_op': '', 'ug_op': '', 'fontes': ['cadastro']
+            }
+        for vinculo in planilha.get(chave_om, ()):
+            item = provedores.get(vinculo['op'])
+            if item is None:
+                item = provedores[vinculo['op']] = {
+                    'id': None, 'sigla': vinculo['op'], 'nome': '',
+                    'codom_op': '', 'ug_op': '', 'fontes': []
+                }
+            item['codom_op'] = vinculo['codom_op']
+            item['ug_op'] = vinculo['ug_op']
+            item['fontes'].append('planilha')
+        resultados.append({'sigla': sigla, 'provedores': list(provedores.values())})
+    return resultados
+
+
+# OPs que apoiam uma OM
+@app.route('/api/om/<path:sigla>/provedores')
+@login_required
+def api_provedores_om(sigla):
+    return jsonify(get_provedores_om([sigla])[0])
+
+
+# Mesma consulta em lote: GET ?siglas=A,B ou POST {"siglas": [...]}
+@app.route('/api/om/provedores', methods=['GET', 'POST'])
+@login_required
+def api_provedores_oms():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        siglas = data.get('siglas') or []
+        if not isinstance(siglas, list):
+            return jsonify({'error': 'Informe "siglas" como uma lista'}), 400
+    else:
+        siglas = request.args.get('siglas', '').split(',')
+    siglas = [str(s).strip() for s in siglas if str(s).strip()]
+    if len(siglas) > LIMITE_LOTE_PROVEDORES:
+        return jsonify({'error': f'Máximo de {LIMITE_LOTE_PROVEDORES} siglas por consulta'}), 400
+
+    resultados = get_provedores_om(siglas)
+    return jsonify({'total': len(resultados), 'resultados': resultados})
+
 # Helper para obter subordinação por CODOM
 def get_subordinacao_by_codom(codom):
-    return DADOS_SUBORDINACAO.get(str(codom).strip()) if codom else None
+    return referencias_atuais().DADOS_SUBORDINACAO.get(str(codom).strip()) if codom else None
 
 # Rota para buscar Subordinação via CODOM
 @app.route('/api/buscar_subordinacao')
@@ -469,7 +533,7 @@ def api_op_dados_automaticos():
         return jsonify({'oms_apoiadas': [], 'oms_detalhes': [], 'efetivo_total': 0, 'efetivos_por_om': {}, 'subordinacao': ''})
 
     dados = get_dados_automaticos_op(sigla_op)
-    return jsonify(dados)
+    return jsonify(dados_referencia.descongelar(dados))
 
 # Rota de login
 @app.route('/login', methods=['GET', 'POST'])
@@ -569,7 +633,11 @@ def excluir_orgao(id):
         db.execute('DELETE FROM pessoal WHERE orgao_provedor_id = ?', (id,))
 
         # Orgao
+        db.execute('DELETE FROM op_om_apoiada WHERE op_id = ?', (id,))
+        db.execute('DELETE FROM op_classe_provedor WHERE op_id = ?', (id,))
+        indicadores.remover_indicadores_op(db, id)
         db.execute('DELETE FROM orgao_provedor WHERE id = ?', (id,))
+        database.incrementar_versao_dados(db)
         db.commit()
         flash(f"Órgão Provedor '{orgao['nome']}' excluído com sucesso.", 'success')
     except Exception as e:
@@ -620,6 +688,225 @@ def criar_usuario_admin():
         db.commit()
         print("✓ Usuário admin criado. Login: admin / Senha: admin123 (Perfil: Administrador)")
 
+def montar_painel_admin(db):
+    """Lista de OPs e agregados exibidos no painel do admin."""
+    try:
+        orgaos_rows = db.execute('''
+            SELECT o.*, u.username as criado_por_nome 
+            FROM orgao_provedor o
+            LEFT JOIN usuarios u ON o.criado_por = u.id
+            ORDER BY o.data_cadastro DESC
+        ''').fetchall()
+    except Exception as e:
+        print(f"Erro na consulta: {e}")
+        # Fallback se houver erro
+        orgaos_rows = db.execute('SELECT * FROM orgao_provedor ORDER BY data_cadastro DESC').fetchall()
+
+    # Converter sqlite3.Row para dict e enriquecer com contagem de OMs
+    oms_por_op = dict(db.execute('SELECT op_id, COUNT(*) FROM op_om_apoiada GROUP BY op_id').fetchall())
+    orgaos = []
+    for r in orgaos_rows:
+        d = dict(r)
+        d['oms_count'] = oms_por_op.get(d['id'], 0)
+        d['efetivo_atendimento'] = d.get('efetivo_atendimento') or 0
+
+        # Se não há histórico ou efetivo salvo, tenta preencher com dados automáticos por sigla
+        if (d['oms_count'] == 0 or d['efetivo_atendimento'] == 0) and (d.get('sigla') or d.get('nome')):
+            auto = get_dados_automaticos_op(d.get('sigla') or d.get('nome'))
+            if d['oms_count'] == 0:
+                d['oms_count'] = len(auto.get('oms_apoiadas') or [])
+            if d['efetivo_atendimento'] == 0:
+                d['efetivo_atendimento'] = auto.get('efetivo_total', 0) or 0
+
+        orgaos.append(d)
+
+    # Contar total de órgãos
+    total_orgaos = db.execute('SELECT COUNT(*) as total FROM orgao_provedor').fetchone()['total']
+
+    # Agregados para análises (tabela-resumo mantida pelas rotas de escrita)
+    try:
+        analiticos = indicadores.carregar_analiticos(db)
+    except Exception as e:
+        print('Erro carregando op_analytics:', e)
+        analiticos = {}
+
+    return {'orgaos': orgaos, 'total_orgaos': total_orgaos, 'analiticos': analiticos}
+
+
+def obter_painel_admin(db):
+    """Payload do painel do admin; fica em cache até a próxima escrita ou recarga de referência."""
+    chave = ('painel_admin', database.versao_dados(db), referencias_atuais().versao)
+    painel = cache_painel.painel.obter(chave)
+    if painel is None:
+        painel = montar_painel_admin(db)
+        if painel['analiticos']:
+            cache_painel.painel.guardar(chave, painel)
+    return painel
+
+
+def _rotulo_op(orgao):
+    return orgao['sigla'] or orgao['nome'] or ''
+
+
+def _secao_capacidade(orgaos, analiticos):
+    totais = {'cap_secos': 0, 'cap_frigo': 0, 'cons_secos': 0, 'cons_frigo': 0}
+    linhas = []
+    for o in orgaos:
+        if o['capacidade_total_toneladas']:
+            totais['cap_secos'] += o['capacidade_total_toneladas']
+            totais['cap_frigo'] += o['capacidade_total_toneladas'] * 0.3
+        totais['cons_secos'] += o['consumo_secos_mensal'] or 0
+        totais['cons_frigo'] += o['consumo_frigorificados_mensal'] or 0
+        linhas.append({
+            'op': _rotulo_op(o),
+            'oms': o.get('oms_count', 0),
+            'efetivo': o['efetivo_atendimento'] or 0,
+            'cap_seco': o['capacidade_total_toneladas'] or 0,
+            'cap_frigo': o['capacidade_total_toneladas_seco'] or 0,
+        })
+    return {'totais': totais, 'linhas': linhas}
+
+
+def _secao_estoque(orgaos, analiticos):
+    linhas = []
+    for o in orgaos:
+        cap_seco = o['capacidade_total_toneladas'] or 0
+        cap_frigo = o['capacidade_total_toneladas_seco'] or 0
+        cons_seco = o['consumo_secos_mensal'] or 0
+        cons_frigo = o['consumo_frigorificados_mensal'] or 0
+        linhas.append({
+            'op': _rotulo_op(o),
+            'cap_seco': cap_seco, 'cons_seco': cons_seco,
+            'cobertura_seco': cap_seco / cons_seco if cons_seco else 0,
+            'cap_frigo': cap_frigo, 'cons_frigo': cons_frigo,
+            'cobertura_frigo': cap_frigo / cons_frigo if cons_frigo else 0,
+        })
+    return {'linhas': linhas}
+
+
+def _secao_frigo_deficit(orgaos, analiticos):
+    return {'linhas': analiticos.get('frigo_deficit', [])}
+
+
+def _secao_supcons(orgaos, analiticos):
+    return {'linhas': [{
+        'id': o['id'],
+        'op': _rotulo_op(o),
+        'fc_seco': o.get('consumo_secos_mensal') or 0,
+        'fs_seco': o.get('suprimento_secos_mensal') or 0,
+        'fc_frigo': o.get('consumo_frigorificados_mensal') or 0,
+        'fs_frigo': o.get('suprimento_frigorificados_mensal') or 0,
+    } for o in orgaos]}
+
+
+def _secao_energia(orgaos, analiticos):
+    energia = analiticos.get('energia', {})
+    linhas = []
+    for o in orgaos:
+        info = energia.get(o['id'], {})
+        linhas.append({
+            'op': _rotulo_op(o),
+            'dimensionamento': info.get('dimensionamento') or '',
+            'capacidade_kva': info.get('capacidade_kva') or 0,
+        })
+    return {'linhas': linhas}
+
+
+def _secao_geradores(orgaos, analiticos):
+    geradores = analiticos.get('geradores_resumo', {})
+    vazio = {'total': 0, 'cap_kva': 0, 'operacional': 0, 'manutencao': 0, 'baixada': 0}
+    return {'linhas': [dict(vazio, **geradores.get(o['id'], {}), op=_rotulo_op(o)) for o in orgaos]}
+
+
+def _secao_seguranca(orgaos, analiticos):
+    sistemas = analiticos.get('sistemas_depositos', {})
+    vazio = {'depositos_total': 0, 'depositos_com_sistema': 0, 'depositos_sem_sistema': 0,
+             'sistemas_total': 0, 'operacional': 0, 'manutencao': 0, 'inoperante': 0}
+    return {'linhas': [dict(vazio, **sistemas.get(o['id'], {}), op=_rotulo_op(o)) for o in orgaos]}
+
+
+def _secao_pessoal(orgaos, analiticos):
+    por_posto = analiticos.get('pessoal_por_posto', {})
+    return {
+        'postos': POSTO_KEYS,
+        'rotulos': POSTO_MAP,
+        'linhas': [{'op': _rotulo_op(o), 'por_posto': por_posto.get(o['id'], {})} for o in orgaos],
+    }
+
+
+def _secao_vte(orgaos, analiticos):
+    bau = analiticos.get('viaturas_bau', {})
+    vazio = {'total': 0, 'operacional': 0, 'manutencao': 0, 'inoperante': 0}
+    linhas = []
+    for o in orgaos:
+        stats = bau.get(o['id'], {})
+        linhas.append({
+            'op': _rotulo_op(o),
+            'bau_seco': dict(vazio, **stats.get('bau_seco', {})),
+            'bau_frigo': dict(vazio, **stats.get('bau_frigo', {})),
+        })
+    return {'linhas': linhas}
+
+
+def _secao_verticalizacao(orgaos, analiticos):
+    rotulos = {o['id']: _rotulo_op(o) for o in orgaos}
+    # Menores percentuais (mais críticos) primeiro
+    linhas = sorted(analiticos.get('verticalizacao_lista', []), key=lambda r: r['perc'])
+    return {'linhas': [dict(r, op=rotulos.get(r['op_id'], '')) for r in linhas]}
+
+
+def _secao_empilhadeiras(orgaos, analiticos):
+    situacao = analiticos.get('empilhadeiras_situacao', {})
+    totais = analiticos.get('empilhadeiras', {})
+    linhas = []
+    for o in orgaos:
+        emp = situacao.get(o['id'], {})
+        situacoes = emp.get('situacoes', {})
+        linhas.append({
+            'op': _rotulo_op(o),
+            'depositos': emp.get('depositos', 0),
+            'total': totais.get(o['id'], {}).get('total', 0) or sum(situacoes.values()),
+            'disponivel': situacoes.get('disponivel', 0),
+            'indisponivel_recuperavel': situacoes.get('indisponivel_recuperavel', 0),
+            'indisponivel': situacoes.get('indisponivel', 0),
+        })
+    return {'linhas': linhas}
+
+
+def _secao_graficos(orgaos, analiticos):
+    viaturas = analiticos.get('viaturas', {})
+    empilhadeiras = analiticos.get('empilhadeiras', {})
+    return {
+        'labels': [_rotulo_op(o) or 'OP' for o in orgaos],
+        'capacidade': [o['capacidade_total_toneladas'] or 0 for o in orgaos],
+        'efetivo': [o['efetivo_atendimento'] or 0 for o in orgaos],
+        'cap_seco_ton': [(viaturas.get(o['id'], {}).get('cap_seco') or 0) / 1000 for o in orgaos],
+        'cap_frigo_ton': [(viaturas.get(o['id'], {}).get('cap_frigo') or 0) / 1000 for o in orgaos],
+        'fc_secos': [o['consumo_secos_mensal'] or 0 for o in orgaos],
+        'fc_frigo': [o['consumo_frigorificados_mensal'] or 0 for o in orgaos],
+        'empilhadeiras': [empilhadeiras.get(o['id'], {}).get('total') or 0 for o in orgaos],
+        'cap_estoque': [empilhadeiras.get(o['id'], {}).get('cap_estoque') or 0 for o in orgaos],
+    }
+
+
+# Seções da análise gerencial servidas por /api/dashboard/analiticos/<secao>
+# (mesmos ids dos blocos 'analise-<secao>' do index.html)
+SECOES_PAINEL = {
+    'capacidade': _secao_capacidade,
+    'estoque': _secao_estoque,
+    'frigo-deficit': _secao_frigo_deficit,
+    'supcons': _secao_supcons,
+    'energia': _secao_energia,
+    'geradores': _secao_geradores,
+    'seguranca': _secao_seguranca,
+    'pessoal': _secao_pessoal,
+    'vte': _secao_vte,
+    'verticalizacao': _secao_verticalizacao,
+    'empilhadeiras': _secao_empilhadeiras,
+    'graficos': _secao_graficos,
+}
+
+
 @app.route('/')
 @login_required
 def index():
@@ -629,368 +916,11 @@ def index():
         nivel_acesso = session['nivel_acesso']
         
         if nivel_acesso == 'admin':
-            # Admin vê todos os órgãos
-            try:
-                orgaos_rows = db.execute('''
-                    SELECT o.*, u.username as criado_por_nome 
-                    FROM orgao_provedor o
-                    LEFT JOIN usuarios u ON o.criado_por = u.id
-                    ORDER BY o.data_cadastro DESC
-                ''').fetchall()
-            except Exception as e:
-                print(f"Erro na consulta: {e}")
-                # Fallback se houver erro
-                orgaos_rows = db.execute('SELECT * FROM orgao_provedor ORDER BY data_cadastro DESC').fetchall()
-
-            # Converter sqlite3.Row para dict e enriquecer com contagem de OMs
-            orgaos = []
-            for r in orgaos_rows:
-                d = dict(r)
-                historico_txt = (d.get('historico') or '').replace('\n', ',')
-                oms_list = [s.strip() for s in historico_txt.split(',') if s.strip()]
-                d['oms_count'] = len(oms_list)
-                d['efetivo_atendimento'] = d.get('efetivo_atendimento') or 0
-
-                # Se não há histórico ou efetivo salvo, tenta preencher com dados automáticos por sigla
-                if (d['oms_count'] == 0 or d['efetivo_atendimento'] == 0) and (d.get('sigla') or d.get('nome')):
-                    auto = get_dados_automaticos_op(d.get('sigla') or d.get('nome'))
-                    if d['oms_count'] == 0:
-                        d['oms_count'] = len(auto.get('oms_apoiadas') or [])
-                    if d['efetivo_atendimento'] == 0:
-                        d['efetivo_atendimento'] = auto.get('efetivo_total', 0) or 0
-
-                orgaos.append(d)
-
-            # Contar total de órgãos
-            total_orgaos = db.execute('SELECT COUNT(*) as total FROM orgao_provedor').fetchone()['total']
-
-            # Agregados para análises
-            analiticos = {}
-            try:
-                emp_rows = db.execute('''
-                    SELECT i.orgao_provedor_id as op_id,
-                           COUNT(e.id) as total_emp,
-                           SUM(COALESCE(i.capacidade_toneladas, 0)) as cap_estoque
-                    FROM instalacoes i
-                    LEFT JOIN empilhadeiras e ON e.instalacao_id = i.id
-                    GROUP BY i.orgao_provedor_id
-                ''').fetchall()
-                analiticos['empilhadeiras'] = {r['op_id']: {'total': r['total_emp'], 'cap_estoque': r['cap_estoque'] or 0} for r in emp_rows}
-            except Exception as e:
-                print('Erro agregando empilhadeiras:', e)
-                analiticos['empilhadeiras'] = {}
-
-            try:
-                sis_rows = db.execute('''
-                    SELECT i.orgao_provedor_id as op_id, COUNT(s.id) as total
-                    FROM sistemas_seguranca s
-                    JOIN instalacoes i ON s.instalacao_id = i.id
-                    GROUP BY i.orgao_provedor_id
-                ''').fetchall()
-                analiticos['sistemas'] = {r['op_id']: r['total'] for r in sis_rows}
-            except Exception as e:
-                print('Erro agregando sistemas:', e)
-                analiticos['sistemas'] = {}
-
-            try:
-                eq_rows = db.execute('''
-                    SELECT i.orgao_provedor_id as op_id, COUNT(eq.id) as total
-                    FROM equipamentos_unitizacao eq
-                    JOIN instalacoes i ON eq.instalacao_id = i.id
-                    GROUP BY i.orgao_provedor_id
-                ''').fetchall()
-                analiticos['equipamentos'] = {r['op_id']: r['total'] for r in eq_rows}
-            except Exception as e:
-                print('Erro agregando equipamentos:', e)
-                analiticos['equipamentos'] = {}
-
-            try:
-                via_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id,
-                           COUNT(*) as total,
-                           COALESCE(SUM(capacidade_carga_kg),0) as cap_total,
-                           COALESCE(SUM(CASE WHEN LOWER(especializacao) LIKE '%frigo%' THEN capacidade_carga_kg ELSE 0 END),0) as cap_frigo,
-                           COALESCE(SUM(CASE WHEN LOWER(especializacao) LIKE '%frigo%' THEN 0 ELSE capacidade_carga_kg END),0) as cap_seco
-                    FROM viaturas
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['viaturas'] = {
-                    r['op_id']: {
-                        'total': r['total'],
-                        'cap_total': r['cap_total'],
-                        'cap_frigo': r['cap_frigo'],
-                        'cap_seco': r['cap_seco']
-                    } for r in via_rows
-                }
-            except Exception as e:
-                print('Erro agregando viaturas:', e)
-                analiticos['viaturas'] = {}
-
-            try:
-                bau_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) NOT LIKE '%frigo%' THEN 1 ELSE 0 END) as bau_seco_total,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) NOT LIKE '%frigo%' AND situacao = 'operacional' THEN 1 ELSE 0 END) as bau_seco_operacional,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) NOT LIKE '%frigo%' AND situacao = 'em_manutencao' THEN 1 ELSE 0 END) as bau_seco_manutencao,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) NOT LIKE '%frigo%' AND situacao IN ('inoperante','baixada') THEN 1 ELSE 0 END) as bau_seco_inoperante,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) LIKE '%frigo%' THEN 1 ELSE 0 END) as bau_frigo_total,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) LIKE '%frigo%' AND situacao = 'operacional' THEN 1 ELSE 0 END) as bau_frigo_operacional,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) LIKE '%frigo%' AND situacao = 'em_manutencao' THEN 1 ELSE 0 END) as bau_frigo_manutencao,
-                           SUM(CASE WHEN LOWER(especializacao) LIKE '%bau%' AND LOWER(especializacao) LIKE '%frigo%' AND situacao IN ('inoperante','baixada') THEN 1 ELSE 0 END) as bau_frigo_inoperante
-                    FROM viaturas
-                    WHERE LOWER(tipo_veiculo) LIKE 'vte%'
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['viaturas_bau'] = {
-                    r['op_id']: {
-                        'bau_seco': {
-                            'total': r['bau_seco_total'] or 0,
-                            'operacional': r['bau_seco_operacional'] or 0,
-                            'manutencao': r['bau_seco_manutencao'] or 0,
-                            'inoperante': r['bau_seco_inoperante'] or 0
-                        },
-                        'bau_frigo': {
-                            'total': r['bau_frigo_total'] or 0,
-                            'operacional': r['bau_frigo_operacional'] or 0,
-                            'manutencao': r['bau_frigo_manutencao'] or 0,
-                            'inoperante': r['bau_frigo_inoperante'] or 0
-                        }
-                    } for r in bau_rows
-                }
-            except Exception as e:
-                print('Erro agregando VTE baus:', e)
-                analiticos['viaturas_bau'] = {}
-
-            try:
-                pes_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id, COALESCE(SUM(quantidade),0) as total
-                    FROM pessoal
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['pessoal'] = {r['op_id']: r['total'] for r in pes_rows}
-            except Exception as e:
-                print('Erro agregando pessoal:', e)
-                analiticos['pessoal'] = {}
-
-            try:
-                pes_posto_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id, posto_graduacao, COALESCE(SUM(quantidade),0) as total
-                    FROM pessoal
-                    GROUP BY orgao_provedor_id, posto_graduacao
-                ''').fetchall()
-                pessoal_por_posto = {}
-                for r in pes_posto_rows:
-                    op_id = r['op_id']
-                    posto_key = r['posto_graduacao'] or 'outro'
-                    pessoal_por_posto.setdefault(op_id, {})[posto_key] = r['total'] or 0
-                analiticos['pessoal_por_posto'] = pessoal_por_posto
-            except Exception as e:
-                print('Erro agregando pessoal por posto:', e)
-                analiticos['pessoal_por_posto'] = {}
-
-            try:
-                ger_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id, COUNT(*) as total
-                    FROM geradores
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['geradores'] = {r['op_id']: r['total'] for r in ger_rows}
-            except Exception as e:
-                print('Erro agregando geradores:', e)
-                analiticos['geradores'] = {}
-
-            try:
-                ger_detalhe_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id,
-                           COUNT(*) as total,
-                           COALESCE(SUM(capacidade_kva),0) as cap_kva,
-                           SUM(CASE WHEN situacao = 'operacional' THEN 1 ELSE 0 END) as operacional,
-                           SUM(CASE WHEN situacao = 'em_manutencao' THEN 1 ELSE 0 END) as manutencao,
-                           SUM(CASE WHEN situacao = 'baixada' THEN 1 ELSE 0 END) as baixada
-                    FROM geradores
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['geradores_resumo'] = {
-                    r['op_id']: {
-                        'total': r['total'] or 0,
-                        'cap_kva': r['cap_kva'] or 0,
-                        'operacional': r['operacional'] or 0,
-                        'manutencao': r['manutencao'] or 0,
-                        'baixada': r['baixada'] or 0
-                    } for r in ger_detalhe_rows
-                }
-            except Exception as e:
-                print('Erro agregando geradores (detalhe):', e)
-                analiticos['geradores_resumo'] = {}
-
-            try:
-                ins_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id, COUNT(*) as total
-                    FROM instalacoes
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['instalacoes'] = {r['op_id']: r['total'] for r in ins_rows}
-            except Exception as e:
-                print('Erro agregando instalacoes:', e)
-                analiticos['instalacoes'] = {}
-
-            try:
-                energia_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id, dimensionamento_adequado, capacidade_total_kva
-                    FROM energia_eletrica
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                analiticos['energia'] = {r['op_id']: {'dimensionamento': r['dimensionamento_adequado'], 'capacidade_kva': r['capacidade_total_kva']} for r in energia_rows}
-            except Exception as e:
-                print('Erro agregando energia:', e)
-                analiticos['energia'] = {}
-
-            try:
-                sis_dep_rows = db.execute('''
-                    SELECT i.orgao_provedor_id as op_id,
-                           COUNT(DISTINCT i.id) as depositos_total,
-                           COUNT(DISTINCT CASE WHEN s.id IS NOT NULL THEN i.id END) as depositos_com_sis,
-                           COUNT(s.id) as sistemas_total,
-                           SUM(CASE WHEN LOWER(COALESCE(s.situacao,'')) = 'operacional' THEN 1 ELSE 0 END) as sis_operacional,
-                           SUM(CASE WHEN LOWER(COALESCE(s.situacao,'')) = 'em_manutencao' THEN 1 ELSE 0 END) as sis_manutencao,
-                           SUM(CASE WHEN LOWER(COALESCE(s.situacao,'')) = 'inoperante' THEN 1 ELSE 0 END) as sis_inoperante
-                    FROM instalacoes i
-                    LEFT JOIN sistemas_seguranca s ON s.instalacao_id = i.id
-                    WHERE LOWER(i.tipo_instalacao) LIKE '%deposit%'
-                    GROUP BY i.orgao_provedor_id
-                ''').fetchall()
-                analiticos['sistemas_depositos'] = {}
-                for r in sis_dep_rows:
-                    dep_total = r['depositos_total'] or 0
-                    dep_com = r['depositos_com_sis'] or 0
-                    analiticos['sistemas_depositos'][r['op_id']] = {
-                        'depositos_total': dep_total,
-                        'depositos_com_sistema': dep_com,
-                        'depositos_sem_sistema': max(dep_total - dep_com, 0),
-                        'sistemas_total': r['sistemas_total'] or 0,
-                        'operacional': r['sis_operacional'] or 0,
-                        'manutencao': r['sis_manutencao'] or 0,
-                        'inoperante': r['sis_inoperante'] or 0
-                    }
-            except Exception as e:
-                print('Erro agregando sistemas de seguranca por deposito:', e)
-                analiticos['sistemas_depositos'] = {}
-
-            try:
-                vert_rows = db.execute('''
-                    SELECT i.orgao_provedor_id as op_id,
-                           LOWER(COALESCE(i.tipo_instalacao, '')) as tipo_instalacao,
-                           LOWER(COALESCE(i.verticalizacao, '')) as verticalizacao
-                    FROM instalacoes i
-                    WHERE LOWER(i.tipo_instalacao) LIKE 'deposito_cl%'
-                ''').fetchall()
-
-                def map_cl(tipo_val: str) -> str:
-                    tipo = tipo_val or ''
-                    for num in ['10','9','8','7','6','5','4','3','2','1']:
-                        if f"cl{num}" in tipo:
-                            return f"CL{num}"
-                    return ''
-
-                vert_map = {}
-                vert_list = []
-                for r in vert_rows:
-                    cl_key = map_cl(r['tipo_instalacao'])
-                    if not cl_key:
-                        continue
-                    vert_flag = (r['verticalizacao'] or '').startswith('vertical')
-                    entry = vert_map.setdefault(r['op_id'], {}).setdefault(cl_key, {
-                        'verticalizado': 0,
-                        'nao_verticalizado': 0,
-                        'total': 0
-                    })
-                    if vert_flag:
-                        entry['verticalizado'] += 1
-                    else:
-                        entry['nao_verticalizado'] += 1
-                    entry['total'] += 1
-
-                for op_id, data in vert_map.items():
-                    for cl_key, entry in data.items():
-                        total = entry.get('total', 0) or 0
-                        vert = entry.get('verticalizado', 0) or 0
-                        nao = entry.get('nao_verticalizado', 0) or 0
-                        perc = (vert * 100 / total) if total else 0
-                        vert_list.append({
-                            'op_id': op_id,
-                            'cl': cl_key,
-                            'total': total,
-                            'verticalizado': vert,
-                            'nao_verticalizado': nao,
-                            'perc': perc
-                        })
-
-                analiticos['verticalizacao_depositos'] = vert_map
-                analiticos['verticalizacao_lista'] = vert_list
-            except Exception as e:
-                print('Erro agregando verticalizacao de depositos:', e)
-                analiticos['verticalizacao_depositos'] = {}
-                analiticos['verticalizacao_lista'] = []
-
-            try:
-                frigo_deficit = []
-                for org in orgaos:
-                    cap_frigo = (org.get('capacidade_total_toneladas_seco') or 0)
-                    cons_frigo = (org.get('consumo_frigorificados_mensal') or 0)
-                    area_disp = (org.get('area_edificavel_disponivel') or 0)
-                    cobertura = (cap_frigo / cons_frigo) if cons_frigo else 0
-
-                    # Considera déficit apenas quando existe consumo declarado e cobertura < 4 FC
-                    if cons_frigo and cobertura < 4:
-                        frigo_deficit.append({
-                            'id': org.get('id'),
-                            'sigla': org.get('sigla') or org.get('nome'),
-                            'cap_frigo': cap_frigo,
-                            'cons_frigo': cons_frigo,
-                            'cobertura': cobertura,
-                            'area_disp': area_disp,
-                            'tem_area': area_disp > 0
-                        })
-
-                # Ordena do pior atendimento para o melhor
-                analiticos['frigo_deficit'] = sorted(frigo_deficit, key=lambda x: x['cobertura'])
-            except Exception as e:
-                print('Erro agregando déficit de frigorificados:', e)
-                analiticos['frigo_deficit'] = []
-
-            try:
-                emp_sit_rows = db.execute('''
-                    SELECT i.orgao_provedor_id as op_id,
-                           LOWER(COALESCE(e.situacao,'')) as situacao,
-                           COALESCE(SUM(COALESCE(e.quantidade,1)),0) as total
-                    FROM empilhadeiras e
-                    JOIN instalacoes i ON i.id = e.instalacao_id
-                    GROUP BY i.orgao_provedor_id, LOWER(COALESCE(e.situacao,''))
-                ''').fetchall()
-                emp_por_situacao = {}
-                for r in emp_sit_rows:
-                    op_id = r['op_id']
-                    emp_por_situacao.setdefault(op_id, {})[r['situacao'] or 'indefinida'] = r['total'] or 0
-
-                dep_rows = db.execute('''
-                    SELECT orgao_provedor_id as op_id, COUNT(*) as total
-                    FROM instalacoes
-                    WHERE LOWER(tipo_instalacao) LIKE '%deposit%'
-                    GROUP BY orgao_provedor_id
-                ''').fetchall()
-                dep_por_op = {r['op_id']: r['total'] or 0 for r in dep_rows}
-
-                analiticos['empilhadeiras_situacao'] = {
-                    op_id: {
-                        'situacoes': emp_por_situacao.get(op_id, {}),
-                        'depositos': dep_por_op.get(op_id, 0)
-                    } for op_id in set(list(emp_por_situacao.keys()) + list(dep_por_op.keys()))
-                }
-            except Exception as e:
-                print('Erro agregando empilhadeiras por situacao:', e)
-                analiticos['empilhadeiras_situacao'] = {}
-            
-            return render_template('index.html', orgaos=orgaos, total_orgaos=total_orgaos, nivel_acesso=nivel_acesso, analiticos=analiticos)
+            # Admin: a página traz só a estrutura; a lista de OPs vem paginada de /api/orgaos
+            # e as análises por seção de /api/dashboard/analiticos
+            total_orgaos = db.execute('SELECT COUNT(*) FROM orgao_provedor').fetchone()[0]
+            return render_template('index.html', total_orgaos=total_orgaos, nivel_acesso=nivel_acesso,
+                                   filtros_ops=listagem_ops.opcoes_filtro(db))
         
         else:  # Cadastrador ou Visualizador
             # Buscar o órgão do usuário
@@ -1009,9 +939,8 @@ def index():
             orgaos = []
             if orgao:
                 d = dict(orgao)
-                historico_txt = (d.get('historico') or '').replace('\n', ',')
-                oms_list = [s.strip() for s in historico_txt.split(',') if s.strip()]
-                d['oms_count'] = len(oms_list)
+                d['oms_count'] = db.execute('SELECT COUNT(*) FROM op_om_apoiada WHERE op_id = ?',
+                                            (d['id'],)).fetchone()[0]
                 d['efetivo_atendimento'] = d.get('efetivo_atendimento') or 0
 
                 if (d['oms_count'] == 0 or d['efetivo_atendimento'] == 0) and (d.get('sigla') or d.get('nome')):
@@ -1028,6 +957,79 @@ def index():
         flash(f'Erro ao carregar dados: {str(e)}', 'error')
         return render_template('index.html', orgaos=[], nivel_acesso=session.get('nivel_acesso', 'visualizador'))
 
+def _etag_painel(db, secao):
+    return f"painel-{database.versao_dados(db)}-{referencias_atuais().versao}-{secao}"
+
+
+def _resposta_com_etag(etag, calcular):
+    """304 se o cliente já tem a versão ``etag``; senão o JSON de ``calcular()`` com ETag."""
+    if request.if_none_match.contains(etag):
+        resposta = app.response_class(status=304)
+    else:
+        resposta = jsonify(calcular())
+    resposta.set_etag(etag)
+    # Sempre revalida: a versão dos dados muda a cada escrita
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+@app.route('/api/orgaos')
+@login_required
+@admin_required
+def api_listar_orgaos():
+    """Página da listagem de OPs: ?ordem=&direcao=&subordinacao=&classe=&frigo_deficit=1&limite=&apos=<cursor>."""
+    db = database.get_db()
+    try:
+        pagina = listagem_ops.listar_ops(
+            db,
+            ordem=request.args.get('ordem', 'data_cadastro'),
+            direcao=request.args.get('direcao') or None,
+            subordinacao=request.args.get('subordinacao') or None,
+            classe=request.args.get('classe') or None,
+            frigo_deficit=request.args.get('frigo_deficit') in ('1', 'true', 'sim'),
+            apos=request.args.get('apos') or None,
+            limite=request.args.get('limite', listagem_ops.LIMITE_PADRAO, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for item in pagina['itens']:
+        # efetivo_atendimento já vem com o efetivo das OMs apoiadas quando não há
+        # valor declarado (efetivo_referencia), o mesmo usado na ordenação
+        item['url_ver'] = url_for('visualizar_orgao', id=item['id'])
+        item['url_editar'] = url_for('editar_orgao', id=item['id'])
+        item['url_excluir'] = url_for('excluir_orgao', id=item['id'])
+    return jsonify(pagina)
+
+
+@app.route('/api/dashboard/analiticos')
+@login_required
+@admin_required
+def api_dashboard_analiticos():
+    """Índice das seções da análise gerencial e a versão atual dos dados."""
+    db = database.get_db()
+    return _resposta_com_etag(_etag_painel(db, ''), lambda: {
+        'versao': database.versao_dados(db),
+        'secoes': {secao: url_for('api_dashboard_analiticos_secao', secao=secao) for secao in SECOES_PAINEL},
+    })
+
+
+@app.route('/api/dashboard/analiticos/<secao>')
+@login_required
+@admin_required
+def api_dashboard_analiticos_secao(secao):
+    """Dados de uma seção da análise gerencial (carregados sob demanda pelo index.html)."""
+    montar = SECOES_PAINEL.get(secao)
+    if montar is None:
+        return jsonify({'error': f'Seção desconhecida: {secao}'}), 404
+    db = database.get_db()
+
+    def calcular():
+        painel = obter_painel_admin(db)
+        return montar(painel['orgaos'], painel['analiticos'])
+    return _resposta_com_etag(_etag_painel(db, secao), calcular)
+
+
 # Rota para o painel administrativo
 @app.route('/admin')
 @login_required
@@ -1062,7 +1064,8 @@ def admin():
                           total_orgaos=total_orgaos,
                           usuarios_ativos=usuarios_ativos,
                           ultimos_orgaos=ultimos_orgaos,
-                          ultimos_usuarios=ultimos_usuarios)
+                          ultimos_usuarios=ultimos_usuarios,
+                          filtros_ops=listagem_ops.opcoes_filtro(db))
 
 
 # Página de gestão de usuários (interface)
@@ -1090,165 +1093,286 @@ def usuarios():
 @login_required
 @admin_required
 def admin_backup():
-    """Gera backup do banco SQLite e envia como download."""
+    """Gera backup online do banco SQLite e envia compactado (gzip), em streaming."""
+    if not os.path.exists(database.DATABASE):
+        flash('Arquivo de banco de dados não encontrado.', 'error')
+        return redirect(url_for('admin'))
+
+    inicio = time.perf_counter()
+    caminho = backup_banco.arquivo_temporario()
     try:
-        db_path = database.DATABASE
-        if not os.path.exists(db_path):
-            flash('Arquivo de banco de dados não encontrado.', 'error')
-            return redirect(url_for('admin'))
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
-            shutil.copy2(db_path, tmp.name)
-            tmp.flush()
-            backup_name = f"backup_op_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            return send_file(tmp.name, as_attachment=True, download_name=backup_name)
+        tamanho = backup_banco.copiar(database.get_db(), caminho)
     except Exception as e:
+        backup_banco.remover(caminho)
+        print(f"✗ Erro ao gerar backup: {e}")
         flash(f'Erro ao gerar backup: {e}', 'error')
         return redirect(url_for('admin'))
 
+    def gerar():
+        compactado = 0
+        for bloco in backup_banco.blocos_gzip(caminho):
+            compactado += len(bloco)
+            yield bloco
+        backup_banco.registrar(inicio, tamanho, compactado)
+
+    resp = Response(gerar(), mimetype=backup_banco.MIMETYPE)
+    # Remove a cópia ao fechar a resposta, inclusive se o download for interrompido
+    resp.call_on_close(lambda: backup_banco.remover(caminho))
+    nome = f"backup_op_{datetime.now().strftime('%Y%m%d_%H%M%S')}{backup_banco.EXTENSAO}"
+    resp.headers['Content-Disposition'] = f'attachment; filename={nome}'
+    return resp
+
+
+@app.route('/admin/diagnostico', methods=['GET'])
+@login_required
+@admin_required
+def admin_diagnostico():
+    """Métricas internas do worker (pool de conexões etc.) em JSON."""
+    return jsonify({
+        'pid': os.getpid(),
+        'conexoes': database.estatisticas_conexoes(),
+        'versao_dados': database.versao_dados(database.get_db()),
+        'cache_painel': cache_painel.painel.estatisticas(),
+        'referencias': REFERENCIAS.estatisticas(),
+        'snapshots': SNAPSHOTS.estatisticas(),
+        'tarefas': TAREFAS.estatisticas(),
+    })
+
+
+def _tarefa_json(tarefa):
+    resposta = {k: v for k, v in tarefa.items() if k not in ('pid', 'resultado')}
+    resposta['status_url'] = url_for('admin_job_status', tarefa_id=tarefa['id'])
+    resposta['download_url'] = (url_for('admin_job_download', tarefa_id=tarefa['id'])
+                                if tarefa['estado'] == 'concluida' else None)
+    return resposta
+
+
+@app.route('/admin/jobs', methods=['POST'])
+@login_required
+@admin_required
+def admin_jobs_criar():
+    """Enfileira uma tarefa em segundo plano (JSON ``{tipo, parametros}``); responde 202 com o estado."""
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({'error': 'Envie um objeto JSON com tipo e parametros'}), 400
+    tipo = dados.get('tipo')
+    parametros = dados.get('parametros') or {}
+    if not tipo:
+        return jsonify({'error': f"Informe o tipo: {', '.join(sorted(tarefas.TIPOS))}"}), 400
+    if not isinstance(parametros, dict):
+        return jsonify({'error': 'parametros deve ser um objeto'}), 400
+    try:
+        tarefa = TAREFAS.enviar(tipo, parametros, database.get_db(), usuario=session.get('username'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except OSError as e:
+        print(f"✗ Erro ao enfileirar tarefa {tipo}: {e}")
+        return jsonify({'error': 'Não foi possível enfileirar a tarefa'}), 500
+    resposta = jsonify(_tarefa_json(tarefa))
+    resposta.headers['Location'] = url_for('admin_job_status', tarefa_id=tarefa['id'])
+    return resposta, 202
+
+
+@app.route('/admin/jobs/<tarefa_id>', methods=['GET'])
+@login_required
+@admin_required
+def admin_job_status(tarefa_id):
+    """Estado e progresso de uma tarefa em JSON."""
+    tarefa = TAREFAS.obter(tarefa_id)
+    if tarefa is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    return jsonify(_tarefa_json(tarefa))
+
+
+@app.route('/admin/jobs/<tarefa_id>/download', methods=['GET'])
+@login_required
+@admin_required
+def admin_job_download(tarefa_id):
+    """Baixa o resultado de uma tarefa concluída."""
+    tarefa = TAREFAS.obter(tarefa_id)
+    if tarefa is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    if tarefa['estado'] != 'concluida':
+        return jsonify({'error': f"Tarefa ainda não concluída (estado: {tarefa['estado']})"}), 409
+    caminho = TAREFAS.arquivo_resultado(tarefa)
+    if caminho is None:
+        return jsonify({'error': 'Resultado expirado; gere a exportação novamente'}), 404
+    return send_file(caminho, as_attachment=True, download_name=tarefa['arquivo'],
+                     mimetype=tarefas.TIPOS[tarefa['tipo']].mimetype)
+
+
+@app.route('/admin/referencias/recarregar', methods=['POST'])
+@login_required
+@admin_required
+def admin_recarregar_referencias():
+    """Recarrega CODOM.xlsx / Dados.xlsx em segundo plano neste worker."""
+    iniciada = REFERENCIAS.recarregar()
+    mensagem = 'Recarga iniciada.' if iniciada else 'Já existe uma recarga em andamento.'
+    return jsonify(success=iniciada, message=mensagem, referencias=REFERENCIAS.estatisticas()), 202 if iniciada else 409
+
+
+def obter_base_capacidade(db):
+    """Arrays de capacidade/consumo de todos os OPs; recarregados a cada escrita ou recarga de referência."""
+    chave = ('base_capacidade', database.versao_dados(db), referencias_atuais().versao)
+    return cache_painel.painel.obter_ou_calcular(chave, lambda: analise_capacidade.carregar_base(
+        db, efetivo_automatico=lambda sigla: get_dados_automaticos_op(sigla).get('efetivo_total', 0)))
+
+
+@app.route('/api/analise/simulacao', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def api_analise_simulacao():
+    """Cobertura atual x cenário simulado de todos os OPs.
+
+    Parâmetros (query string ou JSON): ``efetivo``, ``consumo`` e ``capacidade``
+    em variação percentual (ex.: efetivo=20 para +20%), ``subordinacao`` e
+    ``ops`` (ids separados por vírgula ou lista) para restringir o resultado.
+    """
+    if request.method == 'POST':
+        dados = request.get_json(silent=True)
+        if dados is None:
+            dados = {}
+        if not isinstance(dados, dict):
+            return jsonify({'error': 'Envie um objeto JSON com os parâmetros da simulação'}), 400
+    else:
+        dados = request.args
+    variacoes = {}
+    for nome in ('efetivo', 'consumo', 'capacidade'):
+        try:
+            valor = float(dados.get(nome) or 0)
+        except (TypeError, ValueError):
+            return jsonify({'error': f'{nome} deve ser numérico (variação percentual)'}), 400
+        if not analise_capacidade.VARIACAO_MIN <= valor <= analise_capacidade.VARIACAO_MAX:
+            return jsonify({'error': f'{nome} deve estar entre {analise_capacidade.VARIACAO_MIN:g}% '
+                                     f'e {analise_capacidade.VARIACAO_MAX:g}%'}), 400
+        variacoes[nome] = valor
+
+    ops = dados.get('ops')
+    if isinstance(ops, str):
+        ops = [o for o in ops.split(',') if o.strip()]
+    try:
+        ids = [int(o) for o in ops] if ops else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ops deve ser uma lista de ids'}), 400
+
+    base = obter_base_capacidade(database.get_db())
+    selecao = base.mascara(ids=ids, subordinacao=dados.get('subordinacao') or None)
+    return jsonify(analise_capacidade.simular(base, selecao, **variacoes))
+
+
+@app.route('/api/analise/tendencia', methods=['GET'])
+@login_required
+@admin_required
+def api_analise_tendencia():
+    """Séries diárias dos indicadores lidas dos snapshots (``op_snapshot``).
+
+    Parâmetros: ``inicio``/``fim`` (AAAA-MM-DD; padrão: últimos
+    ``TENDENCIA_DIAS_PADRAO`` dias, ou ``dias``), ``op`` (id) e ``subordinacao``.
+    """
+    try:
+        inicio, fim = historico_indicadores.periodo(request.args.get('inicio'), request.args.get('fim'),
+                                                    request.args.get('dias'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    op_id = request.args.get('op')
+    if op_id is not None and not op_id.isdigit():
+        return jsonify({'error': 'op deve ser o id numérico do OP'}), 400
+    db = database.get_db()
+    return jsonify({
+        'inicio': inicio,
+        'fim': fim,
+        'ultimo_snapshot': historico_indicadores.ultimo_snapshot(db),
+        'serie': historico_indicadores.tendencia(db, inicio, fim, op_id=int(op_id) if op_id else None,
+                                                 subordinacao=request.args.get('subordinacao') or None),
+    })
 
 
 # Nova rota para exportar relatório da análise atual (CSV)
 @app.route('/analise/relatorio', methods=['GET'])
 @login_required
 def analise_relatorio():
-    """Exporta relatório CSV da análise atual (dados dos OP)."""
-    db = database.get_db()
+    """Exporta relatório CSV da análise atual (dados dos OP), em streaming.
+
+    ``tipo``: ``geral`` (um registro por OP) ou um detalhamento de
+    ``relatorio_csv.RELATORIOS`` (viaturas, pessoal, instalacoes...); filtros
+    opcionais ``ids`` (separados por vírgula), ``subordinacao`` e ``classe``.
+    Para quem não é admin, os detalhamentos ficam restritos ao próprio OP.
+    """
+    tipo = request.args.get('tipo', 'geral')
+    ids = [int(i) for i in (request.args.get('ids') or '').split(',') if i.strip().isdigit()]
+    if tipo != 'geral' and session.get('nivel_acesso') != 'admin':
+        db = database.get_db()
+        usuario = db.execute('SELECT orgao_provedor FROM usuarios WHERE id = ?', (session['user_id'],)).fetchone()
+        orgao = None
+        if usuario and usuario['orgao_provedor']:
+            orgao = db.execute('SELECT id FROM orgao_provedor WHERE nome = ?',
+                               (usuario['orgao_provedor'],)).fetchone()
+        if not orgao:
+            flash('Você não está vinculado a um órgão provedor cadastrado.', 'error')
+            return redirect(url_for('index'))
+        ids = [orgao['id']]
     try:
-        # Filtros opcionais via query string
-        filtro_tipo = request.args.get('tipo', 'geral')
-        filtro_ids = request.args.get('ids')
-        ids_list = []
-        if filtro_ids:
-            ids_list = [int(i) for i in filtro_ids.split(',') if i.isdigit()]
-
-        # Query base
-        query = '''
-            SELECT o.id, o.nome, o.sigla, o.subordinacao, o.unidade_gestora, o.codom,
-                   o.efetivo_atendimento, o.capacidade_total_toneladas, o.capacidade_total_toneladas_seco,
-                   o.consumo_secos_mensal, o.consumo_frigorificados_mensal,
-                   COALESCE(v.cap_total,0) as viaturas_cap_kg,
-                   COALESCE(v.qtd,0) as viaturas_qtd,
-                   COALESCE(p.total,0) as pessoal_total,
-                   COALESCE(e.emp_total,0) as empilhadeiras_qtd,
-                   o.data_cadastro
-            FROM orgao_provedor o
-            LEFT JOIN (
-                SELECT orgao_provedor_id, COUNT(*) as qtd, COALESCE(SUM(capacidade_carga_kg),0) as cap_total
-                FROM viaturas GROUP BY orgao_provedor_id
-            ) v ON v.orgao_provedor_id = o.id
-            LEFT JOIN (
-                SELECT orgao_provedor_id, COALESCE(SUM(quantidade),0) as total
-                FROM pessoal GROUP BY orgao_provedor_id
-            ) p ON p.orgao_provedor_id = o.id
-            LEFT JOIN (
-                SELECT i.orgao_provedor_id, COUNT(e.id) as emp_total
-                FROM empilhadeiras e
-                JOIN instalacoes i ON i.id = e.instalacao_id
-                GROUP BY i.orgao_provedor_id
-            ) e ON e.orgao_provedor_id = o.id
-        '''
-        params = []
-        if ids_list:
-            query += ' WHERE o.id IN ({})'.format(','.join(['?'] * len(ids_list)))
-            params = ids_list
-        query += ' ORDER BY o.nome'
-        rows = db.execute(query, params).fetchall()
-
-        output = io.StringIO()
-        header = [
-            'id','nome','sigla','subordinacao','unidade_gestora','codom','efetivo_atendimento',
-            'capacidade_total_toneladas','capacidade_total_toneladas_seco',
-            'consumo_secos_mensal','consumo_frigorificados_mensal',
-            'viaturas_capacidade_kg','viaturas_qtd','pessoal_total','empilhadeiras_qtd','data_cadastro'
-        ]
-        output.write(','.join(header) + '\n')
-        for r in rows:
-            line = [
-                r['id'], r['nome'], r['sigla'], r['subordinacao'], r['unidade_gestora'] or '', r['codom'] or '',
-                r['efetivo_atendimento'] or 0,
-                r['capacidade_total_toneladas'] or 0,
-                r['capacidade_total_toneladas_seco'] or 0,
-                r['consumo_secos_mensal'] or 0,
-                r['consumo_frigorificados_mensal'] or 0,
-                r['viaturas_cap_kg'] or 0,
-                r['viaturas_qtd'] or 0,
-                r['pessoal_total'] or 0,
-                r['empilhadeiras_qtd'] or 0,
-                r['data_cadastro'] or ''
-            ]
-            output.write(','.join([str(x).replace(',', ' ') for x in line]) + '\n')
-
-        resp = Response(output.getvalue(), mimetype='text/csv')
-        resp.headers['Content-Disposition'] = f"attachment; filename=relatorio_analise_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return resp
-    except Exception as e:
+        cabecalho, sql, params = relatorio_csv.preparar(
+            tipo, ids=ids, subordinacao=request.args.get('subordinacao') or None,
+            classe=request.args.get('classe') or None)
+    except ValueError as e:
         flash(f'Erro ao gerar relatório: {e}', 'error')
         return redirect(url_for('index'))
 
+    def gerar():
+        try:
+            yield from relatorio_csv.gerar_csv(database.get_db(), cabecalho, sql, params)
+        except Exception as e:
+            # Os cabeçalhos já foram enviados: interrompe o download em vez de entregar um arquivo truncado
+            print(f"✗ Erro ao gerar relatório CSV ({tipo}): {e}")
+            raise
+
+    nome = 'relatorio_analise' if tipo == 'geral' else f'relatorio_analise_{tipo}'
+    resp = Response(stream_with_context(gerar()), mimetype='text/csv')
+    resp.headers['Content-Disposition'] = f"attachment; filename={nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return resp
+
 
 @app.route('/admin/relatorios_viaturas_excel', methods=['GET'])
 @login_required
 @admin_required
 def admin_relatorios_viaturas_excel():
     """Exporta Excel com dados principais das viaturas."""
-    db = database.get_db()
     try:
-        rows = db.execute('''
-            SELECT v.id, o.nome AS orgao_nome, o.sigla AS orgao_sigla,
-                   v.categoria, v.tipo_veiculo, v.especializacao, v.placa,
-                   v.marca, v.modelo, v.ano_fabricacao, v.capacidade_carga_kg,
-                   v.lotacao_pessoas, v.tipo_refrigeracao, v.temperatura_min, v.temperatura_max,
-                   v.situacao, v.km_atual, v.ultima_manutencao, v.proxima_manutencao,
-                   v.valor_recuperacao, v.patrimonio, v.numero_inventario, v.observacoes
-            FROM viaturas v
-            JOIN orgao_provedor o ON o.id = v.orgao_provedor_id
-            ORDER BY o.nome, v.tipo_veiculo, v.placa
-        ''').fetchall()
-
-        df = pd.DataFrame([dict(r) for r in rows])
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Viaturas')
-        output.seek(0)
-
+        arquivo = exportacao_xlsx.exportar(database.get_db(), [('Viaturas', exportacao_xlsx.CONSULTA_VIATURAS, ())])
         filename = f"relatorio_viaturas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return send_file(output, as_attachment=True,
-                         download_name=filename,
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        return send_file(arquivo, as_attachment=True, download_name=filename, mimetype=exportacao_xlsx.MIMETYPE)
     except Exception as e:
         flash(f'Erro ao gerar relatório de viaturas (Excel): {e}', 'error')
         return redirect(url_for('admin'))
 
 
+@app.route('/admin/relatorios_ops_excel', methods=['GET'])
+@login_required
+@admin_required
+def admin_relatorios_ops_excel():
+    """Exporta Excel completo, uma aba por entidade; filtros opcionais ``ids`` e ``subordinacao``."""
+    ids = [int(i) for i in (request.args.get('ids') or '').split(',') if i.strip().isdigit()]
+    try:
+        abas = exportacao_xlsx.consultas_op(ids=ids, subordinacao=request.args.get('subordinacao') or None)
+        arquivo = exportacao_xlsx.exportar(database.get_db(), abas, paralelo=True)
+        filename = f"relatorio_ops_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        return send_file(arquivo, as_attachment=True, download_name=filename, mimetype=exportacao_xlsx.MIMETYPE)
+    except Exception as e:
+        flash(f'Erro ao gerar planilha completa (Excel): {e}', 'error')
+        return redirect(url_for('admin'))
+
+
 @app.route('/admin/relatorios_empilhadeiras_excel', methods=['GET'])
 @login_required
 @admin_required
 def admin_relatorios_empilhadeiras_excel():
     """Exporta Excel com dados principais das empilhadeiras."""
-    db = database.get_db()
     try:
-        rows = db.execute('''
-            SELECT e.id, o.nome AS orgao_nome, o.sigla AS orgao_sigla,
-                   i.tipo_instalacao, i.descricao AS instalacao_descricao,
-                   e.tipo, e.capacidade, e.quantidade, e.ano_fabricacao,
-                   e.situacao, e.valor_recuperacao
-            FROM empilhadeiras e
-            JOIN instalacoes i ON i.id = e.instalacao_id
-            JOIN orgao_provedor o ON o.id = i.orgao_provedor_id
-            ORDER BY o.nome, i.tipo_instalacao, e.tipo
-        ''').fetchall()
-
-        df = pd.DataFrame([dict(r) for r in rows])
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Empilhadeiras')
-        output.seek(0)
-
+        arquivo = exportacao_xlsx.exportar(database.get_db(),
+                                           [('Empilhadeiras', exportacao_xlsx.CONSULTA_EMPILHADEIRAS, ())])
         filename = f"relatorio_empilhadeiras_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return send_file(output, as_attachment=True,
-                         download_name=filename,
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        return send_file(arquivo, as_attachment=True, download_name=filename, mimetype=exportacao_xlsx.MIMETYPE)
     except Exception as e:
         flash(f'Erro ao gerar relatório de empilhadeiras (Excel): {e}', 'error')
         return redirect(url_for('admin'))
@@ -1347,6 +1471,7 @@ def cadastrar_usuario():
                   orgao_provedor, email, nivel_acesso, ativo))
             flash('Usuário cadastrado com sucesso!', 'success')
         
+        database.incrementar_versao_dados(db)
         db.commit()
         return redirect(url_for('usuarios'))
         
@@ -1385,6 +1510,7 @@ def api_toggle_usuario_status(user_id):
         
         db = database.get_db()
         db.execute('UPDATE usuarios SET ativo = ? WHERE id = ?', (ativo, user_id))
+        database.incrementar_versao_dados(db)
         db.commit()
         
         return jsonify({'success': True})
@@ -1402,6 +1528,7 @@ def api_delete_usuario(user_id):
     try:
         db = database.get_db()
         db.execute('DELETE FROM usuarios WHERE id = ?', (user_id,))
+        database.incrementar_versao_dados(db)
         db.commit()
         
         return jsonify({'success': True})
@@ -1461,6 +1588,7 @@ def editar_perfil():
                 WHERE id = ?
             ''', (nome_completo, nome_guerra, email, session['user_id']))
         
+        database.incrementar_versao_dados(db)
         db.commit()
         
         # Atualizar sessão
@@ -1641,6 +1769,11 @@ def salvar_cadastro():
                  pode_24h, horas_operacao, ultima_manutencao, proxima_manutencao, observacoes)
             )
 
+        database.gravar_oms_apoiadas(db, orgao_id)
+        database.gravar_classes_provedor(db, orgao_id)
+        database.gravar_efetivo_referencia(db, efetivo_automatico_op, orgao_id)
+        indicadores.atualizar_indicadores_op(db, orgao_id)
+        database.incrementar_versao_dados(db)
         db.commit()
 
         return jsonify(success=True, id=orgao_id, message=action_msg, redirect=url_for('editar_orgao', id=orgao_id))
@@ -1736,6 +1869,8 @@ def salvar_geradores():
                  pode_24h, horas_operacao, ultima_manutencao, proxima_manutencao, observacoes)
             )
 
+        indicadores.atualizar_indicadores_op(db, orgao_id)
+        database.incrementar_versao_dados(db)
         db.commit()
         return jsonify(success=True, message='Energia e geradores salvos com sucesso.')
 
@@ -2134,11 +2269,11 @@ def cadastro():
                                 '''INSERT INTO viaturas 
                                 (orgao_provedor_id, categoria, tipo_veiculo, especializacao, placa, marca, modelo,
                                  ano_fabricacao, capacidade_carga_kg, lotacao_pessoas, situacao, valor_recuperacao, km_atual, ultima_manutencao,
-                                 proxima_manutencao, patrimonio, observacoes) 
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                 proxima_manutencao, patrimonio, observacoes, is_frigo, is_bau, is_vte) 
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                                 (orgao_id, categoria, tipo_veiculo, especializacao, placa, marca, modelo, ano_fabricacao,
                                  capacidade_carga_kg, lotacao_pessoas, situacao, valor_recuperacao, km_atual, ultima_manutencao, proxima_manutencao,
-                                 patrimonio, observacoes)
+                                 patrimonio, observacoes) + indicadores.classificar_viatura(tipo_veiculo, especializacao)
                             )
                         except Exception as err:
                             print('[WARN cadastro viatura] skip insert por erro:', err, 'dados=', {
@@ -2204,10 +2339,11 @@ def cadastro():
                     '''INSERT INTO instalacoes 
                     (orgao_provedor_id, tipo_instalacao, nome_identificacao, descricao, data_construcao,
                      tipo_cobertura, capacidade_toneladas, largura, comprimento,
-                     altura, verticalizacao) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                     altura, verticalizacao, is_deposito, deposito_classe) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                     (orgao_id, tipo_instalacao, nome_instalacao, descricao, data_construcao, tipo_cobertura,
                      capacidade_toneladas, largura, comprimento, altura, verticalizacao)
+                    + indicadores.classificar_instalacao(tipo_instalacao)
                 )
                 instalacao_id = cursor.lastrowid
                 
@@ -2412,6 +2548,11 @@ def cadastro():
                                         ('equipamento_unitizacao', equipamento_id, filepath, 'equipamento')
                                     )
             
+            database.gravar_oms_apoiadas(db, orgao_id)
+            database.gravar_classes_provedor(db, orgao_id)
+            database.gravar_efetivo_referencia(db, efetivo_automatico_op, orgao_id)
+            indicadores.atualizar_indicadores_op(db, orgao_id)
+            database.incrementar_versao_dados(db)
             db.commit()
             flash('Cadastro realizado com sucesso!', 'success')
             return redirect(url_for('visualizar_orgao', id=orgao_id))
@@ -2844,11 +2985,11 @@ def editar_orgao(id):
                                 '''INSERT INTO viaturas 
                                 (orgao_provedor_id, categoria, tipo_veiculo, especializacao, placa, marca, modelo,
                                  ano_fabricacao, capacidade_carga_kg, lotacao_pessoas, situacao, valor_recuperacao, km_atual, ultima_manutencao,
-                                 proxima_manutencao, patrimonio, observacoes) 
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                 proxima_manutencao, patrimonio, observacoes, is_frigo, is_bau, is_vte) 
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                                 (id, categoria, tipo_veiculo, especializacao, placa, marca, modelo, ano_fabricacao,
                                  capacidade_carga_kg, lotacao_pessoas, situacao, valor_recuperacao, km_atual, ultima_manutencao, proxima_manutencao,
-                                 patrimonio, observacoes)
+                                 patrimonio, observacoes) + indicadores.classificar_viatura(tipo_veiculo, especializacao)
                             )
                         except Exception as err:
                             print('[WARN editar viatura] skip insert por erro:', err, 'dados=', {
@@ -2929,10 +3070,11 @@ def editar_orgao(id):
                     '''INSERT INTO instalacoes 
                     (orgao_provedor_id, tipo_instalacao, nome_identificacao, descricao, data_construcao,
                      tipo_cobertura, capacidade_toneladas, largura, comprimento,
-                     altura, verticalizacao) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                     altura, verticalizacao, is_deposito, deposito_classe) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                     (id, tipo_instalacao, nome_instalacao, descricao, data_construcao, tipo_cobertura,
                      capacidade_toneladas, largura, comprimento, altura, verticalizacao)
+                    + indicadores.classificar_instalacao(tipo_instalacao)
                 )
                 instalacao_id = cursor.lastrowid
 
@@ -3134,6 +3276,11 @@ def editar_orgao(id):
                                         ('equipamento_unitizacao', eq_id, filepath, 'equipamento')
                                     )
 
+            database.gravar_oms_apoiadas(db, id)
+            database.gravar_classes_provedor(db, id)
+            database.gravar_efetivo_referencia(db, efetivo_automatico_op, id)
+            indicadores.atualizar_indicadores_op(db, id)
+            database.incrementar_versao_dados(db)
             db.commit()
 
             if updated_rows == 0:
@@ -3181,10 +3328,11 @@ def editar_orgao(id):
 
         # Calcular suprimentos se não preenchidos e houver efetivo
         if efetivo_val:
+            sup_frigo, sup_secos = analise_capacidade.suprimento_estimado(efetivo_val)
             if not orgao_dict.get('suprimento_frigorificados_mensal'):
-                orgao_dict['suprimento_frigorificados_mensal'] = round(efetivo_val * 0.0004 * 22, 2)
+                orgao_dict['suprimento_frigorificados_mensal'] = sup_frigo
             if not orgao_dict.get('suprimento_secos_mensal'):
-                orgao_dict['suprimento_secos_mensal'] = round(efetivo_val * 0.00055 * 22, 2)
+                orgao_dict['suprimento_secos_mensal'] = sup_secos
 
     # Pré-carregar dados de todas as abas
     def rows_to_dicts(rows):
@@ -3330,10 +3478,11 @@ def visualizar_orgao(id):
             orgao_dict['efetivo_atendimento'] = efetivo_val
 
         if efetivo_val:
+            sup_frigo, sup_secos = analise_capacidade.suprimento_estimado(efetivo_val)
             if sup_frig_original in (None, ''):
-                orgao_dict['suprimento_frigorificados_mensal'] = round(efetivo_val * 0.0004 * 22, 2)
+                orgao_dict['suprimento_frigorificados_mensal'] = sup_frigo
             if sup_seco_original in (None, ''):
-                orgao_dict['suprimento_secos_mensal'] = round(efetivo_val * 0.00055 * 22, 2)
+                orgao_dict['suprimento_secos_mensal'] = sup_secos
         
         # Buscar energia elétrica
         energia = db.execute(
@@ -0,0 +1,115 @@
+"""Backup online do banco SQLite (``/admin/backup`` e tarefa ``backup``).
+
+``copiar`` usa a API de backup do SQLite (``sqlite3.Connection.backup``) em
+passos de ``BACKUP_PAGINAS`` páginas, com pausa de ``BACKUP_PAUSA_MS`` entre
+eles: o banco só fica com leitura aberta durante cada passo e os escritores
+seguem trabalhando. Se outra conexão escrever no meio, o SQLite recomeça a
+cópia, de modo que o resultado é sempre um instantâneo íntegro (ao contrário
+da cópia do arquivo, que pode pegar uma escrita pela metade). Passados
+``BACKUP_MAX_REINICIOS`` recomeços, a cópia é refeita com ``VACUUM INTO``,
+que lê tudo numa única transação de leitura (em WAL, sem bloquear escritas).
+
+A cópia vai para um arquivo temporário e sai compactada em gzip por
+``blocos_gzip``, bloco a bloco, sem carregar o banco na memória; quem chama
+remove o temporário com ``remover`` ao final.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+
+BACKUP_PAGINAS = int(os.getenv('BACKUP_PAGINAS', '1024'))
+BACKUP_PAUSA_MS = float(os.getenv('BACKUP_PAUSA_MS', '5'))
+BACKUP_MAX_REINICIOS = int(os.getenv('BACKUP_MAX_REINICIOS', '3'))
+NIVEL_COMPRESSAO = int(os.getenv('BACKUP_NIVEL_COMPRESSAO', '6'))
+TAMANHO_BLOCO = 1024 * 1024
+
+EXTENSAO = '.db.gz'
+MIMETYPE = 'application/gzip'
+
+
+class _ReiniciosExcedidos(Exception):
+    pass
+
+
+def copiar(db, destino, paginas=BACKUP_PAGINAS, pausa_ms=BACKUP_PAUSA_MS, max_reinicios=BACKUP_MAX_REINICIOS):
+    """Grava em ``destino`` um instantâneo consistente do banco de ``db``; retorna o tamanho em bytes."""
+    pausa = pausa_ms / 1000
+    estado = {'restantes': None, 'reinicios': 0}
+
+    def entre_passos(status, restantes, total):
+        # Páginas restantes aumentando: outra conexão escreveu e a cópia recomeçou
+        if estado['restantes'] is not None and restantes > estado['restantes']:
+            estado['reinicios'] += 1
+            if estado['reinicios'] > max_reinicios:
+                raise _ReiniciosExcedidos()
+        estado['restantes'] = restantes
+        if restantes and pausa:
+            time.sleep(pausa)
+
+    copia = sqlite3.connect(destino)
+    try:
+        try:
+            db.backup(copia, pages=paginas, progress=entre_passos)
+        except _ReiniciosExcedidos:
+            copia.close()
+            remover(destino)
+            print(f"⚠ Backup recomeçou {estado['reinicios']} vezes por escritas concorrentes; usando VACUUM INTO")
+            db.execute('VACUUM INTO ?', (destino,))
+            copia = sqlite3.connect(destino)
+        # O cabeçalho copiado mantém o modo WAL do original; o backup fica autocontido
+        copia.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        copia.close()
+    return os.path.getsize(destino)
+
+
+def blocos_gzip(caminho, tamanho_bloco=TAMANHO_BLOCO, nivel=NIVEL_COMPRESSAO):
+    """Conteúdo de ``caminho`` compactado em gzip, em blocos de bytes."""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits 31: formato gzip
+    with open(caminho, 'rb') as arquivo:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                break
+            compactado = compressor.compress(bloco)
+            if compactado:
+                yield compactado
+    yield compressor.flush()
+
+
+def arquivo_temporario():
+    """Caminho de um arquivo temporário novo para a cópia (remover com ``remover``)."""
+    descritor, caminho = tempfile.mkstemp(prefix='backup_op_', suffix='.db')
+    os.close(descritor)
+    return caminho
+
+
+def remover(caminho):
+    for sufixo in ('', '-journal', '-wal', '-shm'):
+        try:
+            os.remove(caminho + sufixo)
+        except FileNotFoundError:
+            pass
+
+
+def gerar_arquivo(db, destino):
+    """Backup compactado gravado em ``destino`` (tarefas em segundo plano); registra tempo e tamanhos."""
+    inicio = time.perf_counter()
+    temporario = arquivo_temporario()
+    try:
+        tamanho = copiar(db, temporario)
+        compactado = 0
+        with open(destino, 'wb') as saida:
+            for bloco in blocos_gzip(temporario):
+                saida.write(bloco)
+                compactado += len(bloco)
+    finally:
+        remover(temporario)
+    registrar(inicio, tamanho, compactado)
+
+
+def registrar(inicio, tamanho, compactado):
+    print(f"✓ Backup do banco gerado em {(time.perf_counter() - inicio) * 1000:.0f} ms: "
+          f"{tamanho / 1024 / 1024:.2f} MiB, {compactado / 1024 / 1024:.2f} MiB compactado")
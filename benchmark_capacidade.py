@@ -0,0 +1,113 @@
+"""Benchmark da análise de cobertura: laço por OP x ``analise_capacidade`` (NumPy).
+
+Gera colunas sintéticas de OPs (com NULLs/zeros como no banco), calcula as
+métricas de cobertura OP a OP em Python — como faziam ``visualizar_orgao`` e
+o cálculo de ``frigo_deficit`` — e com ``analise_capacidade.calcular``,
+confere que os valores coincidem e mede o tempo dos dois para o cenário atual
+e para uma simulação (efetivo +20%).
+
+    python benchmark_capacidade.py --ops 1000 10000 100000
+"""
+import argparse
+import math
+import random
+import time
+
+import analise_capacidade as ac
+
+
+def gerar_base(ops, rnd):
+    def talvez(valor, p=0.2):
+        return 0 if rnd.random() < p else valor
+    colunas = {
+        'efetivo': [talvez(rnd.randint(100, 20000), 0.1) for _ in range(ops)],
+        'consumo_secos': [talvez(rnd.uniform(1, 80)) for _ in range(ops)],
+        'consumo_frigo': [talvez(rnd.uniform(1, 60)) for _ in range(ops)],
+        'suprimento_secos': [talvez(rnd.uniform(1, 120), 0.5) for _ in range(ops)],
+        'suprimento_frigo': [talvez(rnd.uniform(1, 90), 0.5) for _ in range(ops)],
+        'capacidade_seco': [talvez(rnd.uniform(0, 900)) for _ in range(ops)],
+        'capacidade_frigo': [talvez(rnd.uniform(0, 300)) for _ in range(ops)],
+        'area_disponivel': [talvez(rnd.uniform(0, 5000), 0.6) for _ in range(ops)],
+    }
+    return ac.BaseCapacidade(range(1, ops + 1), [f'OP{i}' for i in range(1, ops + 1)],
+                             [rnd.choice(['CMSE', 'CMS', 'CMNE', '10ª RM']) for _ in range(ops)], colunas)
+
+
+def calcular_por_op(base, efetivo=0.0, consumo=0.0, capacidade=0.0):
+    """Mesmas métricas, um OP por vez (referência)."""
+    fator_efetivo = 1 + efetivo / 100
+    fator_consumo = fator_efetivo * (1 + consumo / 100)
+    fator_capacidade = 1 + capacidade / 100
+    resultado = []
+    for i in range(len(base)):
+        efetivo_op = float(base.efetivo[i]) * fator_efetivo
+        cons_seco = float(base.consumo_secos[i]) * fator_consumo
+        cons_frigo = float(base.consumo_frigo[i]) * fator_consumo
+        cap_seco = float(base.capacidade_seco[i]) * fator_capacidade
+        cap_frigo = float(base.capacidade_frigo[i]) * fator_capacidade
+        sup_frigo = float(base.suprimento_frigo[i]) or efetivo_op * 0.0004 * 22
+        sup_seco = float(base.suprimento_secos[i]) or efetivo_op * 0.00055 * 22
+        cob_seco = cap_seco / cons_seco if cons_seco else 0
+        cob_frigo = cap_frigo / cons_frigo if cons_frigo else 0
+        resultado.append({
+            'cobertura_secos': cob_seco,
+            'cobertura_frigo': cob_frigo,
+            'deficit_frigo': bool(cons_frigo and cob_frigo < 4),
+            'estoque_ok': cob_seco >= 3 and cob_frigo >= 3,
+            'falta_frigo_ton': max(4 * cons_frigo - cap_frigo, 0) if cons_frigo else 0,
+            'saldo_secos': sup_seco - cons_seco,
+            'saldo_frigo': sup_frigo - cons_frigo,
+            'consumo_suprimento_frigo': cons_frigo / sup_frigo * 100 if sup_frigo else 0,
+        })
+    # Ranking de criticidade: menor cobertura frigorificada primeiro, OPs sem consumo no fim
+    ordem = sorted(range(len(resultado)),
+                   key=lambda i: (resultado[i]['cobertura_frigo'] if base.consumo_frigo[i] else math.inf, i))
+    for posicao, i in enumerate(ordem, 1):
+        resultado[i]['ranking_frigo'] = posicao
+    return resultado
+
+
+def _iguais(por_op, vetorizado):
+    for i, esperado in enumerate(por_op):
+        for chave, valor in esperado.items():
+            obtido = vetorizado[chave][i]
+            if isinstance(valor, bool):
+                if bool(obtido) != valor:
+                    return False
+            elif not math.isclose(valor, float(obtido), rel_tol=1e-9, abs_tol=1e-9):
+                return False
+    return True
+
+
+def _cronometrar(func, repeticoes=3):
+    melhor = math.inf
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, melhor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--semente', type=int, default=3)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semente)
+    print(f"{'OPs':>8}{'cenário':>12}{'por OP':>12}{'NumPy':>12}{'ganho':>8}  resultado")
+    todos_ok = True
+    for ops in args.ops:
+        base = gerar_base(ops, rnd)
+        for nome, variacao in (('atual', {}), ('efetivo+20%', {'efetivo': 20.0})):
+            por_op, ms_por_op = _cronometrar(lambda: calcular_por_op(base, **variacao))
+            vetorizado, ms_numpy = _cronometrar(lambda: ac.calcular(base, **variacao))
+            ok = _iguais(por_op, vetorizado)
+            todos_ok = todos_ok and ok
+            print(f"{ops:>8}{nome:>12}{ms_por_op:>9.1f} ms{ms_numpy:>9.2f} ms{ms_por_op / ms_numpy:>7.0f}x"
+                  f"  {'✓ idêntico' if ok else '✗ DIFERENTE'}")
+    raise SystemExit(0 if todos_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark do contexto de template: injeção global ansiosa x contexto por template.
+
+Para cada rota, faz as mesmas requisições (sessão de administrador, banco
+atual) com o ``utility_processor`` anterior — que resolvia a carga de
+referência e montava todos os mapas em toda renderização — e com o contexto
+atual (helpers baratos, ``now`` preguiçoso e mapas só nos templates que os
+declaram em ``CONTEXTO_POR_TEMPLATE``). Mede o tempo de montagem do contexto,
+o tempo total da requisição e as alocações (tracemalloc) por requisição.
+
+    python benchmark_contexto.py --repeticoes 50 / /cadastro /usuarios /perfil
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from flask import before_render_template
+
+import app as aplicacao
+import database
+
+
+def utility_processor_anterior():
+    """Implementação anterior do context processor (referência)."""
+    ref = aplicacao.referencias_atuais()
+    return dict(
+        get_posto_display=aplicacao.get_posto_display,
+        get_sigla_orgao=aplicacao.get_sigla_orgao,
+        get_ug_codom=aplicacao.get_ug_codom,
+        ORGÃOS_PROVEDORES=aplicacao.ORGÃOS_PROVEDORES,
+        DADOS_OMS=ref.DADOS_OMS,
+        DADOS_UG_CODOM=ref.DADOS_UG_CODOM,
+        DADOS_SUBORDINACAO=ref.DADOS_SUBORDINACAO,
+        LISTA_OMS=ref.LISTA_OMS,
+        POSTO_MAP=aplicacao.POSTO_MAP,
+        POSTO_KEYS=aplicacao.POSTO_KEYS,
+        ARMA_QUADROS=aplicacao.ARMA_QUADROS,
+        ESPECIALIDADES=aplicacao.ESPECIALIDADES,
+        now=aplicacao.datetime.now()
+    )
+
+
+def usar_contexto(anterior):
+    app = aplicacao.app
+    processadores = app.template_context_processors[None]
+    atual, antigo = aplicacao.utility_processor, utility_processor_anterior
+    processadores[:] = [p for p in processadores if p not in (atual, antigo)]
+    processadores.append(antigo if anterior else atual)
+    if anterior:
+        before_render_template.disconnect(aplicacao.contexto_do_template, sender=app)
+    else:
+        before_render_template.connect(aplicacao.contexto_do_template, sender=app)
+
+
+def cliente_admin():
+    db = database.get_db()
+    user = db.execute("SELECT * FROM usuarios WHERE nivel_acesso = 'admin' AND ativo = 1 LIMIT 1").fetchone()
+    if user is None:
+        raise SystemExit('Nenhum administrador ativo no banco.')
+    cliente = aplicacao.app.test_client()
+    with cliente.session_transaction() as sessao:
+        for chave in ('id', 'username', 'nome_completo', 'nome_guerra', 'nivel_acesso', 'orgao_provedor'):
+            sessao['user_id' if chave == 'id' else chave] = user[chave]
+    return cliente
+
+
+class Cronometro:
+    """Acumula o tempo gasto em ``app.update_template_context`` (context processors)."""
+
+    def __init__(self, app):
+        self.total = 0.0
+        original = app.update_template_context
+
+        def medido(context):
+            inicio = time.perf_counter()
+            original(context)
+            self.total += time.perf_counter() - inicio
+        app.update_template_context = medido
+
+
+def medir_rota(cliente, cronometro, url, repeticoes):
+    cliente.get(url)  # aquecimento (compilação do template, caches)
+    tempos, contexto, alocado, pico = [], [], [], []
+    for _ in range(repeticoes):
+        cronometro.total = 0.0
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        resposta = cliente.get(url)
+        tempos.append(time.perf_counter() - inicio)
+        atual, maximo = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        contexto.append(cronometro.total)
+        alocado.append(atual)
+        pico.append(maximo)
+        if resposta.status_code != 200:
+            raise SystemExit(f'{url}: HTTP {resposta.status_code}')
+    return (statistics.median(contexto) * 1e6, statistics.median(tempos) * 1000,
+            statistics.median(pico) / 1024, len(resposta.data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rotas', nargs='*', default=['/', '/cadastro', '/usuarios', '/perfil', '/admin'])
+    parser.add_argument('--repeticoes', type=int, default=30)
+    args = parser.parse_args()
+
+    app = aplicacao.app
+    app.config['TESTING'] = True
+    aplicacao.limiter.enabled = False
+    cronometro = Cronometro(app)
+
+    with app.app_context():
+        cliente = cliente_admin()
+    print(f"{'rota':12}{'contexto':>22}{'requisição':>24}{'pico de memória':>26}{'HTML':>12}")
+    print(f"{'':12}{'anterior':>11}{'atual':>11}{'anterior':>12}{'atual':>12}{'anterior':>13}{'atual':>13}{'iguais':>12}")
+    for url in args.rotas:
+        usar_contexto(anterior=True)
+        ctx_a, req_a, pico_a, tam_a = medir_rota(cliente, cronometro, url, args.repeticoes)
+        usar_contexto(anterior=False)
+        ctx_n, req_n, pico_n, tam_n = medir_rota(cliente, cronometro, url, args.repeticoes)
+        print(f"{url:12}{ctx_a:8.1f} µs{ctx_n:8.1f} µs{req_a:9.1f} ms{req_n:9.1f} ms"
+              f"{pico_a:10.0f} KiB{pico_n:10.0f} KiB{'sim' if tam_a == tam_n else 'não':>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Benchmark dos agregados do painel: bateria de consultas por OP x uma leitura por tabela.
+
+Gera um banco SQLite sintético (schema completo via ``database.migrar``) com
+alguns milhares de OPs e suas instalações, empilhadeiras, sistemas,
+equipamentos, viaturas, pessoal, geradores e energia; confere que
+``indicadores.calcular_indicadores`` devolve os mesmos valores do conjunto de
+consultas anterior e mede o tempo de recalcular todos os OPs
+(``reconstruir``) e um OP isolado (rotas de escrita).
+
+    python benchmark_indicadores.py --ops 3000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+import database
+import indicadores
+from indicadores import COLUNAS_INDICADORES
+
+
+# ---------------------------------------------------------------------------
+# Implementação anterior (12 consultas por OP), mantida aqui apenas para comparação
+# ---------------------------------------------------------------------------
+
+def calcular_anterior(db, op_id):
+    ind = {}
+
+    r = db.execute('''
+        SELECT COUNT(*) as total,
+               SUM(is_deposito) as depositos
+        FROM instalacoes WHERE orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()
+    ind['instalacoes_total'] = r['total'] or 0
+    ind['depositos_total'] = r['depositos'] or 0
+
+    r = db.execute('''
+        SELECT COUNT(e.id) as total_emp,
+               SUM(COALESCE(i.capacidade_toneladas, 0)) as cap_estoque
+        FROM instalacoes i
+        LEFT JOIN empilhadeiras e ON e.instalacao_id = i.id
+        WHERE i.orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()
+    ind['emp_total'] = r['total_emp'] or 0
+    ind['emp_cap_estoque'] = r['cap_estoque'] or 0
+
+    situacoes = {}
+    for r in db.execute('''
+        SELECT LOWER(COALESCE(e.situacao,'')) as situacao,
+               COALESCE(SUM(COALESCE(e.quantidade,1)),0) as total
+        FROM empilhadeiras e
+        JOIN instalacoes i ON i.id = e.instalacao_id
+        WHERE i.orgao_provedor_id = ?
+        GROUP BY LOWER(COALESCE(e.situacao,''))
+    ''', (op_id,)).fetchall():
+        situacoes[r['situacao'] or 'indefinida'] = r['total'] or 0
+    ind['emp_situacoes'] = json.dumps(situacoes)
+
+    ind['sistemas_total'] = db.execute('''
+        SELECT COUNT(s.id) FROM sistemas_seguranca s
+        JOIN instalacoes i ON s.instalacao_id = i.id
+        WHERE i.orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()[0] or 0
+
+    ind['equipamentos_total'] = db.execute('''
+        SELECT COUNT(eq.id) FROM equipamentos_unitizacao eq
+        JOIN instalacoes i ON eq.instalacao_id = i.id
+        WHERE i.orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()[0] or 0
+
+    r = db.execute('''
+        SELECT COUNT(*) as total,
+               COALESCE(SUM(capacidade_carga_kg),0) as cap_total,
+               COALESCE(SUM(CASE WHEN is_frigo = 1 THEN capacidade_carga_kg ELSE 0 END),0) as cap_frigo,
+               COALESCE(SUM(CASE WHEN is_frigo = 1 THEN 0 ELSE capacidade_carga_kg END),0) as cap_seco
+        FROM viaturas WHERE orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()
+    ind['viaturas_total'] = r['total'] or 0
+    ind['viaturas_cap_total'] = r['cap_total'] or 0
+    ind['viaturas_cap_frigo'] = r['cap_frigo'] or 0
+    ind['viaturas_cap_seco'] = r['cap_seco'] or 0
+
+    r = db.execute('''
+        SELECT COUNT(*) as vte_total,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 0 THEN 1 ELSE 0 END) as bau_seco_total,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 0 AND situacao = 'operacional' THEN 1 ELSE 0 END) as bau_seco_operacional,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 0 AND situacao = 'em_manutencao' THEN 1 ELSE 0 END) as bau_seco_manutencao,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 0 AND situacao IN ('inoperante','baixada') THEN 1 ELSE 0 END) as bau_seco_inoperante,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 1 THEN 1 ELSE 0 END) as bau_frigo_total,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 1 AND situacao = 'operacional' THEN 1 ELSE 0 END) as bau_frigo_operacional,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 1 AND situacao = 'em_manutencao' THEN 1 ELSE 0 END) as bau_frigo_manutencao,
+               SUM(CASE WHEN is_bau = 1 AND is_frigo = 1 AND situacao IN ('inoperante','baixada') THEN 1 ELSE 0 END) as bau_frigo_inoperante
+        FROM viaturas
+        WHERE orgao_provedor_id = ? AND is_vte = 1
+    ''', (op_id,)).fetchone()
+    for chave in r.keys():
+        ind[chave] = r[chave] or 0
+
+    r = db.execute('''
+        SELECT COUNT(*) as registros, COALESCE(SUM(quantidade),0) as total
+        FROM pessoal WHERE orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()
+    ind['pessoal_registros'] = r['registros'] or 0
+    ind['pessoal_total'] = r['total'] or 0
+    por_posto = {}
+    for r in db.execute('''
+        SELECT posto_graduacao, COALESCE(SUM(quantidade),0) as total
+        FROM pessoal WHERE orgao_provedor_id = ?
+        GROUP BY posto_graduacao
+    ''', (op_id,)).fetchall():
+        por_posto[r['posto_graduacao'] or 'outro'] = r['total'] or 0
+    ind['pessoal_por_posto'] = json.dumps(por_posto)
+
+    r = db.execute('''
+        SELECT COUNT(*) as total,
+               COALESCE(SUM(capacidade_kva),0) as cap_kva,
+               SUM(CASE WHEN situacao = 'operacional' THEN 1 ELSE 0 END) as operacional,
+               SUM(CASE WHEN situacao = 'em_manutencao' THEN 1 ELSE 0 END) as manutencao,
+               SUM(CASE WHEN situacao = 'baixada' THEN 1 ELSE 0 END) as baixada
+        FROM geradores WHERE orgao_provedor_id = ?
+    ''', (op_id,)).fetchone()
+    ind['geradores_total'] = r['total'] or 0
+    ind['geradores_cap_kva'] = r['cap_kva'] or 0
+    ind['geradores_operacional'] = r['operacional'] or 0
+    ind['geradores_manutencao'] = r['manutencao'] or 0
+    ind['geradores_baixada'] = r['baixada'] or 0
+
+    energia = db.execute('''
+        SELECT dimensionamento_adequado, capacidade_total_kva
+        FROM energia_eletrica WHERE orgao_provedor_id = ?
+        ORDER BY id DESC LIMIT 1
+    ''', (op_id,)).fetchone()
+    ind['energia_registros'] = 1 if energia else 0
+    ind['energia_dimensionamento'] = energia['dimensionamento_adequado'] if energia else None
+    ind['energia_capacidade_kva'] = energia['capacidade_total_kva'] if energia else None
+
+    r = db.execute('''
+        SELECT COUNT(DISTINCT CASE WHEN s.id IS NOT NULL THEN i.id END) as depositos_com_sis,
+               COUNT(s.id) as sistemas_total,
+               SUM(CASE WHEN LOWER(COALESCE(s.situacao,'')) = 'operacional' THEN 1 ELSE 0 END) as sis_operacional,
+               SUM(CASE WHEN LOWER(COALESCE(s.situacao,'')) = 'em_manutencao' THEN 1 ELSE 0 END) as sis_manutencao,
+               SUM(CASE WHEN LOWER(COALESCE(s.situacao,'')) = 'inoperante' THEN 1 ELSE 0 END) as sis_inoperante
+        FROM instalacoes i
+        LEFT JOIN sistemas_seguranca s ON s.instalacao_id = i.id
+        WHERE i.orgao_provedor_id = ? AND i.is_deposito = 1
+    ''', (op_id,)).fetchone()
+    ind['dep_com_sistema'] = r['depositos_com_sis'] or 0
+    ind['dep_sistemas_total'] = r['sistemas_total'] or 0
+    ind['dep_sis_operacional'] = r['sis_operacional'] or 0
+    ind['dep_sis_manutencao'] = r['sis_manutencao'] or 0
+    ind['dep_sis_inoperante'] = r['sis_inoperante'] or 0
+
+    vert = {}
+    for r in db.execute('''
+        SELECT deposito_classe, LOWER(COALESCE(verticalizacao, '')) as verticalizacao
+        FROM instalacoes
+        WHERE orgao_provedor_id = ? AND deposito_classe != ''
+    ''', (op_id,)).fetchall():
+        cl_key = r['deposito_classe']
+        entry = vert.setdefault(cl_key, {'verticalizado': 0, 'nao_verticalizado': 0, 'total': 0})
+        if (r['verticalizacao'] or '').startswith('vertical'):
+            entry['verticalizado'] += 1
+        else:
+            entry['nao_verticalizado'] += 1
+        entry['total'] += 1
+    ind['verticalizacao'] = json.dumps(vert)
+
+    orgao = db.execute('''
+        SELECT capacidade_total_toneladas_seco, consumo_frigorificados_mensal, area_edificavel_disponivel
+        FROM orgao_provedor WHERE id = ?
+    ''', (op_id,)).fetchone()
+    cap_frigo = (orgao['capacidade_total_toneladas_seco'] or 0) if orgao else 0
+    cons_frigo = (orgao['consumo_frigorificados_mensal'] or 0) if orgao else 0
+    cobertura = (cap_frigo / cons_frigo) if cons_frigo else 0
+    ind['frigo_cap'] = cap_frigo
+    ind['frigo_consumo'] = cons_frigo
+    ind['frigo_area_disp'] = (orgao['area_edificavel_disponivel'] or 0) if orgao else 0
+    ind['frigo_cobertura'] = cobertura
+    # Déficit apenas quando existe consumo declarado e cobertura < 4 FC
+    ind['frigo_deficit'] = 1 if (cons_frigo and cobertura < 4) else 0
+
+    return ind
+
+
+# ---------------------------------------------------------------------------
+
+def gerar_banco(caminho, ops, semente=42):
+    """Cria e popula o banco sintético em ``caminho``."""
+    rnd = random.Random(semente)
+    db = database.conectar(caminho)
+    database.migrar(db)
+    tipos_inst = ['deposito_cl1', 'deposito_cl2', 'deposito_cl5', 'deposito_cl10', 'DEPOSITO_CL3',
+                  'Depósito geral', 'frigorifico', 'administrativo', 'oficina']
+    especializacoes = [None, 'Baú', 'bau seco', 'BAU FRIGO', 'Baú Frigorífico', 'frigorifica', 'carga seca', 'tanque']
+    postos = ['coronel', 'major', 'capitao', 'tenente', 'sargento', 'cabo', 'soldado']
+    placa = 0
+    for op in range(1, ops + 1):
+        db.execute('''INSERT INTO orgao_provedor (id, nome, sigla, subordinacao, efetivo_atendimento,
+                      consumo_frigorificados_mensal, capacidade_total_toneladas_seco, area_edificavel_disponivel)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                   (op, f'OP {op}', f'OP{op}', 'CMSE', rnd.randint(0, 5000),
+                    rnd.choice([0, None, rnd.uniform(1, 100)]), rnd.choice([None, rnd.uniform(0, 800)]),
+                    rnd.uniform(0, 5000)))
+        for _ in range(rnd.randint(0, 8)):
+            tipo = rnd.choice(tipos_inst)
+            inst = db.execute('''INSERT INTO instalacoes (orgao_provedor_id, tipo_instalacao, capacidade_toneladas,
+                                 verticalizacao, is_deposito, deposito_classe) VALUES (?, ?, ?, ?, ?, ?)''',
+                              (op, tipo, rnd.choice([None, rnd.randint(10, 900), rnd.uniform(5, 500)]),
+                               rnd.choice([None, 'verticalizado', 'Vertical', 'nao_verticalizado']))
+                              + indicadores.classificar_instalacao(tipo)).lastrowid
+            for _ in range(rnd.choice([0, 0, 1, 2, 3])):
+                db.execute('INSERT INTO empilhadeiras (instalacao_id, tipo, quantidade, situacao) VALUES (?, ?, ?, ?)',
+                           (inst, 'eletrica', rnd.choice([None, 1, 2, 4]),
+                            rnd.choice(['disponivel', 'indisponivel_recuperavel', 'indisponivel'])))
+            for _ in range(rnd.choice([0, 0, 1, 2])):
+                db.execute('INSERT INTO sistemas_seguranca (instalacao_id, tipo, situacao) VALUES (?, ?, ?)',
+                           (inst, 'cftv', rnd.choice([None, 'operacional', 'inoperante', 'em_manutencao'])))
+            for _ in range(rnd.choice([0, 1, 2])):
+                db.execute('INSERT INTO equipamentos_unitizacao (instalacao_id, tipo, situacao) VALUES (?, ?, ?)',
+                           (inst, 'palete', rnd.choice([None, 'operacional', 'inoperante'])))
+        for _ in range(rnd.randint(0, 10)):
+            placa += 1
+            tipo, esp = rnd.choice(['VTE 5t', 'vte 2,5t', 'Caminhão', 'VTL']), rnd.choice(especializacoes)
+            db.execute('''INSERT INTO viaturas (orgao_provedor_id, categoria, tipo_veiculo, especializacao, placa,
+                          capacidade_carga_kg, situacao, is_frigo, is_bau, is_vte)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                       (op, 'carga', tipo, esp, f'EB{placa:07d}', rnd.choice([None, rnd.randint(500, 12000)]),
+                        rnd.choice(['operacional', 'inoperante', 'em_manutencao', 'baixada']))
+                       + indicadores.classificar_viatura(tipo, esp))
+        for _ in range(rnd.randint(0, 8)):
+            db.execute('''INSERT INTO pessoal (orgao_provedor_id, posto_graduacao, arma_quadro_servico, tipo_servico,
+                          quantidade) VALUES (?, ?, ?, ?, ?)''',
+                       (op, rnd.choice(postos), 'Intendência', rnd.choice(['carreira', 'temporario']),
+                        rnd.randint(1, 30)))
+        for _ in range(rnd.randint(0, 4)):
+            db.execute('INSERT INTO geradores (orgao_provedor_id, capacidade_kva, situacao) VALUES (?, ?, ?)',
+                       (op, rnd.choice([50, 75.5, 150, 260]), rnd.choice(['operacional', 'em_manutencao', 'baixada'])))
+        for _ in range(rnd.choice([0, 1, 1, 2])):
+            db.execute('''INSERT INTO energia_eletrica (orgao_provedor_id, dimensionamento_adequado, capacidade_total_kva)
+                          VALUES (?, ?, ?)''',
+                       (op, rnd.choice(['adequado', 'insuficiente', 'precario']), rnd.uniform(50, 900)))
+    db.execute('ANALYZE')
+    db.commit()
+    return db
+
+
+def _iguais(a, b):
+    for coluna in COLUNAS_INDICADORES:
+        x, y = a[coluna], b[coluna]
+        if coluna in ('emp_situacoes', 'pessoal_por_posto', 'verticalizacao'):
+            # Mesmo conteúdo e mesma ordem das chaves
+            if list(json.loads(x).items()) != list(json.loads(y).items()):
+                return False
+        elif isinstance(x, float) or isinstance(y, float):
+            # Somas parciais em outra ordem podem divergir no último bit
+            if not math.isclose(x, y, rel_tol=1e-12, abs_tol=1e-9):
+                return False
+        elif x != y:
+            return False
+    return True
+
+
+def _cronometrar(func, repeticoes=1):
+    """(resultado, menor tempo em ms entre ``repeticoes`` execuções)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=3000)
+    parser.add_argument('--amostra', type=int, default=200, help='OPs usados na medição de um OP isolado')
+    parser.add_argument('--repeticoes', type=int, default=5, help='medições por cenário (vale a menor)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"Gerando banco sintético com {args.ops} OPs...")
+        db = gerar_banco(os.path.join(diretorio, 'sintetico.db'), args.ops)
+        try:
+            ids = [r[0] for r in db.execute('SELECT id FROM orgao_provedor ORDER BY id')]
+            anterior, ms_anterior = _cronometrar(lambda: {i: calcular_anterior(db, i) for i in ids}, args.repeticoes)
+            novo, ms_novo = _cronometrar(lambda: indicadores.calcular_indicadores(db), args.repeticoes)
+            ok = set(anterior) == set(novo) and all(_iguais(anterior[i], novo[i]) for i in ids)
+
+            amostra = random.Random(1).sample(ids, min(args.amostra, len(ids)))
+            _, ms_um_anterior = _cronometrar(lambda: [calcular_anterior(db, i) for i in amostra], args.repeticoes)
+            um_novo, ms_um_novo = _cronometrar(lambda: [indicadores.calcular_indicadores(db, i)[i] for i in amostra],
+                                               args.repeticoes)
+            ok = ok and all(_iguais(anterior[i], n) for i, n in zip(amostra, um_novo))
+        finally:
+            db.close()
+
+    print(f"{'':20}{'anterior':>12}{'atual':>12}{'ganho':>8}")
+    print(f"{'todos os OPs':20}{ms_anterior:9.0f} ms{ms_novo:9.0f} ms{ms_anterior / max(ms_novo, 0.001):7.1f}x")
+    por_op_a, por_op_n = ms_um_anterior / len(amostra), ms_um_novo / len(amostra)
+    print(f"{'um OP (média)':20}{por_op_a:9.2f} ms{por_op_n:9.2f} ms{por_op_a / max(por_op_n, 0.001):7.1f}x")
+    print('✓ Resultados idênticos' if ok else '✗ Resultados DIFERENTES')
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Benchmark dos carregadores de referência: versão vetorizada x iterrows.
+
+Gera uma pasta de trabalho sintética (CODOM + Vinculo_OM + Efetivo) com
+duplicatas, células vazias, acentos e valores não numéricos, confere que as
+duas implementações produzem exatamente os mesmos dicionários (inclusive a
+ordem das chaves) e mede o tempo de cada uma.
+
+    python benchmark_referencia.py --linhas 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import dados_referencia
+
+
+# ---------------------------------------------------------------------------
+# Implementação anterior (linha a linha), mantida aqui apenas para comparação
+# ---------------------------------------------------------------------------
+
+def _normalizar_iterrows(valor):
+    if valor is None:
+        return ''
+    texto = ''.join(c for c in unicodedata.normalize('NFKD', str(valor)) if not unicodedata.combining(c))
+    texto = texto.upper().replace('º', '').replace('ª', '')
+    return ' '.join(texto.split())
+
+
+def codom_iterrows(df):
+    dados_oms, dados_ug_codom, dados_subordinacao = {}, {}, {}
+    for _, row in df.iterrows():
+        sigla = str(row.get('SIGLA', '')).strip()
+        codom = str(row.get('CODOM', '')).strip()
+        ug = str(row.get('UG', '')).strip()
+        subordinacao = ''
+        if 'SUBORDINACAO' in row.index:
+            subordinacao = str(row.get('SUBORDINACAO', '')).strip()
+        elif 'SUBORDINAÇÃO' in row.index:
+            subordinacao = str(row.get('SUBORDINAÇÃO', '')).strip()
+        if sigla and sigla != 'nan' and sigla not in dados_oms:
+            dados_oms[sigla] = {'CODOM': codom, 'UG': ug, 'SUBORDINACAO': subordinacao}
+        if sigla and sigla != 'nan':
+            dados_ug_codom[sigla] = {'CODOM': codom, 'UG': ug, 'SUBORDINACAO': subordinacao}
+        if codom and codom != 'nan' and subordinacao:
+            dados_subordinacao[codom] = subordinacao
+    return dados_oms, dados_ug_codom, dados_subordinacao
+
+
+def vinculo_efetivo_iterrows(df_vinculo, df_efetivo):
+    vinculo_por_op, efetivo_por_om, rm_por_op = {}, {}, {}
+    for _, row in df_vinculo.iterrows():
+        om_sigla = str(row.get('SIGLA OM', '')).strip()
+        op_sigla = str(row.get('SIGLA OM VINC OP', '')).strip()
+        rm = str(row.get('RM', '')).strip()
+        chave_op = _normalizar_iterrows(op_sigla)
+        if chave_op and om_sigla:
+            vinculo_por_op.setdefault(chave_op, []).append({
+                'sigla': om_sigla,
+                'codom': str(row.get('COD OM', '')).strip(),
+                'ug': str(row.get('COD UG', '')).strip(),
+                'codom_op': str(row.get('COD OM VINC OP', '')).strip(),
+                'ug_op': str(row.get('COD UG VINC OP', '')).strip()
+            })
+        if chave_op and rm:
+            rm_por_op[chave_op] = rm
+    for _, row in df_efetivo.iterrows():
+        chave_om = _normalizar_iterrows(str(row.get('SIGLA OM', '')).strip())
+        efetivo = row.get('MEDIA EFETIVO ATIVA')
+        if chave_om and pd.notna(efetivo):
+            try:
+                efetivo_por_om[chave_om] = int(float(efetivo))
+            except Exception:
+                continue
+    return vinculo_por_op, efetivo_por_om, rm_por_op
+
+
+# ---------------------------------------------------------------------------
+
+def gerar_planilhas(diretorio, linhas, semente=42):
+    """Grava CODOM.xlsx e Dados.xlsx sintéticos em ``diretorio``."""
+    rnd = random.Random(semente)
+    prefixos = ['B Log', 'Cia Dep', 'Pq R Mnt', 'BI', 'BC', 'Gpt Log', 'Cia Sup', 'Ba Adm', 'Cmdo Rg', 'Hosp Gu']
+    sufixos = ['', ' Mec', ' Bld', ' Sl', ' Amv', ' Pqdt', ' Fron', ' Ind']
+    n_siglas = max(10, linhas // 3)
+    siglas = [f"{rnd.randint(1, 99)}º {rnd.choice(prefixos)}{rnd.choice(sufixos)} {i}" for i in range(n_siglas)]
+    ops = [f"{rnd.randint(1, 30)}º B Sup {'São' if i % 3 == 0 else 'Rio'} {i}" for i in range(max(5, linhas // 200))]
+
+    def talvez_vazio(valor, p=0.02):
+        return np.nan if rnd.random() < p else valor
+
+    codom = pd.DataFrame({
+        'CODOM': [talvez_vazio(rnd.randint(1000, 99999)) for _ in range(linhas)],
+        'SIGLA': [talvez_vazio(f"  {rnd.choice(siglas)} " if rnd.random() < 0.05 else rnd.choice(siglas)) for _ in range(linhas)],
+        'UG': [talvez_vazio(str(rnd.randint(160000, 169999))) for _ in range(linhas)],
+        'SUBORDINAÇÃO': [talvez_vazio(rnd.choice(['1ª RM', '2ª RM', '3ª RM', 'CML', 'CMSE', '']), 0.2) for _ in range(linhas)],
+    })
+    vinculo = pd.DataFrame({
+        'RM': [talvez_vazio(f"{rnd.randint(1, 12)}ª RM") for _ in range(linhas)],
+        'COD UG': [rnd.randint(160000, 169999) for _ in range(linhas)],
+        'COD OM': [rnd.randint(1000, 99999) for _ in range(linhas)],
+        'SIGLA OM': [talvez_vazio(rnd.choice(siglas)) for _ in range(linhas)],
+        'COD UG VINC OP': [talvez_vazio(rnd.randint(160000, 169999)) for _ in range(linhas)],
+        'COD OM VINC OP': [talvez_vazio(rnd.randint(1000, 99999)) for _ in range(linhas)],
+        'SIGLA OM VINC OP': [talvez_vazio(rnd.choice(ops)) for _ in range(linhas)],
+    })
+    efetivo = pd.DataFrame({
+        'RM': [f"{rnd.randint(1, 12)}ª RM" for _ in range(linhas)],
+        'SIGLA OM': [talvez_vazio(rnd.choice(siglas)) for _ in range(linhas)],
+        'MEDIA EFETIVO ATIVA': [talvez_vazio(rnd.choice([rnd.randint(10, 3000), 'n/d']) if rnd.random() < 0.01
+                                             else rnd.randint(10, 3000)) for _ in range(linhas)],
+    })
+
+    caminho_codom = os.path.join(diretorio, 'CODOM.xlsx')
+    caminho_dados = os.path.join(diretorio, 'Dados.xlsx')
+    codom.to_excel(caminho_codom, index=False)
+    with pd.ExcelWriter(caminho_dados) as writer:
+        vinculo.to_excel(writer, sheet_name='Vinculo_OM', index=False)
+        efetivo.to_excel(writer, sheet_name='Efetivo', index=False)
+    return caminho_codom, caminho_dados
+
+
+def _cronometrar(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def _identicos(a, b):
+    return all(x == y and list(x) == list(y) for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=100000, help='linhas por aba sintética')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"Gerando pasta de trabalho sintética com {args.linhas} linhas por aba...")
+        caminho_codom, caminho_dados = gerar_planilhas(diretorio, args.linhas)
+
+        df_codom, ms_leitura_codom = _cronometrar(pd.read_excel, caminho_codom)
+        xl = pd.ExcelFile(caminho_dados, engine='openpyxl')
+        inicio = time.perf_counter()
+        df_vinculo = xl.parse('Vinculo_OM')
+        df_efetivo = xl.parse('Efetivo')
+        ms_leitura_dados = (time.perf_counter() - inicio) * 1000
+
+    antigo_codom, ms_antigo_codom = _cronometrar(codom_iterrows, df_codom)
+    novo_codom, ms_novo_codom = _cronometrar(dados_referencia.processar_codom, df_codom)
+    antigo_vinc, ms_antigo_vinc = _cronometrar(vinculo_efetivo_iterrows, df_vinculo, df_efetivo)
+    novo_vinc, ms_novo_vinc = _cronometrar(dados_referencia.processar_vinculo_efetivo, df_vinculo, df_efetivo)
+
+    ok = _identicos(antigo_codom, novo_codom) and _identicos(antigo_vinc, novo_vinc)
+    print(f"Leitura openpyxl (comum às duas): CODOM {ms_leitura_codom:.0f} ms, Dados {ms_leitura_dados:.0f} ms")
+    print(f"{'':22}{'iterrows':>12}{'vetorizado':>12}{'ganho':>8}")
+    for nome, antigo, novo in (('CODOM', ms_antigo_codom, ms_novo_codom),
+                               ('Vinculo_OM + Efetivo', ms_antigo_vinc, ms_novo_vinc)):
+        print(f"{nome:22}{antigo:10.0f} ms{novo:10.0f} ms{antigo / max(novo, 0.001):7.1f}x")
+    print('✓ Resultados idênticos' if ok else '✗ Resultados DIFERENTES')
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
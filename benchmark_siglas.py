@@ -0,0 +1,116 @@
+"""Microbenchmark de ``get_ug_codom``: varredura linear x ``IndiceSiglas``.
+
+Para tamanhos crescentes de ``DADOS_UG_CODOM`` sintético, confere que o índice
+devolve exatamente o mesmo resultado da varredura original para uma mistura de
+buscas (siglas exatas, trechos, siglas com sufixo extra, acentos/caixa
+diferentes, inexistentes e vazia) e mede a latência média por busca.
+
+    python benchmark_siglas.py --tamanhos 1000 10000 100000
+"""
+import argparse
+import random
+import time
+
+from dados_referencia import IndiceSiglas, normalizar_sigla_chave
+
+
+def busca_linear(dados_ug_codom, sigla):
+    """Implementação anterior de ``get_ug_codom`` (referência)."""
+    sigla_normalizada = normalizar_sigla_chave(sigla)
+    for key, value in dados_ug_codom.items():
+        key_normalizada = normalizar_sigla_chave(key)
+        if sigla_normalizada == key_normalizada:
+            return value
+        if sigla_normalizada in key_normalizada or key_normalizada in sigla_normalizada:
+            return value
+    return {'UG': '', 'CODOM': ''}
+
+
+def busca_indice(indice, sigla):
+    resultado = indice.buscar(normalizar_sigla_chave(sigla))
+    return resultado if resultado is not None else {'UG': '', 'CODOM': ''}
+
+
+def _mesmo_resultado(a, b):
+    # Mesmo objeto de DADOS_UG_CODOM, ou o valor padrão de "não encontrado" nos dois
+    return a is b or (a == b == {'UG': '', 'CODOM': ''})
+
+
+def gerar_dados(tamanho, rnd):
+    prefixos = ['B Log', 'Cia Dep', 'Pq R Mnt', 'BI', 'BC', 'Gpt Log', 'Cia Sup', 'Ba Adm', 'Cmdo Rg', 'Hosp Gu',
+                'Esqd C Mec', 'GAC', 'B E Cmb', 'Cia Com', 'Btl Pol', 'Pel PE', 'Dep Sup', 'CRO']
+    sufixos = ['', ' Mec', ' Bld', ' Sl', ' Amv', ' Pqdt', ' Fron', ' Ind', ' Mth', ' Sv']
+    dados = {}
+    i = 0
+    while len(dados) < tamanho:
+        sigla = f"{rnd.randint(1, 99)}º {rnd.choice(prefixos)}{rnd.choice(sufixos)} {i:x}"
+        dados[sigla] = {'CODOM': str(rnd.randint(1000, 99999)), 'UG': str(rnd.randint(160000, 169999)),
+                        'SUBORDINACAO': ''}
+        i += 1
+    return dados
+
+
+def gerar_buscas(dados, quantidade, rnd):
+    siglas = list(dados)
+    buscas = ['', 'ZZZ inexistente 000', 'X']
+    while len(buscas) < quantidade:
+        sigla = rnd.choice(siglas)
+        tipo = rnd.random()
+        if tipo < 0.3:
+            buscas.append(sigla)
+        elif tipo < 0.5:
+            buscas.append(sigla.upper().replace('º', 'o'))
+        elif tipo < 0.7:
+            ini = rnd.randint(0, len(sigla) - 2)
+            buscas.append(sigla[ini:ini + rnd.randint(2, 8)])
+        elif tipo < 0.85:
+            buscas.append(f"{sigla} - {rnd.choice(['Sede', 'Destacamento', 'Almox'])}")
+        else:
+            buscas.append(f"{rnd.randint(100, 999)} Inexistente {rnd.randint(0, 9999)}")
+    return buscas
+
+
+def medir(func, buscas, limite_s=2.0):
+    """Latência média (µs) por busca; limita o tempo total das versões lentas."""
+    inicio = time.perf_counter()
+    feitas = 0
+    for sigla in buscas:
+        func(sigla)
+        feitas += 1
+        if time.perf_counter() - inicio > limite_s:
+            break
+    return (time.perf_counter() - inicio) / feitas * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--buscas', type=int, default=2000)
+    parser.add_argument('--semente', type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semente)
+    print(f"{'OMs':>8}{'montagem':>12}{'linear':>14}{'índice':>12}{'ganho':>9}  resultado")
+    todos_ok = True
+    for tamanho in args.tamanhos:
+        dados = gerar_dados(tamanho, rnd)
+        buscas = gerar_buscas(dados, args.buscas, rnd)
+
+        inicio = time.perf_counter()
+        indice = IndiceSiglas(dados)
+        ms_montagem = (time.perf_counter() - inicio) * 1000
+
+        # Conferência em uma amostra (a varredura linear é cara nos tamanhos grandes)
+        amostra = buscas[:3] + rnd.sample(buscas[3:], min(200, len(buscas) - 3))
+        ok = all(_mesmo_resultado(busca_linear(dados, s), busca_indice(indice, s)) for s in amostra)
+        todos_ok = todos_ok and ok
+
+        us_linear = medir(lambda s: busca_linear(dados, s), buscas)
+        us_indice = medir(lambda s: busca_indice(indice, s), buscas)
+        print(f"{tamanho:>8}{ms_montagem:>9.0f} ms{us_linear:>11.0f} µs{us_indice:>9.1f} µs"
+              f"{us_linear / us_indice:>8.0f}x  {'✓ idêntico' if ok else '✗ DIFERENTE'}")
+    raise SystemExit(0 if todos_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
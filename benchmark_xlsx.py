@@ -0,0 +1,187 @@
+"""Benchmark das exportações XLSX: pandas/ExcelWriter x ``exportacao_xlsx`` (write-only).
+
+Gera um banco sintético com ``--linhas`` viaturas e empilhadeiras e exporta as
+duas planilhas das rotas ``admin_relatorios_*_excel`` das duas formas, cada
+exportação num processo próprio: o tempo é o da exportação e a memória é o
+pico de RSS do processo acima de um processo que só importou os módulos e
+abriu o banco. Depois confere que o conteúdo das células é o mesmo.
+
+    python benchmark_xlsx.py --linhas 100000
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import database
+import exportacao_xlsx
+
+
+def gerar_banco(caminho, linhas, semente=7):
+    rnd = random.Random(semente)
+    db = database.conectar(caminho)
+    database.migrar(db)
+    ops = max(1, linhas // 50)
+    db.executemany('INSERT INTO orgao_provedor (id, nome, sigla, subordinacao, efetivo_atendimento) VALUES (?, ?, ?, ?, ?)',
+                   [(op, f'OP {op:05d}', f'OP{op}', 'CMSE', 1000) for op in range(1, ops + 1)])
+    db.executemany('''INSERT INTO instalacoes (id, orgao_provedor_id, tipo_instalacao, descricao)
+                      VALUES (?, ?, ?, ?)''',
+                   [(op, op, 'deposito_cl1', f'Depósito, bloco {op}') for op in range(1, ops + 1)])
+    db.executemany('''INSERT INTO viaturas (orgao_provedor_id, categoria, tipo_veiculo, especializacao, placa, marca,
+                      modelo, ano_fabricacao, capacidade_carga_kg, situacao, km_atual, observacoes)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                   [(rnd.randint(1, ops), 'carga', rnd.choice(['VTE 5t', 'VTL', 'Caminhão']),
+                     rnd.choice([None, 'Baú', 'Baú Frigorífico']), f'EB{i:08d}', 'Marca', 'Modelo "X", 4x4',
+                     rnd.choice([None, rnd.randint(1990, 2024)]), rnd.choice([None, rnd.uniform(500, 12000)]),
+                     rnd.choice(['operacional', 'em_manutencao', 'baixada']), rnd.randint(0, 400000),
+                     rnd.choice([None, 'Sem observações', 'Revisão pendente; pneus novos'])) for i in range(linhas)])
+    db.executemany('''INSERT INTO empilhadeiras (instalacao_id, tipo, capacidade, quantidade, ano_fabricacao, situacao,
+                      valor_recuperacao) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                   [(rnd.randint(1, ops), rnd.choice(['eletrica', 'combustao']), rnd.choice(['2t', '3,5t']),
+                     rnd.choice([None, 1, 2]), rnd.choice([None, rnd.randint(1995, 2024)]),
+                     rnd.choice(['disponivel', 'indisponivel']), rnd.choice([None, rnd.uniform(0, 90000)]))
+                    for _ in range(linhas)])
+    db.execute('ANALYZE')
+    db.commit()
+    return db
+
+
+def exportar_anterior(db, titulo, sql):
+    """Implementação anterior das rotas (fetchall -> dicts -> DataFrame -> BytesIO)."""
+    rows = db.execute(sql).fetchall()
+    df = pd.DataFrame([dict(r) for r in rows])
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name=titulo)
+    output.seek(0)
+    return output
+
+
+def exportar_atual(db, titulo, sql):
+    return exportacao_xlsx.exportar(db, [(titulo, sql, ())])
+
+
+def _celulas(arquivo):
+    wb = load_workbook(arquivo, read_only=True)
+    try:
+        return list(wb.active.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def _iguais(a, b):
+    if len(a) != len(b):
+        return False
+    for linha_a, linha_b in zip(a, b):
+        for x, y in zip(linha_a, linha_b):
+            if isinstance(x, float) or isinstance(y, float):
+                if x is None or y is None or not math.isclose(x, y, rel_tol=1e-12):
+                    return False
+            elif x != y:
+                return False
+    return True
+
+
+PLANILHAS = {
+    'Viaturas': exportacao_xlsx.CONSULTA_VIATURAS,
+    'Empilhadeiras': exportacao_xlsx.CONSULTA_EMPILHADEIRAS,
+}
+VERSOES = {'anterior': exportar_anterior, 'atual': exportar_atual}
+
+
+def _pico_rss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+
+def medir(banco, versao, titulo, saida):
+    """Exporta uma planilha para ``saida``; retorna tempo e pico de RSS do processo."""
+    db = database.conectar(banco)
+    try:
+        if versao == 'base':
+            return {'ms': 0, 'rss_mb': _pico_rss_mb()}
+        inicio = time.perf_counter()
+        arquivo = VERSOES[versao](db, titulo, PLANILHAS[titulo])
+        ms = (time.perf_counter() - inicio) * 1000
+        with open(saida, 'wb') as destino:
+            destino.write(arquivo.read())
+        arquivo.close()
+        return {'ms': ms, 'rss_mb': _pico_rss_mb()}
+    finally:
+        db.close()
+
+
+def conferir(saidas, linhas):
+    """True se as planilhas têm as mesmas células e ``linhas`` linhas de dados."""
+    celulas = []
+    for saida in saidas:
+        with open(saida, 'rb') as arquivo:
+            celulas.append(_celulas(arquivo))
+    return _iguais(*celulas) and len(celulas[0]) == linhas + 1
+
+
+def _filho(*argumentos):
+    # Cada etapa roda num processo novo: o filho herda no fork a memória do pai,
+    # que entraria no pico de RSS medido se o pai tivesse gerado/lido os dados
+    processo = subprocess.run([sys.executable, __file__, *map(str, argumentos)],
+                              capture_output=True, text=True, check=True)
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=100000)
+    parser.add_argument('--etapa', choices=['gerar', 'medir', 'conferir'], help=argparse.SUPPRESS)
+    parser.add_argument('--banco', help=argparse.SUPPRESS)
+    parser.add_argument('--versao', choices=['base'] + list(VERSOES), help=argparse.SUPPRESS)
+    parser.add_argument('--planilha', choices=list(PLANILHAS), help=argparse.SUPPRESS)
+    parser.add_argument('--saidas', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.etapa == 'gerar':
+        gerar_banco(args.banco, args.linhas).close()
+        print(json.dumps(True))
+        return
+    if args.etapa == 'medir':
+        print(json.dumps(medir(args.banco, args.versao, args.planilha, args.saidas[0])))
+        return
+    if args.etapa == 'conferir':
+        print(json.dumps(conferir(args.saidas, args.linhas)))
+        return
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        banco = os.path.join(diretorio, 'sintetico.db')
+        print(f"Gerando banco sintético com {args.linhas} viaturas e {args.linhas} empilhadeiras...")
+        _filho('--etapa', 'gerar', '--banco', banco, '--linhas', args.linhas)
+        base = _filho('--etapa', 'medir', '--banco', banco, '--versao', 'base', '--saidas', '-')['rss_mb']
+
+        ok = True
+        print(f"{'planilha':16}{'versão':10}{'tempo':>10}{'pico RSS':>12}{'arquivo':>10}")
+        for titulo in PLANILHAS:
+            saidas = []
+            for versao in VERSOES:
+                saida = os.path.join(diretorio, f'{titulo}_{versao}.xlsx')
+                medida = _filho('--etapa', 'medir', '--banco', banco, '--versao', versao,
+                                '--planilha', titulo, '--saidas', saida)
+                tamanho = os.path.getsize(saida) / 1024 / 1024
+                print(f"{titulo:16}{versao:10}{medida['ms']:7.0f} ms{medida['rss_mb'] - base:8.1f} MiB"
+                      f"{tamanho:7.1f} MiB")
+                saidas.append(saida)
+            ok = _filho('--etapa', 'conferir', '--linhas', args.linhas, '--saidas', *saidas) and ok
+
+    print('✓ Conteúdo idêntico' if ok else '✗ Conteúdo DIFERENTE')
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Cache em memória (por worker) de payloads calculados do painel.
+
+As chaves incluem a versão dos dados (``database.versao_dados``), que toda rota
+de escrita incrementa na mesma transação; assim uma alteração invalida as
+entradas antigas em todos os workers sem comunicação entre processos. O TTL
+limita o tempo de vida mesmo sem escritas e o limite de entradas descarta as
+menos usadas (LRU).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL = float(os.getenv('PAINEL_CACHE_TTL', '300'))
+CACHE_MAX_ENTRADAS = int(os.getenv('PAINEL_CACHE_MAX', '32'))
+
+
+class CacheVersionado:
+    def __init__(self, ttl=CACHE_TTL, max_entradas=CACHE_MAX_ENTRADAS):
+        self.ttl = ttl
+        self.max_entradas = max(1, max_entradas)
+        self._lock = threading.Lock()
+        self._dados = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'expirados': 0, 'descartados': 0}
+
+    def obter(self, chave):
+        """Retorna o valor guardado ou None (ausente/expirado)."""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            expira_em, valor = item
+            if self.ttl > 0 and agora >= expira_em:
+                del self._dados[chave]
+                self._stats['expirados'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._dados.move_to_end(chave)
+            self._stats['hits'] += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self._stats['descartados'] += 1
+
+    def obter_ou_calcular(self, chave, calcular):
+        valor = self.obter(chave)
+        if valor is None:
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            st = dict(self._stats)
+            st['entradas'] = len(self._dados)
+        consultas = st['hits'] + st['misses']
+        st['taxa_acerto'] = round(st['hits'] / consultas, 3) if consultas else 0.0
+        st['ttl'] = self.ttl
+        st['max_entradas'] = self.max_entradas
+        return st
+
+
+painel = CacheVersionado()
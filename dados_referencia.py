@@ -0,0 +1,753 @@
+"""Dados de referência das planilhas (CODOM.xlsx e Dados.xlsx).
+
+Ler as planilhas com openpyxl é lento, e cada worker do gunicorn fazia isso ao
+importar ``app``. ``carregar_referencias`` guarda o resultado já compilado num
+snapshot binário (pickle) identificado pela assinatura das planilhas
+(mtime, tamanho e SHA-256). O snapshot é reaproveitado no boot e só é
+regenerado quando alguma planilha muda de conteúdo.
+
+``ReferenciasRecarregaveis`` troca os dados em tempo de execução quando as
+planilhas são atualizadas, sem reiniciar os workers.
+
+    python dados_referencia.py compilar   # força a regeneração do snapshot
+    python dados_referencia.py medir      # compara planilhas x snapshot
+"""
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_CODOM = 'CODOM.xlsx'
+ARQUIVO_DADOS = 'Dados.xlsx'
+ARQUIVO_SNAPSHOT = os.getenv('REFERENCIA_SNAPSHOT', 'referencia.snapshot')
+# Segundos entre verificações de mtime das planilhas (0 desativa a recarga automática)
+INTERVALO_VERIFICACAO = float(os.getenv('REFERENCIA_INTERVALO_VERIFICACAO', '30'))
+# Siglas de OP (como digitadas) com resultado de dados_automaticos_op memorizado por carga
+CACHE_DADOS_OP = int(os.getenv('REFERENCIA_CACHE_DADOS_OP', '4096'))
+
+# Incrementar quando o formato dos dicionários gerados pelos carregadores mudar
+FORMATO_SNAPSHOT = 1
+
+
+def normalizar_sigla_chave(valor):
+    """Normaliza siglas para comparações tolerantes."""
+    if valor is None:
+        return ''
+    texto = ''.join(c for c in unicodedata.normalize('NFKD', str(valor)) if not unicodedata.combining(c))
+    texto = texto.upper().replace('º', '').replace('ª', '')
+    texto = ' '.join(texto.split())
+    return texto
+
+
+def _coluna_texto(df, coluna):
+    """Coluna como texto ``str(valor).strip()`` (NaN vira 'nan'); '' se a coluna não existir."""
+    if coluna not in df.columns:
+        return pd.Series([''] * len(df), index=df.index, dtype=object)
+    return df[coluna].astype(object).map(str).str.strip()
+
+
+def _normalizar_coluna(serie):
+    """Aplica ``normalizar_sigla_chave`` uma vez por valor distinto da coluna."""
+    codigos, distintos = pd.factorize(serie, use_na_sentinel=False)
+    normalizados = [normalizar_sigla_chave(v) for v in distintos]
+    return pd.Series([normalizados[c] for c in codigos], index=serie.index, dtype=object)
+
+
+def processar_codom(df):
+    """Monta (dados_oms, dados_ug_codom, dados_subordinacao) a partir da planilha CODOM."""
+    sigla = _coluna_texto(df, 'SIGLA')
+    codom = _coluna_texto(df, 'CODOM')
+    ug = _coluna_texto(df, 'UG')
+    # Tentar ler coluna 'SUBORDINACAO' ou 'SUBORDINAÇÃO' (variações na planilha)
+    if 'SUBORDINACAO' in df.columns:
+        subordinacao = _coluna_texto(df, 'SUBORDINACAO')
+    else:
+        subordinacao = _coluna_texto(df, 'SUBORDINAÇÃO')
+
+    tabela = pd.DataFrame({'sigla': sigla, 'codom': codom, 'ug': ug, 'sub': subordinacao})
+    validas = tabela[(tabela['sigla'] != '') & (tabela['sigla'] != 'nan')]
+
+    # Lista de OMs para seleção: primeira ocorrência de cada sigla
+    primeiras = validas.drop_duplicates('sigla', keep='first')
+    dados_oms = {
+        s: {'CODOM': c, 'UG': u, 'SUBORDINACAO': sub}
+        for s, c, u, sub in zip(primeiras['sigla'], primeiras['codom'], primeiras['ug'], primeiras['sub'])
+    }
+
+    # UG/CODOM/Subordinação por sigla: último valor encontrado, na ordem da primeira ocorrência
+    dados_ug_codom = {}
+    for s, c, u, sub in zip(validas['sigla'], validas['codom'], validas['ug'], validas['sub']):
+        dados_ug_codom[s] = {'CODOM': c, 'UG': u, 'SUBORDINACAO': sub}
+
+    # CODOM -> Subordinação para buscas diretas
+    com_sub = tabela[(tabela['codom'] != '') & (tabela['codom'] != 'nan') & (tabela['sub'] != '')]
+    dados_subordinacao = dict(zip(com_sub['codom'], com_sub['sub']))
+
+    return dados_oms, dados_ug_codom, dados_subordinacao
+
+
+# Carregar dados do CODOM.xlsx
+def carregar_dados_codom():
+    """Carrega os dados do arquivo CODOM.xlsx"""
+    try:
+        df = pd.read_excel(ARQUIVO_CODOM, engine='openpyxl')
+        return processar_codom(df)
+    except Exception as e:
+        print(f"Erro ao carregar CODOM.xlsx: {e}")
+        return {}, {}, {}
+
+
+def _efetivo_inteiro(valor):
+    try:
+        return int(float(valor))
+    except Exception:
+        return None
+
+
+def processar_vinculo_efetivo(df_vinculo, df_efetivo):
+    """Monta (vinculo_por_op, efetivo_por_om, rm_por_op) a partir das abas de Dados.xlsx."""
+    vinc = pd.DataFrame({
+        'sigla': _coluna_texto(df_vinculo, 'SIGLA OM'),
+        'codom': _coluna_texto(df_vinculo, 'COD OM'),
+        'ug': _coluna_texto(df_vinculo, 'COD UG'),
+        'codom_op': _coluna_texto(df_vinculo, 'COD OM VINC OP'),
+        'ug_op': _coluna_texto(df_vinculo, 'COD UG VINC OP'),
+        'rm': _coluna_texto(df_vinculo, 'RM'),
+    })
+    vinc['chave_op'] = _normalizar_coluna(_coluna_texto(df_vinculo, 'SIGLA OM VINC OP'))
+
+    # OMs apoiadas por OP (chave normalizada), na ordem das linhas da planilha
+    apoiadas = vinc[(vinc['chave_op'] != '') & (vinc['sigla'] != '')].reset_index(drop=True)
+    registros = [
+        {'sigla': s, 'codom': c, 'ug': u, 'codom_op': co, 'ug_op': uo}
+        for s, c, u, co, uo in zip(apoiadas['sigla'], apoiadas['codom'], apoiadas['ug'],
+                                   apoiadas['codom_op'], apoiadas['ug_op'])
+    ]
+    posicoes = apoiadas.groupby('chave_op', sort=False).indices
+    vinculo_por_op = {chave: [registros[i] for i in posicoes[chave]] for chave in pd.unique(apoiadas['chave_op'])}
+
+    com_rm = vinc[(vinc['chave_op'] != '') & (vinc['rm'] != '')]
+    rm_por_op = dict(zip(com_rm['chave_op'], com_rm['rm']))
+
+    # Efetivo médio por OM (chave normalizada); valores não numéricos são ignorados
+    efetivo_por_om = {}
+    if 'MEDIA EFETIVO ATIVA' in df_efetivo.columns:
+        chave_om = _normalizar_coluna(_coluna_texto(df_efetivo, 'SIGLA OM'))
+        efetivo = df_efetivo['MEDIA EFETIVO ATIVA']
+        mascara = (chave_om != '') & efetivo.notna()
+        if pd.api.types.is_numeric_dtype(efetivo) and not pd.api.types.is_bool_dtype(efetivo):
+            valores = efetivo[mascara].astype(float)
+            mascara_finita = np.isfinite(valores)
+            chaves = chave_om[mascara][mascara_finita]
+            inteiros = [int(v) for v in valores[mascara_finita]]
+        else:
+            chaves, inteiros = [], []
+            for chave, valor in zip(chave_om[mascara], efetivo[mascara]):
+                convertido = _efetivo_inteiro(valor)
+                if convertido is not None:
+                    chaves.append(chave)
+                    inteiros.append(convertido)
+        efetivo_por_om = dict(zip(chaves, inteiros))
+
+    return vinculo_por_op, efetivo_por_om, rm_por_op
+
+
+def carregar_dados_vinculo_efetivo():
+    """Carrega vínculos (Vinculo_OM) e efetivos (Efetivo) do arquivo Dados.xlsx."""
+    try:
+        xl = pd.ExcelFile(ARQUIVO_DADOS, engine='openpyxl')
+        df_vinculo = xl.parse('Vinculo_OM')
+        df_efetivo = xl.parse('Efetivo')
+    except Exception as e:
+        print(f"Erro ao carregar Dados.xlsx: {e}")
+        return {}, {}, {}
+
+    return processar_vinculo_efetivo(df_vinculo, df_efetivo)
+
+
+def compilar_referencias():
+    """Lê as planilhas e devolve o dicionário com as seis tabelas de referência."""
+    dados_oms, dados_ug_codom, dados_subordinacao = carregar_dados_codom()
+    vinculo_por_op, efetivo_por_om, rm_por_op = carregar_dados_vinculo_efetivo()
+    return {
+        'DADOS_OMS': dados_oms,
+        'DADOS_UG_CODOM': dados_ug_codom,
+        'DADOS_SUBORDINACAO': dados_subordinacao,
+        'DADOS_VINCULO_OP': vinculo_por_op,
+        'DADOS_EFETIVO_OM': efetivo_por_om,
+        'DADOS_RM_OP': rm_por_op,
+    }
+
+
+def referencias_completas(dados):
+    """True se as duas planilhas foram lidas (os carregadores devolvem vazio em caso de erro)."""
+    return bool(dados.get('DADOS_OMS') and dados.get('DADOS_VINCULO_OP'))
+
+
+def _sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def assinatura_fontes(anteriores=None):
+    """Assinatura (mtime, tamanho, sha256) das planilhas; None se alguma faltar.
+
+    O SHA-256 só é recalculado quando mtime ou tamanho diferem da assinatura
+    anterior, para o boot não precisar ler os arquivos inteiros.
+    """
+    anteriores = anteriores or {}
+    fontes = {}
+    for caminho in (ARQUIVO_CODOM, ARQUIVO_DADOS):
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            return None
+        anterior = anteriores.get(caminho) or {}
+        if anterior.get('mtime_ns') == st.st_mtime_ns and anterior.get('tamanho') == st.st_size:
+            fontes[caminho] = anterior
+        else:
+            fontes[caminho] = {'mtime_ns': st.st_mtime_ns, 'tamanho': st.st_size, 'sha256': _sha256(caminho)}
+    return fontes
+
+
+def _ler_snapshot(caminho):
+    try:
+        with open(caminho, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('formato') != FORMATO_SNAPSHOT:
+        return None
+    # Snapshot de uma compilação parcial (gravado por versões anteriores): descarta
+    if not referencias_completas(snapshot.get('dados') or {}):
+        return None
+    return snapshot
+
+
+def _gravar_snapshot(caminho, fontes, dados):
+    """Grava o snapshot de forma atômica (vários workers podem subir juntos)."""
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    fd, temporario = tempfile.mkstemp(prefix='.referencia-', dir=diretorio)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'formato': FORMATO_SNAPSHOT, 'fontes': fontes, 'dados': dados},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def _mesmo_conteudo(fontes_a, fontes_b):
+    return {k: v['sha256'] for k, v in fontes_a.items()} == {k: v['sha256'] for k, v in fontes_b.items()}
+
+
+def carregar_referencias(caminho_snapshot=None, forcar=False):
+    """Tabelas de referência, vindas do snapshot quando as planilhas não mudaram.
+
+    Retorna (dados, origem, fontes): origem é 'snapshot' ou 'planilhas' e
+    fontes a assinatura das planilhas usada (None se alguma faltar).
+    """
+    caminho_snapshot = ARQUIVO_SNAPSHOT if caminho_snapshot is None else caminho_snapshot
+    if not caminho_snapshot:
+        return compilar_referencias(), 'planilhas', assinatura_fontes()
+
+    snapshot = None if forcar else _ler_snapshot(caminho_snapshot)
+    fontes = assinatura_fontes(snapshot['fontes'] if snapshot else None)
+
+    if snapshot and fontes and _mesmo_conteudo(snapshot['fontes'], fontes):
+        if fontes != snapshot['fontes']:
+            # Só o mtime mudou (ex.: arquivo copiado): atualiza a assinatura
+            try:
+                _gravar_snapshot(caminho_snapshot, fontes, snapshot['dados'])
+            except OSError as e:
+                print(f"Aviso: não foi possível atualizar o snapshot de referência: {e}")
+        return snapshot['dados'], 'snapshot', fontes
+
+    dados = compilar_referencias()
+    # Planilha ausente ou ilegível: o resultado é parcial e não pode ser guardado,
+    # senão seria reaproveitado a cada boot enquanto o arquivo não mudasse
+    if not referencias_completas(dados):
+        print("⚠ Dados de referência incompletos (CODOM.xlsx ou Dados.xlsx ilegível); snapshot não gravado")
+    elif fontes:
+        try:
+            _gravar_snapshot(caminho_snapshot, fontes, dados)
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o snapshot de referência: {e}")
+    return dados, 'planilhas', fontes
+
+
+def _mtimes_fontes():
+    try:
+        return tuple((os.stat(c).st_mtime_ns, os.stat(c).st_size) for c in (ARQUIVO_CODOM, ARQUIVO_DADOS))
+    except OSError:
+        return None
+
+
+class IndiceSiglas:
+    """Índice de siglas normalizadas para o casamento tolerante de ``get_ug_codom``.
+
+    Reproduz a varredura linear original: devolve o valor da *primeira* chave
+    (na ordem do dicionário) em que a sigla buscada contém a chave ou está
+    contida nela. As chaves contidas na busca saem de um dicionário exato
+    (testando as substrings da busca); as chaves que contêm a busca saem de
+    listas de posições por trigrama, verificadas em ordem crescente.
+    """
+
+    def __init__(self, dicionario):
+        self._valores = list(dicionario.values())
+        self._chaves = [normalizar_sigla_chave(k) for k in dicionario]
+        self._tam_max = max((len(k) for k in self._chaves), default=0)
+        self._primeiro_por_chave = {}
+        self._primeiro_por_gram = {}
+        self._posicoes_trigrama = {}
+        for i, chave in enumerate(self._chaves):
+            self._primeiro_por_chave.setdefault(chave, i)
+            vistos = set()
+            for n in (1, 2, 3):
+                for j in range(len(chave) - n + 1):
+                    gram = chave[j:j + n]
+                    if gram in vistos:
+                        continue
+                    vistos.add(gram)
+                    self._primeiro_por_gram.setdefault(gram, i)
+                    if n == 3:
+                        self._posicoes_trigrama.setdefault(gram, []).append(i)
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def buscar(self, sigla_normalizada):
+        """Valor da primeira chave compatível, ou None."""
+        alvo = sigla_normalizada
+        if not self._chaves:
+            return None
+        if alvo == '':
+            return self._valores[0]  # '' está contida em qualquer chave
+
+        melhor = len(self._chaves)
+
+        # Chaves contidas na busca (inclui a igualdade)
+        tam = len(alvo)
+        for inicio in range(tam):
+            for fim in range(inicio + 1, min(tam, inicio + self._tam_max) + 1):
+                i = self._primeiro_por_chave.get(alvo[inicio:fim])
+                if i is not None and i < melhor:
+                    melhor = i
+        i = self._primeiro_por_chave.get('')
+        if i is not None and i < melhor:
+            melhor = i
+
+        # Chaves que contêm a busca
+        if tam <= 3:
+            i = self._primeiro_por_gram.get(alvo)
+            if i is not None and i < melhor:
+                melhor = i
+        else:
+            listas = []
+            for j in range(tam - 2):
+                posicoes = self._posicoes_trigrama.get(alvo[j:j + 3])
+                if posicoes is None:
+                    listas = None
+                    break
+                listas.append(posicoes)
+            if listas:
+                for i in min(listas, key=len):
+                    if i >= melhor:
+                        break
+                    if alvo in self._chaves[i]:
+                        melhor = i
+                        break
+
+        return self._valores[melhor] if melhor < len(self._chaves) else None
+
+
+class IndiceOMs:
+    """Índice de n-gramas (1 a 3 caracteres) do catálogo de OMs para o autocomplete.
+
+    A busca ignora acentos, caixa e espaços repetidos e procura em sigla, UG e
+    CODOM. Os resultados vêm ordenados por relevância: sigla igual, sigla que
+    começa com o termo, palavra da sigla que começa com o termo, termo dentro
+    da sigla e, por fim, UG/CODOM; empates em ordem alfabética.
+    """
+
+    def __init__(self, dados_oms):
+        self._itens = []
+        self._textos = []
+        self._posicoes = {}
+        for sigla in sorted(dados_oms):
+            dados = dados_oms[sigla]
+            item = {
+                'sigla': sigla,
+                'ug': '' if dados.get('UG') in (None, 'nan') else dados.get('UG'),
+                'codom': '' if dados.get('CODOM') in (None, 'nan') else dados.get('CODOM'),
+                'subordinacao': '' if dados.get('SUBORDINACAO') in (None, 'nan') else dados.get('SUBORDINACAO'),
+            }
+            campos = (normalizar_sigla_chave(sigla), normalizar_sigla_chave(item['ug']),
+                      normalizar_sigla_chave(item['codom']))
+            i = len(self._itens)
+            self._itens.append(item)
+            self._textos.append(campos)
+            for campo in campos:
+                for n in (1, 2, 3):
+                    for j in range(len(campo) - n + 1):
+                        self._posicoes.setdefault(campo[j:j + n], set()).add(i)
+        self._por_sigla = {item['sigla']: item for item in self._itens}
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter(self, siglas):
+        """Itens do catálogo para as siglas informadas (as inexistentes são omitidas)."""
+        return [self._por_sigla[s] for s in siglas if s in self._por_sigla]
+
+    def _candidatos(self, termo):
+        if len(termo) <= 3:
+            return self._posicoes.get(termo, set())
+        conjuntos = []
+        for j in range(len(termo) - 2):
+            posicoes = self._posicoes.get(termo[j:j + 3])
+            if not posicoes:
+                return set()
+            conjuntos.append(posicoes)
+        conjuntos.sort(key=len)
+        return set.intersection(*conjuntos)
+
+    @staticmethod
+    def _relevancia(termo, campos):
+        sigla, ug, codom = campos
+        if sigla == termo:
+            return 0
+        if sigla.startswith(termo):
+            return 1
+        if any(p.startswith(termo) for p in sigla.split(' ')):
+            return 2
+        if termo in sigla:
+            return 3
+        if ug.startswith(termo) or codom.startswith(termo):
+            return 4
+        if termo in ug or termo in codom:
+            return 5
+        return None
+
+    def buscar(self, termo, pagina=1, por_pagina=50):
+        """Retorna (total, itens da página) para o termo; termo vazio lista tudo."""
+        termo = normalizar_sigla_chave(termo)
+        inicio = (max(pagina, 1) - 1) * por_pagina
+        if not termo:
+            return len(self._itens), self._itens[inicio:inicio + por_pagina]
+
+        encontrados = []
+        for i in self._candidatos(termo):
+            nota = self._relevancia(termo, self._textos[i])
+            if nota is not None:
+                encontrados.append((nota, i))
+        # Os itens já estão em ordem alfabética: o índice desempata
+        encontrados.sort()
+        return len(encontrados), [self._itens[i] for _, i in encontrados[inicio:inicio + por_pagina]]
+
+
+def descongelar(valor):
+    """Cópia mutável (dict/list) de uma estrutura congelada, ex.: para ``jsonify``."""
+    if isinstance(valor, (dict, MappingProxyType)):
+        return {k: descongelar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [descongelar(v) for v in valor]
+    return valor
+
+
+DADOS_OP_VAZIO = MappingProxyType({
+    'oms_apoiadas': (),
+    'oms_detalhes': (),
+    'efetivo_total': 0,
+    'efetivos_por_om': MappingProxyType({}),
+    'subordinacao': ''
+})
+
+
+def _montar_oms_op(oms, dados_efetivo_om, dados_ug_codom):
+    """Parte de ``dados_automaticos_op`` que depende só da chave normalizada da OP."""
+    efetivo_total = 0
+    efetivos_por_om = {}
+    oms_detalhes = []
+
+    for om in oms:
+        sigla_om = (om.get('sigla') or '').strip()
+        if not sigla_om:
+            continue
+
+        chave_om = normalizar_sigla_chave(sigla_om)
+        efetivo_val = dados_efetivo_om.get(chave_om)
+        if efetivo_val is not None:
+            try:
+                efetivo_val = int(efetivo_val)
+            except Exception:
+                efetivo_val = 0
+            efetivos_por_om[sigla_om] = efetivo_val
+            efetivo_total += efetivo_val
+
+        detalhes = dict(om)
+        detalhes['sigla'] = sigla_om
+        dados_codom = dados_ug_codom.get(sigla_om) or dados_ug_codom.get(chave_om) or {}
+        detalhes.update(dados_codom)
+        oms_detalhes.append(MappingProxyType(detalhes))
+
+    return MappingProxyType({
+        'oms_apoiadas': tuple(om.get('sigla') for om in oms if om.get('sigla')),
+        'oms_detalhes': tuple(oms_detalhes),
+        'efetivo_total': efetivo_total,
+        'efetivos_por_om': MappingProxyType(efetivos_por_om),
+    })
+
+
+class Referencias:
+    """Uma carga completa (e imutável por convenção) das tabelas de referência."""
+
+    def __init__(self, dados, origem, fontes):
+        self.DADOS_OMS = dados['DADOS_OMS']
+        self.DADOS_UG_CODOM = dados['DADOS_UG_CODOM']
+        self.DADOS_SUBORDINACAO = dados['DADOS_SUBORDINACAO']
+        self.DADOS_VINCULO_OP = dados['DADOS_VINCULO_OP']
+        self.DADOS_EFETIVO_OM = dados['DADOS_EFETIVO_OM']
+        self.DADOS_RM_OP = dados['DADOS_RM_OP']
+        self.LISTA_OMS = sorted(self.DADOS_OMS.keys())
+        self._indice_siglas = None
+        self._indice_oms = None
+        self._oms_por_op = None
+        self._provedores_por_om = None
+        self.dados_automaticos_op = functools.lru_cache(maxsize=CACHE_DADOS_OP)(self._dados_automaticos_op)
+        self.origem = origem
+        self.carregado_em = datetime.now()
+        self.completa = referencias_completas(dados)
+        # Identifica o conteúdo das planilhas (igual em todos os workers)
+        if fontes and self.completa:
+            conteudo = '|'.join(fontes[c]['sha256'] for c in sorted(fontes))
+            self.versao = hashlib.sha256(conteudo.encode()).hexdigest()[:12]
+        else:
+            self.versao = 'parcial'
+
+    @property
+    def indice_siglas(self):
+        """Índice de ``DADOS_UG_CODOM`` (montado no primeiro uso desta carga)."""
+        if self._indice_siglas is None:
+            self._indice_siglas = IndiceSiglas(self.DADOS_UG_CODOM)
+        return self._indice_siglas
+
+    @property
+    def indice_oms(self):
+        """Índice do catálogo ``DADOS_OMS`` para a busca de OMs."""
+        if self._indice_oms is None:
+            self._indice_oms = IndiceOMs(self.DADOS_OMS)
+        return self._indice_oms
+
+    @property
+    def oms_por_op(self):
+        """OMs apoiadas, detalhes e efetivo de cada OP de ``DADOS_VINCULO_OP`` (pré-calculados)."""
+        if self._oms_por_op is None:
+            self._oms_por_op = {
+                chave: _montar_oms_op(oms, self.DADOS_EFETIVO_OM, self.DADOS_UG_CODOM)
+                for chave, oms in self.DADOS_VINCULO_OP.items()
+            }
+        return self._oms_por_op
+
+    @property
+    def provedores_por_om(self):
+        """Índice invertido de ``DADOS_VINCULO_OP``: OM (chave normalizada) -> OPs que a apoiam."""
+        if self._provedores_por_om is None:
+            indice = {}
+            for chave_op, oms in self.DADOS_VINCULO_OP.items():
+                for om in oms:
+                    chave_om = normalizar_sigla_chave(om.get('sigla'))
+                    if not chave_om:
+                        continue
+                    provedores = indice.setdefault(chave_om, {})
+                    if chave_op not in provedores:
+                        provedores[chave_op] = MappingProxyType({
+                            'op': chave_op,
+                            'codom_op': om.get('codom_op', ''),
+                            'ug_op': om.get('ug_op', ''),
+                        })
+            self._provedores_por_om = {chave: tuple(provedores.values()) for chave, provedores in indice.items()}
+        return self._provedores_por_om
+
+    def _dados_automaticos_op(self, sigla_op):
+        # Memorizado por sigla em ``dados_automaticos_op`` (LRU desta carga, inclusive
+        # as siglas sem vínculo); o resultado é compartilhado e não deve ser alterado
+        alvo_sigla = normalizar_sigla_chave(sigla_op)
+        if not alvo_sigla:
+            return DADOS_OP_VAZIO
+
+        oms = self.oms_por_op.get(alvo_sigla) or DADOS_OP_VAZIO
+
+        dados_op = self.DADOS_UG_CODOM.get(sigla_op) or self.DADOS_UG_CODOM.get(alvo_sigla) or {}
+        subordinacao = dados_op.get('SUBORDINACAO') or dados_op.get('SUBORDINAÇÃO') or ''
+        if not subordinacao:
+            subordinacao = self.DADOS_RM_OP.get(alvo_sigla, '')
+
+        return MappingProxyType({
+            'oms_apoiadas': oms['oms_apoiadas'],
+            'oms_detalhes': oms['oms_detalhes'],
+            'efetivo_total': oms['efetivo_total'],
+            'efetivos_por_om': oms['efetivos_por_om'],
+            'subordinacao': subordinacao
+        })
+
+
+class ReferenciasRecarregaveis:
+    """Mantém a carga atual das referências e a troca sem reiniciar o worker.
+
+    ``verificar_alteracoes`` compara mtime/tamanho das planilhas no máximo uma
+    vez a cada ``intervalo`` segundos; havendo mudança (ou em ``recarregar``,
+    acionado pelo admin) a nova carga é montada numa thread e publicada com uma
+    única atribuição. Quem já pegou a carga anterior continua com ela inteira.
+    ``ao_recarregar(referencias)``, se informado, roda na mesma thread logo
+    após a troca (dados derivados gravados no banco, por exemplo).
+    """
+
+    def __init__(self, intervalo=INTERVALO_VERIFICACAO, ao_recarregar=None):
+        self.intervalo = intervalo
+        self.ao_recarregar = ao_recarregar
+        self._lock = threading.Lock()
+        self._atual = None
+        self._mtimes = None
+        self._proxima_verificacao = 0.0
+        self._recarregando = False
+        self._stats = {'recargas': 0, 'falhas': 0, 'ultima_recarga_ms': None, 'ultimo_erro': None}
+
+    def carregar(self):
+        """Carga síncrona (boot do worker)."""
+        mtimes = _mtimes_fontes()
+        dados, origem, fontes = carregar_referencias()
+        self._atual = Referencias(dados, origem, fontes)
+        self._mtimes = mtimes
+        self._proxima_verificacao = time.monotonic() + self.intervalo
+        return self._atual
+
+    def atual(self):
+        if self._atual is None:
+            with self._lock:
+                if self._atual is None:
+                    self.carregar()
+        return self._atual
+
+    def verificar_alteracoes(self):
+        """Dispara a recarga em segundo plano se alguma planilha mudou."""
+        if self.intervalo <= 0:
+            return False
+        agora = time.monotonic()
+        if agora < self._proxima_verificacao:
+            return False
+        self._proxima_verificacao = agora + self.intervalo
+        mtimes = _mtimes_fontes()
+        if mtimes is None or mtimes == self._mtimes:
+            return False
+        return self.recarregar()
+
+    def recarregar(self, em_segundo_plano=True):
+        """Inicia uma recarga; retorna False se já houver uma em andamento."""
+        with self._lock:
+            if self._recarregando:
+                return False
+            self._recarregando = True
+        if em_segundo_plano:
+            threading.Thread(target=self._recarregar, name='recarga-referencias', daemon=True).start()
+        else:
+            self._recarregar()
+        return True
+
+    def _recarregar(self):
+        inicio = time.perf_counter()
+        try:
+            mtimes = _mtimes_fontes()
+            dados, origem, fontes = carregar_referencias()
+            if not fontes or not referencias_completas(dados):
+                # Alguma planilha ausente ou ilegível (ex.: ainda sendo copiada): mantém a
+                # carga atual; uma nova cópia muda o mtime e dispara outra tentativa
+                self._mtimes = mtimes or self._mtimes
+                raise ValueError('planilhas ausentes ou ilegíveis; mantendo os dados atuais')
+            novo = Referencias(dados, origem, fontes)
+            # Monta os índices aqui, fora das requisições
+            novo.indice_siglas
+            novo.indice_oms
+            novo.oms_por_op
+            novo.provedores_por_om
+            self._atual = novo
+            self._mtimes = mtimes
+            self._stats['recargas'] += 1
+            self._stats['ultimo_erro'] = None
+            print(f"✓ Dados de referência recarregados ({origem}, versão {novo.versao})")
+            if self.ao_recarregar is not None:
+                try:
+                    self.ao_recarregar(novo)
+                except Exception as e:
+                    print(f"✗ Falha ao atualizar dados derivados das referências: {e}")
+        except Exception as e:
+            self._stats['falhas'] += 1
+            self._stats['ultimo_erro'] = str(e)
+            print(f"✗ Falha ao recarregar dados de referência: {e}")
+        finally:
+            self._stats['ultima_recarga_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+            with self._lock:
+                self._recarregando = False
+
+    def reiniciar_apos_fork(self):
+        self._lock = threading.Lock()
+        self._recarregando = False
+
+    def estatisticas(self):
+        atual = self._atual
+        st = dict(self._stats)
+        st['recarregando'] = self._recarregando
+        st['intervalo_verificacao'] = self.intervalo
+        if atual is not None:
+            st['versao'] = atual.versao
+            st['origem'] = atual.origem
+            st['completa'] = atual.completa
+            st['carregado_em'] = atual.carregado_em.isoformat(timespec='seconds')
+            info = atual.dados_automaticos_op.cache_info()
+            st['cache_dados_op'] = {'hits': info.hits, 'misses': info.misses, 'entradas': info.currsize}
+        return st
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Snapshot dos dados de referência (CODOM.xlsx / Dados.xlsx).')
+    parser.add_argument('comando', choices=['compilar', 'medir'],
+                        help='compilar: regenera o snapshot; medir: tempo de carga com e sem snapshot')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.comando == 'compilar':
+        inicio = time.perf_counter()
+        carregar_referencias(forcar=True)
+        print(f"✓ Snapshot gravado em {ARQUIVO_SNAPSHOT} "
+              f"({os.path.getsize(ARQUIVO_SNAPSHOT) / 1024:.0f} KiB, {(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    else:
+        carregar_referencias()  # garante snapshot atualizado antes de medir
+
+        def medir(func):
+            tempos = []
+            for _ in range(args.repeticoes):
+                inicio = time.perf_counter()
+                func()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            return min(tempos)
+
+        ms_planilhas = medir(compilar_referencias)
+        ms_snapshot = medir(carregar_referencias)
+        print(f"Planilhas (openpyxl): {ms_planilhas:8.1f} ms")
+        print(f"Snapshot:             {ms_snapshot:8.1f} ms  ({ms_planilhas / max(ms_snapshot, 0.001):.0f}x mais rápido)")
@@ -1,50 +1,509 @@
 import sqlite3
 from flask import g
 import os
-import sqlite3
+import pathlib
+import queue
+import threading
+import time
 
 DATABASE = 'database.db'
 
+# PRAGMAs aplicados a cada conexão nova (sobrescrevíveis por variáveis de ambiente)
+PRAGMAS_CONEXAO = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),  # negativo = KiB
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+}
+
+POOL_TAMANHO_MAX = int(os.getenv('SQLITE_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.getenv('SQLITE_POOL_TIMEOUT', '10'))
+
+
+def conectar(caminho=None, **kwargs):
+    """Abre uma conexão com row_factory e os PRAGMAs de ``PRAGMAS_CONEXAO``.
+
+    Usada pelo pool e por scripts/CLIs que rodam fora do contexto Flask.
+    """
+    conn = sqlite3.connect(caminho or DATABASE, **kwargs)
+    conn.row_factory = sqlite3.Row
+    for nome, valor in PRAGMAS_CONEXAO.items():
+        conn.execute(f'PRAGMA {nome} = {valor}')
+    return conn
+
+
+def conectar_leitura(caminho=None):
+    """Conexão somente leitura (``mode=ro``), para extrações em threads paralelas."""
+    uri = pathlib.Path(caminho or DATABASE).resolve().as_uri() + '?mode=ro'
+    return conectar(uri, uri=True)
+
+
+class GerenciadorConexoes:
+    """Pool de conexões SQLite por processo (worker), reaproveitadas entre requisições.
+
+    Cada conexão recebe os PRAGMAs de ``PRAGMAS_CONEXAO`` uma única vez, ao ser criada.
+    Após um ``fork`` (gunicorn com preload) o pool herdado é descartado sem fechar as
+    conexões do processo pai, e o filho abre as suas sob demanda.
+    """
+
+    def __init__(self, tamanho_max=POOL_TAMANHO_MAX, timeout=POOL_TIMEOUT):
+        self.tamanho_max = max(1, tamanho_max)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta o pool atual (usado após fork ou troca de arquivo do banco)."""
+        self._pid = os.getpid()
+        self._caminho = DATABASE
+        self._livres = queue.LifoQueue()
+        self._criadas = 0
+        self._stats = {
+            'aquisicoes': 0,
+            'conexoes_criadas': 0,
+            'esperas': 0,
+            'tempo_aquisicao_total_ms': 0.0,
+            'tempo_aquisicao_max_ms': 0.0,
+            'tempo_espera_total_ms': 0.0,
+            'tempo_espera_max_ms': 0.0,
+        }
+
+    def reiniciar_apos_fork(self):
+        # O lock herdado pode ter sido copiado travado por outra thread do pai
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def _conectar(self):
+        return conectar(self._caminho, check_same_thread=False)
+
+    def adquirir(self):
+        inicio = time.perf_counter()
+        if self._pid != os.getpid() or self._caminho != DATABASE:
+            with self._lock:
+                if self._pid != os.getpid() or self._caminho != DATABASE:
+                    self.reiniciar()
+
+        conn = None
+        espera_ms = 0.0
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                pode_criar = self._criadas < self.tamanho_max
+                if pode_criar:
+                    self._criadas += 1
+            if pode_criar:
+                try:
+                    conn = self._conectar()
+                except Exception:
+                    with self._lock:
+                        self._criadas -= 1
+                    raise
+                with self._lock:
+                    self._stats['conexoes_criadas'] += 1
+            else:
+                inicio_espera = time.perf_counter()
+                try:
+                    conn = self._livres.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f'Tempo esgotado aguardando conexão livre do pool ({self.timeout}s)')
+                espera_ms = (time.perf_counter() - inicio_espera) * 1000
+
+        aquisicao_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            st = self._stats
+            st['aquisicoes'] += 1
+            st['tempo_aquisicao_total_ms'] += aquisicao_ms
+            st['tempo_aquisicao_max_ms'] = max(st['tempo_aquisicao_max_ms'], aquisicao_ms)
+            if espera_ms:
+                st['esperas'] += 1
+                st['tempo_espera_total_ms'] += espera_ms
+                st['tempo_espera_max_ms'] = max(st['tempo_espera_max_ms'], espera_ms)
+        return conn
+
+    def liberar(self, conn):
+        """Devolve a conexão ao pool, desfazendo qualquer transação pendente."""
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._descartar(conn)
+            return
+        self._livres.put(conn)
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._criadas = max(0, self._criadas - 1)
+
+    def fechar_todas(self):
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
+
+    def estatisticas(self):
+        with self._lock:
+            st = dict(self._stats)
+            st['conexoes_abertas'] = self._criadas
+            st['conexoes_livres'] = self._livres.qsize()
+        aq = st['aquisicoes'] or 1
+        st['tempo_aquisicao_medio_ms'] = round(st['tempo_aquisicao_total_ms'] / aq, 3)
+        st['tempo_espera_medio_ms'] = round(st['tempo_espera_total_ms'] / (st['esperas'] or 1), 3)
+        return st
+
+
+_gerenciador = GerenciadorConexoes()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_gerenciador.reiniciar_apos_fork)
+
+
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row
+        g.db = _gerenciador.adquirir()
     return g.db
 
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        _gerenciador.liberar(db)
+
+def estatisticas_conexoes():
+    """Métricas de aquisição/espera do pool de conexões do worker atual."""
+    return _gerenciador.estatisticas()
+
 
-def atualizar_tabelas():
-    """Atualiza tabelas existentes com novas colunas"""
-    db = get_db()
+def versao_dados(db):
+    """Versão atual dos dados; muda a cada escrita (compartilhada entre workers)."""
+    row = db.execute('SELECT versao FROM versao_dados WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def incrementar_versao_dados(db):
+    """Marca os dados como alterados (sem commit: vai na transação da escrita)."""
+    db.execute('UPDATE versao_dados SET versao = versao + 1 WHERE id = 1')
+
+
+def separar_historico(historico):
+    """Siglas de OM do texto livre ``orgao_provedor.historico`` (vírgulas ou quebras de linha)."""
+    return [s.strip() for s in (historico or '').replace('\n', ',').split(',') if s.strip()]
+
+
+def gravar_oms_apoiadas(db, op_id):
+    """Reescreve ``op_om_apoiada`` da OP a partir do histórico gravado (sem commit)."""
+    from dados_referencia import normalizar_sigla_chave
+    row = db.execute('SELECT historico FROM orgao_provedor WHERE id = ?', (op_id,)).fetchone()
+    db.execute('DELETE FROM op_om_apoiada WHERE op_id = ?', (op_id,))
+    if row is None:
+        return
+    db.executemany(
+        'INSERT INTO op_om_apoiada (op_id, posicao, sigla_om, chave_om) VALUES (?, ?, ?, ?)',
+        [(op_id, i, sigla, normalizar_sigla_chave(sigla)) for i, sigla in enumerate(separar_historico(row[0]))]
+    )
+
+
+def separar_classes(classes_provedor):
+    """Classes de suprimento de ``orgao_provedor.classes_provedor`` (texto separado por vírgulas)."""
+    return list(dict.fromkeys(c.strip() for c in (classes_provedor or '').split(',') if c.strip()))
+
+
+def gravar_classes_provedor(db, op_id):
+    """Reescreve ``op_classe_provedor`` da OP a partir de ``classes_provedor`` (sem commit)."""
+    row = db.execute('SELECT classes_provedor FROM orgao_provedor WHERE id = ?', (op_id,)).fetchone()
+    db.execute('DELETE FROM op_classe_provedor WHERE op_id = ?', (op_id,))
+    if row is None:
+        return
+    db.executemany('INSERT INTO op_classe_provedor (op_id, classe) VALUES (?, ?)',
+                   [(op_id, classe) for classe in separar_classes(row[0])])
+
+
+def gravar_efetivo_referencia(db, efetivo_automatico, op_id=None):
+    """Regrava ``orgao_provedor.efetivo_referencia`` de uma OP (ou de todas) (sem commit).
+
+    ``efetivo_automatico(sigla)`` é o efetivo das OMs apoiadas segundo as planilhas
+    de referência; só as linhas com valor diferente são atualizadas. Retorna
+    quantas mudaram.
+    """
+    sql = 'SELECT id, sigla, nome, efetivo_referencia FROM orgao_provedor'
+    rows = db.execute(sql + ' WHERE id = ?', (op_id,)) if op_id is not None else db.execute(sql)
+    alteracoes = []
+    for row in rows.fetchall():
+        sigla = row['sigla'] or row['nome']
+        efetivo = int(efetivo_automatico(sigla) or 0) if sigla else 0
+        if efetivo != row['efetivo_referencia']:
+            alteracoes.append((efetivo, row['id']))
+    db.executemany('UPDATE orgao_provedor SET efetivo_referencia = ? WHERE id = ?', alteracoes)
+    return len(alteracoes)
+
+
+# ---------------------------------------------------------------------------
+# Migrações de schema versionadas por PRAGMA user_version
+# ---------------------------------------------------------------------------
+
+MIGRACOES = []
+
+
+def migracao(versao, descricao):
+    """Registra uma função de migração; as versões devem ser sequenciais."""
+    def registrar(func):
+        esperada = len(MIGRACOES) + 1
+        if versao != esperada:
+            raise ValueError(f'Migração {versao} fora de ordem (esperada {esperada})')
+        MIGRACOES.append((versao, descricao, func))
+        return func
+    return registrar
+
+
+def versao_schema(db):
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+
+def versao_mais_recente():
+    return MIGRACOES[-1][0] if MIGRACOES else 0
+
+
+def migracoes_pendentes(db):
+    atual = versao_schema(db)
+    return [(v, d) for v, d, _ in MIGRACOES if v > atual]
+
+
+def colunas_tabela(db, tabela):
+    return {row[1] for row in db.execute(f'PRAGMA table_info({tabela})').fetchall()}
+
+
+def adicionar_colunas(db, tabela, colunas):
+    """Adiciona as colunas ausentes (lista de (nome, tipo)) à tabela."""
+    existentes = colunas_tabela(db, tabela)
+    for coluna, tipo in colunas:
+        if coluna not in existentes:
+            db.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+            print(f"✓ Coluna {coluna} adicionada em {tabela}")
+
+
+@migracao(1, 'Tabelas base do sistema')
+def _migracao_tabelas_base(db):
+    # Tabela principal de Órgãos Provedores
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS orgao_provedor (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE,
+            sigla TEXT NOT NULL UNIQUE,
+            unidade_gestora TEXT,
+            codom TEXT,
+            om_licitacao_qs TEXT,
+            om_licitacao_qr TEXT,
+            subordinacao TEXT NOT NULL,
+            efetivo_atendimento INTEGER NOT NULL,
+            data_criacao DATE,
+            historico TEXT,
+            missao TEXT,
+            consumo_secos_mensal REAL,
+            consumo_frigorificados_mensal REAL,
+            suprimento_secos_mensal REAL,
+            suprimento_frigorificados_mensal REAL,
+            area_edificavel_disponivel REAL,
+            capacidade_total_toneladas REAL,
+            capacidade_total_toneladas_seco REAL,
+            classes_provedor TEXT,
+            criado_por INTEGER,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (criado_por) REFERENCES usuarios (id)
+        )
+    ''')
+    
+    # Tabela de Usuários (ATUALIZADA)
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            nome_completo TEXT NOT NULL,
+            nome_guerra TEXT,
+            posto_graduacao TEXT,
+            orgao_provedor TEXT,
+            email TEXT,
+            nivel_acesso TEXT DEFAULT 'visualizador' CHECK(nivel_acesso IN ('admin', 'cadastrador', 'visualizador')),
+            ativo INTEGER DEFAULT 1,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ultimo_acesso TIMESTAMP,
+            FOREIGN KEY (orgao_provedor) REFERENCES orgao_provedor (nome)
+        )
+    ''')
+    
+    # NOVA TABELA: Pessoal
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS pessoal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            orgao_provedor_id INTEGER NOT NULL,
+            posto_graduacao TEXT NOT NULL,
+            arma_quadro_servico TEXT NOT NULL,
+            especialidade TEXT,
+            funcao TEXT,
+            tipo_servico TEXT NOT NULL CHECK(tipo_servico IN ('carreira', 'temporario')),
+            quantidade INTEGER NOT NULL DEFAULT 1,
+            observacoes TEXT,
+            FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
     
-    # Lista de colunas a adicionar com seus tipos para a tabela usuarios
-    novas_colunas_usuarios = [
+    # NOVA TABELA: Energia Elétrica
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS energia_eletrica (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            orgao_provedor_id INTEGER NOT NULL,
+            dimensionamento_adequado TEXT NOT NULL CHECK(dimensionamento_adequado IN ('adequado', 'insuficiente', 'precario')),
+            capacidade_total_kva REAL,
+            observacoes_energia TEXT,
+            FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
+    
+    # NOVA TABELA: Geradores
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS geradores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            orgao_provedor_id INTEGER NOT NULL,
+            capacidade_kva REAL NOT NULL,
+            marca_modelo TEXT,
+            ano_fabricacao INTEGER,
+            situacao TEXT NOT NULL CHECK(situacao IN ('operacional', 'em_manutencao', 'baixada')),
+            valor_recuperacao REAL,
+            pode_operar_24h INTEGER NOT NULL DEFAULT 0 CHECK(pode_operar_24h IN (0, 1)),
+            horas_operacao_continuas INTEGER,
+            ultima_manutencao DATE,
+            proxima_manutencao DATE,
+            observacoes TEXT,
+            FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
+    
+    # NOVA TABELA: Fotos (para múltiplas fotos)
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS fotos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela_origem TEXT NOT NULL,
+            registro_id INTEGER NOT NULL,
+            caminho_arquivo TEXT NOT NULL,
+            tipo_foto TEXT,
+            descricao TEXT,
+            data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Tabela de instalações do OP (ATUALIZADA)
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS instalacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            orgao_provedor_id INTEGER NOT NULL,
+            tipo_instalacao TEXT NOT NULL,
+            nome_identificacao TEXT,
+            descricao TEXT,
+            data_construcao DATE,
+            tipo_cobertura TEXT,
+            capacidade_toneladas REAL,
+            largura REAL,
+            comprimento REAL,
+            altura REAL,
+            verticalizacao TEXT,
+            FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
+    
+    # Tabela de empilhadeiras
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS empilhadeiras (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            instalacao_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            capacidade REAL,
+            quantidade INTEGER,
+            ano_fabricacao INTEGER,
+            situacao TEXT NOT NULL CHECK(situacao IN ('disponivel', 'indisponivel_recuperavel', 'indisponivel')),
+            valor_recuperacao REAL,
+            FOREIGN KEY (instalacao_id) REFERENCES instalacoes (id)
+        )
+    ''')
+    
+    # Tabela: Sistemas de Segurança
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS sistemas_seguranca (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            instalacao_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            descricao TEXT,
+            situacao TEXT CHECK(situacao IN ('operacional', 'inoperante', 'em_manutencao')),
+            ultima_manutencao DATE,
+            proxima_manutencao DATE,
+            FOREIGN KEY (instalacao_id) REFERENCES instalacoes (id)
+        )
+    ''')
+    
+    # Tabela: Equipamentos de Unitização
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS equipamentos_unitizacao (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            instalacao_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            quantidade INTEGER,
+            capacidade_kg REAL,
+            situacao TEXT CHECK(situacao IN ('operacional', 'inoperante', 'em_manutencao')),
+            observacoes TEXT,
+            FOREIGN KEY (instalacao_id) REFERENCES instalacoes (id)
+        )
+    ''')
+    
+    # TABELA ATUALIZADA: Viaturas
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS viaturas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            orgao_provedor_id INTEGER NOT NULL,
+            categoria TEXT NOT NULL,
+            tipo_veiculo TEXT NOT NULL,
+            especializacao TEXT,
+            placa TEXT NOT NULL UNIQUE,
+            marca TEXT,
+            modelo TEXT,
+            ano_fabricacao INTEGER,
+            capacidade_carga_kg REAL,
+            lotacao_pessoas INTEGER,
+            valor_recuperacao REAL,
+            tipo_refrigeracao TEXT,
+            temperatura_min REAL,
+            temperatura_max REAL,
+            situacao TEXT NOT NULL CHECK(situacao IN ('operacional', 'inoperante', 'em_manutencao', 'baixada')),
+            ultima_manutencao DATE,
+            proxima_manutencao DATE,
+            km_atual INTEGER,
+            numero_inventario TEXT,
+            patrimonio TEXT,
+            observacoes TEXT,
+            FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
+    
+
+
+@migracao(2, 'Colunas adicionadas após a versão inicial (bancos antigos)')
+def _migracao_colunas_legadas(db):
+    adicionar_colunas(db, 'usuarios', [
         ('nome_guerra', 'TEXT'),
         ('posto_graduacao', 'TEXT'),
         ('orgao_provedor', 'TEXT'),
         ('email', 'TEXT'),
         ('ultimo_acesso', 'TIMESTAMP')
-    ]
-    
-    print("Atualizando tabela usuarios...")
-    for coluna, tipo in novas_colunas_usuarios:
-        try:
-            # Verificar se a coluna já existe
-            db.execute(f"SELECT {coluna} FROM usuarios LIMIT 1")
-            print(f"✓ Coluna {coluna} já existe em usuarios")
-        except sqlite3.OperationalError:
-            try:
-                # Adicionar coluna se não existir
-                db.execute(f"ALTER TABLE usuarios ADD COLUMN {coluna} {tipo}")
-                print(f"✓ Coluna {coluna} adicionada em usuarios")
-            except Exception as e:
-                print(f"⚠ Erro ao adicionar coluna {coluna}: {e}")
-    
-    # Lista de colunas para orgao_provedor (já existentes)
-    novas_colunas_orgao = [
+    ])
+    adicionar_colunas(db, 'orgao_provedor', [
         ('unidade_gestora', 'TEXT'),
         ('codom', 'TEXT'),
         ('om_licitacao_qs', 'TEXT'),
@@ -53,288 +512,288 @@ def atualizar_tabelas():
         ('capacidade_total_toneladas_seco', 'REAL'),
         ('criado_por', 'INTEGER'),
         ('classes_provedor', 'TEXT')
-    ]
-    
-    print("\nAtualizando tabela orgao_provedor...")
-    for coluna, tipo in novas_colunas_orgao:
-        try:
-            db.execute(f"SELECT {coluna} FROM orgao_provedor LIMIT 1")
-            print(f"✓ Coluna {coluna} já existe em orgao_provedor")
-        except sqlite3.OperationalError:
-            try:
-                db.execute(f"ALTER TABLE orgao_provedor ADD COLUMN {coluna} {tipo}")
-                print(f"✓ Coluna {coluna} adicionada em orgao_provedor")
-            except Exception as e:
-                print(f"⚠ Erro ao adicionar coluna {coluna}: {e}")
-    
-    # Atualizar tabela instalacoes
-    print("\nAtualizando tabela instalacoes...")
-    try:
-        db.execute("SELECT capacidade_toneladas FROM instalacoes LIMIT 1")
-        print("✓ Coluna capacidade_toneladas já existe em instalacoes")
-    except sqlite3.OperationalError:
-        try:
-            db.execute("ALTER TABLE instalacoes ADD COLUMN capacidade_toneladas REAL")
-            print("✓ Coluna capacidade_toneladas adicionada em instalacoes")
-        except Exception as e:
-            print(f"⚠ Erro ao adicionar coluna capacidade_toneladas: {e}")
-
-    # Garantir coluna de nome/identificação em instalacoes
-    try:
-        db.execute("SELECT nome_identificacao FROM instalacoes LIMIT 1")
-        print("✓ Coluna nome_identificacao já existe em instalacoes")
-    except sqlite3.OperationalError:
-        try:
-            db.execute("ALTER TABLE instalacoes ADD COLUMN nome_identificacao TEXT")
-            print("✓ Coluna nome_identificacao adicionada em instalacoes")
-        except Exception as e:
-            print(f"⚠ Erro ao adicionar coluna nome_identificacao: {e}")
-
-    # Garantir coluna valor_recuperacao em geradores (bancos antigos)
-    print("\nAtualizando tabela geradores...")
-    try:
-        db.execute("SELECT valor_recuperacao FROM geradores LIMIT 1")
-        print("✓ Coluna valor_recuperacao já existe em geradores")
-    except sqlite3.OperationalError:
-        try:
-            db.execute("ALTER TABLE geradores ADD COLUMN valor_recuperacao REAL")
-            print("✓ Coluna valor_recuperacao adicionada em geradores")
-        except Exception as e:
-            print(f"⚠ Erro ao adicionar coluna valor_recuperacao: {e}")
-
-    # Garantir colunas da tabela viaturas compatíveis com o schema atual
-    novas_colunas_viaturas = [
+    ])
+    adicionar_colunas(db, 'instalacoes', [
+        ('capacidade_toneladas', 'REAL'),
+        ('nome_identificacao', 'TEXT')
+    ])
+    adicionar_colunas(db, 'geradores', [
+        ('valor_recuperacao', 'REAL')
+    ])
+    adicionar_colunas(db, 'viaturas', [
         ('especializacao', 'TEXT'),
         ('tipo_refrigeracao', 'TEXT'),
         ('temperatura_min', 'REAL'),
         ('temperatura_max', 'REAL'),
         ('numero_inventario', 'TEXT'),
         ('valor_recuperacao', 'REAL')
-    ]
+    ])
+
+
+@migracao(3, 'Índices das chaves estrangeiras e da busca de fotos')
+def _migracao_indices_fk(db):
+    db.execute('CREATE INDEX IF NOT EXISTS idx_instalacoes_op ON instalacoes (orgao_provedor_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_energia_op ON energia_eletrica (orgao_provedor_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_geradores_op ON geradores (orgao_provedor_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_pessoal_op ON pessoal (orgao_provedor_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_viaturas_op ON viaturas (orgao_provedor_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_empilhadeiras_inst ON empilhadeiras (instalacao_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_sistemas_inst ON sistemas_seguranca (instalacao_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_equipamentos_inst ON equipamentos_unitizacao (instalacao_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_fotos_origem ON fotos (tabela_origem, registro_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_orgao ON usuarios (orgao_provedor)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_orgao_criado_por ON orgao_provedor (criado_por)')
+    db.execute('ANALYZE')
+
+
+@migracao(4, 'Tabela-resumo op_analytics do painel (um registro por OP)')
+def _migracao_op_analytics(db):
+    # Só a tabela: o cálculo atual lê colunas da migração 7, que a preenche
+    import indicadores
+    db.execute(indicadores.SQL_CRIAR_TABELA)
 
-    print("\nAtualizando tabela viaturas...")
-    for coluna, tipo in novas_colunas_viaturas:
+
+@migracao(5, 'Contador de versão dos dados (invalidação de caches)')
+def _migracao_versao_dados(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS versao_dados (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    db.execute('INSERT OR IGNORE INTO versao_dados (id, versao) VALUES (1, 0)')
+
+
+@migracao(6, 'Tabela op_om_apoiada (OMs do histórico de cada OP) com carga inicial')
+def _migracao_op_om_apoiada(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS op_om_apoiada (
+            op_id INTEGER NOT NULL,
+            posicao INTEGER NOT NULL,
+            sigla_om TEXT NOT NULL,
+            chave_om TEXT NOT NULL,
+            FOREIGN KEY (op_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
+    db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_op_om_apoiada_op ON op_om_apoiada (op_id, posicao)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_op_om_apoiada_om ON op_om_apoiada (chave_om, op_id)')
+    ops = [row[0] for row in db.execute('SELECT id FROM orgao_provedor').fetchall()]
+    for op_id in ops:
+        gravar_oms_apoiadas(db, op_id)
+    print(f"✓ op_om_apoiada preenchida a partir do histórico de {len(ops)} OP(s)")
+
+
+@migracao(7, 'Colunas de classificação indexadas em viaturas e instalações')
+def _migracao_classificacao(db):
+    import indicadores
+    adicionar_colunas(db, 'viaturas', [
+        ('is_frigo', 'INTEGER NOT NULL DEFAULT 0'),
+        ('is_bau', 'INTEGER NOT NULL DEFAULT 0'),
+        ('is_vte', 'INTEGER NOT NULL DEFAULT 0'),
+    ])
+    adicionar_colunas(db, 'instalacoes', [
+        ('is_deposito', 'INTEGER NOT NULL DEFAULT 0'),
+        ("deposito_classe", "TEXT NOT NULL DEFAULT ''"),
+    ])
+    db.execute('CREATE INDEX IF NOT EXISTS idx_viaturas_op_vte ON viaturas (orgao_provedor_id, is_vte)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_viaturas_classe ON viaturas (is_vte, is_bau, is_frigo)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_instalacoes_op_deposito ON instalacoes (orgao_provedor_id, is_deposito)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_instalacoes_classe ON instalacoes (deposito_classe, orgao_provedor_id)')
+    indicadores.classificar_registros(db)
+    total = indicadores.reconstruir_indicadores(db)
+    print(f"✓ op_analytics preenchida para {total} OP(s)")
+    db.execute('ANALYZE')
+
+
+@migracao(8, 'Índices da listagem paginada de OPs e tabela op_classe_provedor')
+def _migracao_listagem_ops(db):
+    # Chaves de ordenação da listagem (listagem_ops.ORDENACOES): as expressões
+    # precisam ser idênticas às usadas nas consultas para o índice ser aproveitado.
+    # nome e sigla já têm os índices das restrições UNIQUE.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_orgao_cadastro ON orgao_provedor (COALESCE(data_cadastro, ''), id)")
+    db.execute('CREATE INDEX IF NOT EXISTS idx_orgao_efetivo ON orgao_provedor (efetivo_atendimento, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_orgao_capacidade ON orgao_provedor (COALESCE(capacidade_total_toneladas, 0), id)')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_orgao_subordinacao ON orgao_provedor (subordinacao, COALESCE(data_cadastro, ''), id)")
+    db.execute('CREATE INDEX IF NOT EXISTS idx_op_analytics_frigo_deficit ON op_analytics (frigo_deficit, op_id)')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS op_classe_provedor (
+            op_id INTEGER NOT NULL,
+            classe TEXT NOT NULL,
+            PRIMARY KEY (op_id, classe),
+            FOREIGN KEY (op_id) REFERENCES orgao_provedor (id)
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_op_classe_provedor_classe ON op_classe_provedor (classe, op_id)')
+    ops = [row[0] for row in db.execute('SELECT id FROM orgao_provedor').fetchall()]
+    for op_id in ops:
+        gravar_classes_provedor(db, op_id)
+    print(f"✓ op_classe_provedor preenchida a partir de {len(ops)} OP(s)")
+    db.execute('ANALYZE')
+
+
+@migracao(9, 'Tabela append-only op_snapshot (histórico diário dos indicadores)')
+def _migracao_op_snapshot(db):
+    import historico_indicadores
+    db.execute(historico_indicadores.SQL_CRIAR_TABELA)
+    db.execute('CREATE INDEX IF NOT EXISTS idx_op_snapshot_op ON op_snapshot (op_id, data)')
+
+
+# Efetivo exibido na listagem: o declarado ou, sem ele, o das OMs apoiadas
+EXPRESSAO_EFETIVO_EXIBIDO = 'COALESCE(NULLIF(efetivo_atendimento, 0), efetivo_referencia)'
+
+
+@migracao(10, 'Coluna efetivo_referencia (efetivo das OMs apoiadas) e índice da ordenação por efetivo')
+def _migracao_efetivo_referencia(db):
+    # Preenchida pelo app (gravar_efetivo_referencia) no boot e a cada recarga das
+    # planilhas de referência, que este módulo não carrega
+    adicionar_colunas(db, 'orgao_provedor', [('efetivo_referencia', 'INTEGER NOT NULL DEFAULT 0')])
+    db.execute('DROP INDEX IF EXISTS idx_orgao_efetivo')
+    db.execute(f'CREATE INDEX IF NOT EXISTS idx_orgao_efetivo_exibido ON orgao_provedor ({EXPRESSAO_EFETIVO_EXIBIDO}, id)')
+
+
+def migrar(db, alvo=None):
+    """Aplica as migrações pendentes, cada uma em sua própria transação.
+
+    Retorna a lista de versões aplicadas (vazia quando o schema já está atualizado).
+    """
+    atual = versao_schema(db)
+    alvo = versao_mais_recente() if alvo is None else alvo
+    if atual >= alvo:
+        return []
+
+    aplicadas = []
+    for versao, descricao, func in MIGRACOES:
+        if versao <= atual or versao > alvo:
+            continue
+        if db.in_transaction:
+            db.commit()
+        db.execute('BEGIN IMMEDIATE')
+        # Outro worker pode ter aplicado a migração enquanto esperávamos o lock
+        if versao_schema(db) >= versao:
+            db.rollback()
+            continue
         try:
-            db.execute(f"SELECT {coluna} FROM viaturas LIMIT 1")
-            print(f"✓ Coluna {coluna} já existe em viaturas")
-        except sqlite3.OperationalError:
-            try:
-                db.execute(f"ALTER TABLE viaturas ADD COLUMN {coluna} {tipo}")
-                print(f"✓ Coluna {coluna} adicionada em viaturas")
-            except Exception as e:
-                print(f"⚠ Erro ao adicionar coluna {coluna} em viaturas: {e}")
-    
-    db.commit()
+            func(db)
+            db.execute(f'PRAGMA user_version = {int(versao)}')
+            db.commit()
+        except Exception:
+            db.rollback()
+            print(f"✗ Falha na migração {versao} ({descricao})")
+            raise
+        print(f"✓ Migração {versao} aplicada: {descricao}")
+        aplicadas.append(versao)
+    return aplicadas
+
 
 def init_db():
     try:
-        db = get_db()
-        
-        # Tabela principal de Órgãos Provedores
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS orgao_provedor (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL UNIQUE,
-                sigla TEXT NOT NULL UNIQUE,
-                unidade_gestora TEXT,
-                codom TEXT,
-                om_licitacao_qs TEXT,
-                om_licitacao_qr TEXT,
-                subordinacao TEXT NOT NULL,
-                efetivo_atendimento INTEGER NOT NULL,
-                data_criacao DATE,
-                historico TEXT,
-                missao TEXT,
-                consumo_secos_mensal REAL,
-                consumo_frigorificados_mensal REAL,
-                suprimento_secos_mensal REAL,
-                suprimento_frigorificados_mensal REAL,
-                area_edificavel_disponivel REAL,
-                capacidade_total_toneladas REAL,
-                capacidade_total_toneladas_seco REAL,
-                classes_provedor TEXT,
-                criado_por INTEGER,
-                data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (criado_por) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        # Tabela de Usuários (ATUALIZADA)
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                nome_completo TEXT NOT NULL,
-                nome_guerra TEXT,
-                posto_graduacao TEXT,
-                orgao_provedor TEXT,
-                email TEXT,
-                nivel_acesso TEXT DEFAULT 'visualizador' CHECK(nivel_acesso IN ('admin', 'cadastrador', 'visualizador')),
-                ativo INTEGER DEFAULT 1,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ultimo_acesso TIMESTAMP,
-                FOREIGN KEY (orgao_provedor) REFERENCES orgao_provedor (nome)
-            )
-        ''')
-        
-        # NOVA TABELA: Pessoal
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS pessoal (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                orgao_provedor_id INTEGER NOT NULL,
-                posto_graduacao TEXT NOT NULL,
-                arma_quadro_servico TEXT NOT NULL,
-                especialidade TEXT,
-                funcao TEXT,
-                tipo_servico TEXT NOT NULL CHECK(tipo_servico IN ('carreira', 'temporario')),
-                quantidade INTEGER NOT NULL DEFAULT 1,
-                observacoes TEXT,
-                FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
-            )
-        ''')
-        
-        # NOVA TABELA: Energia Elétrica
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS energia_eletrica (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                orgao_provedor_id INTEGER NOT NULL,
-                dimensionamento_adequado TEXT NOT NULL CHECK(dimensionamento_adequado IN ('adequado', 'insuficiente', 'precario')),
-                capacidade_total_kva REAL,
-                observacoes_energia TEXT,
-                FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
-            )
-        ''')
-        
-        # NOVA TABELA: Geradores
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS geradores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                orgao_provedor_id INTEGER NOT NULL,
-                capacidade_kva REAL NOT NULL,
-                marca_modelo TEXT,
-                ano_fabricacao INTEGER,
-                situacao TEXT NOT NULL CHECK(situacao IN ('operacional', 'em_manutencao', 'baixada')),
-                valor_recuperacao REAL,
-                pode_operar_24h INTEGER NOT NULL DEFAULT 0 CHECK(pode_operar_24h IN (0, 1)),
-                horas_operacao_continuas INTEGER,
-                ultima_manutencao DATE,
-                proxima_manutencao DATE,
-                observacoes TEXT,
-                FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
-            )
-        ''')
-        
-        # NOVA TABELA: Fotos (para múltiplas fotos)
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS fotos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tabela_origem TEXT NOT NULL,
-                registro_id INTEGER NOT NULL,
-                caminho_arquivo TEXT NOT NULL,
-                tipo_foto TEXT,
-                descricao TEXT,
-                data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabela de instalações do OP (ATUALIZADA)
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS instalacoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                orgao_provedor_id INTEGER NOT NULL,
-                tipo_instalacao TEXT NOT NULL,
-                nome_identificacao TEXT,
-                descricao TEXT,
-                data_construcao DATE,
-                tipo_cobertura TEXT,
-                capacidade_toneladas REAL,
-                largura REAL,
-                comprimento REAL,
-                altura REAL,
-                verticalizacao TEXT,
-                FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
-            )
-        ''')
-        
-        # Tabela de empilhadeiras
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS empilhadeiras (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                instalacao_id INTEGER NOT NULL,
-                tipo TEXT NOT NULL,
-                capacidade REAL,
-                quantidade INTEGER,
-                ano_fabricacao INTEGER,
-                situacao TEXT NOT NULL CHECK(situacao IN ('disponivel', 'indisponivel_recuperavel', 'indisponivel')),
-                valor_recuperacao REAL,
-                FOREIGN KEY (instalacao_id) REFERENCES instalacoes (id)
-            )
-        ''')
-        
-        # Tabela: Sistemas de Segurança
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS sistemas_seguranca (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                instalacao_id INTEGER NOT NULL,
-                tipo TEXT NOT NULL,
-                descricao TEXT,
-                situacao TEXT CHECK(situacao IN ('operacional', 'inoperante', 'em_manutencao')),
-                ultima_manutencao DATE,
-                proxima_manutencao DATE,
-                FOREIGN KEY (instalacao_id) REFERENCES instalacoes (id)
-            )
-        ''')
-        
-        # Tabela: Equipamentos de Unitização
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS equipamentos_unitizacao (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                instalacao_id INTEGER NOT NULL,
-                tipo TEXT NOT NULL,
-                quantidade INTEGER,
-                capacidade_kg REAL,
-                situacao TEXT CHECK(situacao IN ('operacional', 'inoperante', 'em_manutencao')),
-                observacoes TEXT,
-                FOREIGN KEY (instalacao_id) REFERENCES instalacoes (id)
-            )
-        ''')
-        
-        # TABELA ATUALIZADA: Viaturas
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS viaturas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                orgao_provedor_id INTEGER NOT NULL,
-                categoria TEXT NOT NULL,
-                tipo_veiculo TEXT NOT NULL,
-                especializacao TEXT,
-                placa TEXT NOT NULL UNIQUE,
-                marca TEXT,
-                modelo TEXT,
-                ano_fabricacao INTEGER,
-                capacidade_carga_kg REAL,
-                lotacao_pessoas INTEGER,
-                valor_recuperacao REAL,
-                tipo_refrigeracao TEXT,
-                temperatura_min REAL,
-                temperatura_max REAL,
-                situacao TEXT NOT NULL CHECK(situacao IN ('operacional', 'inoperante', 'em_manutencao', 'baixada')),
-                ultima_manutencao DATE,
-                proxima_manutencao DATE,
-                km_atual INTEGER,
-                numero_inventario TEXT,
-                patrimonio TEXT,
-                observacoes TEXT,
-                FOREIGN KEY (orgao_provedor_id) REFERENCES orgao_provedor (id)
-            )
-        ''')
-        
-        db.commit()
-        print("✓ Tabelas criadas com sucesso!")
-        
-        # Atualizar tabelas existentes
-        atualizar_tabelas()
-        
+        migrar(get_db())
     except Exception as e:
-        print(f"✗ Erro ao criar tabelas: {e}")
-        raise
\ No newline at end of file
+        print(f"✗ Erro ao migrar banco de dados: {e}")
+        raise
+
+
+# Consultas quentes das rotas (visualizar/editar/excluir órgão, permissões) que
+# devem sempre usar índice; conferidas por ``python database.py planos``.
+CONSULTAS_QUENTES = [
+    ('instalacoes por OP', 'SELECT * FROM instalacoes WHERE orgao_provedor_id = ?', (1,)),
+    ('energia por OP', 'SELECT * FROM energia_eletrica WHERE orgao_provedor_id = ?', (1,)),
+    ('geradores por OP', 'SELECT * FROM geradores WHERE orgao_provedor_id = ?', (1,)),
+    ('pessoal por OP', 'SELECT * FROM pessoal WHERE orgao_provedor_id = ?', (1,)),
+    ('viaturas por OP', 'SELECT * FROM viaturas WHERE orgao_provedor_id = ?', (1,)),
+    ('empilhadeiras por instalação', 'SELECT * FROM empilhadeiras WHERE instalacao_id = ?', (1,)),
+    ('sistemas por instalação', 'SELECT * FROM sistemas_seguranca WHERE instalacao_id = ?', (1,)),
+    ('equipamentos por instalação', 'SELECT * FROM equipamentos_unitizacao WHERE instalacao_id = ?', (1,)),
+    ('ids de empilhadeiras (exclusão)', 'SELECT id FROM empilhadeiras WHERE instalacao_id IN (?, ?)', (1, 2)),
+    ('fotos por registro', 'SELECT id, caminho_arquivo FROM fotos WHERE tabela_origem = ? AND registro_id = ?', ('viatura', 1)),
+    ('exclusão de fotos em lote', "DELETE FROM fotos WHERE tabela_origem = 'viatura' AND registro_id IN (?, ?)", (1, 2)),
+    ('exclusão de geradores', 'DELETE FROM geradores WHERE orgao_provedor_id = ?', (1,)),
+    ('exclusão de instalações', 'DELETE FROM instalacoes WHERE id IN (?, ?)', (1, 2)),
+    ('usuário por órgão', 'SELECT id FROM usuarios WHERE orgao_provedor = ? AND id != ?', ('X', 0)),
+    ('órgão por id', 'SELECT * FROM orgao_provedor WHERE id = ?', (1,)),
+    ('indicadores por OP', 'SELECT * FROM op_analytics WHERE op_id = ?', (1,)),
+    ('versão dos dados', 'SELECT versao FROM versao_dados WHERE id = 1', ()),
+    ('OMs apoiadas por OP (contagem)', 'SELECT op_id, COUNT(*) FROM op_om_apoiada GROUP BY op_id', ()),
+    ('OPs que apoiam uma OM', 'SELECT DISTINCT op_id FROM op_om_apoiada WHERE chave_om = ?', ('X',)),
+    ('viaturas VTE por OP', 'SELECT * FROM viaturas WHERE orgao_provedor_id = ? AND is_vte = 1', (1,)),
+    ('VTE baú frigorífico', 'SELECT COUNT(*) FROM viaturas WHERE is_vte = 1 AND is_bau = 1 AND is_frigo = 1', ()),
+    ('depósitos por OP', 'SELECT * FROM instalacoes WHERE orgao_provedor_id = ? AND is_deposito = 1', (1,)),
+    ('depósitos de uma classe', 'SELECT orgao_provedor_id FROM instalacoes WHERE deposito_classe = ?', ('CL1',)),
+    ('listagem de OPs (data de cadastro)',
+     "SELECT id FROM orgao_provedor WHERE COALESCE(data_cadastro, '') <= ? "
+     "AND (COALESCE(data_cadastro, ''), id) < (?, ?) "
+     "ORDER BY COALESCE(data_cadastro, '') DESC, id DESC LIMIT 25", ('9999', '9999', 0)),
+    ('listagem de OPs (capacidade)',
+     'SELECT id FROM orgao_provedor WHERE COALESCE(capacidade_total_toneladas, 0) >= ? '
+     'AND (COALESCE(capacidade_total_toneladas, 0), id) > (?, ?) '
+     'ORDER BY COALESCE(capacidade_total_toneladas, 0), id LIMIT 25', (0, 0, 0)),
+    ('listagem de OPs (efetivo)',
+     f'SELECT id FROM orgao_provedor WHERE {EXPRESSAO_EFETIVO_EXIBIDO} <= ? '
+     f'AND ({EXPRESSAO_EFETIVO_EXIBIDO}, id) < (?, ?) '
+     f'ORDER BY {EXPRESSAO_EFETIVO_EXIBIDO} DESC, id DESC LIMIT 25', (10 ** 9, 10 ** 9, 0)),
+    ('listagem de OPs (sigla)',
+     'SELECT id FROM orgao_provedor WHERE sigla >= ? AND (sigla, id) > (?, ?) ORDER BY sigla, id LIMIT 25',
+     ('A', 'A', 0)),
+    ('listagem de OPs por RM',
+     "SELECT id FROM orgao_provedor WHERE subordinacao = ? "
+     "ORDER BY COALESCE(data_cadastro, '') DESC, id DESC LIMIT 25", ('CMSE',)),
+    ('OPs de uma classe', 'SELECT op_id FROM op_classe_provedor WHERE classe = ?', ('Classe I',)),
+    ('OPs com déficit frigorificado', 'SELECT op_id FROM op_analytics WHERE frigo_deficit = 1', ()),
+    ('tendência (todos os OPs)',
+     'SELECT data, SUM(viaturas_operacional) FROM op_snapshot WHERE data BETWEEN ? AND ? GROUP BY data',
+     ('2024-01-01', '2024-12-31')),
+    ('tendência de um OP', 'SELECT * FROM op_snapshot WHERE data BETWEEN ? AND ? AND op_id = ?',
+     ('2024-01-01', '2024-12-31', 1)),
+    ('RMs cadastradas', 'SELECT DISTINCT subordinacao FROM orgao_provedor ORDER BY subordinacao', ()),
+]
+
+
+def verificar_planos(db, consultas=None):
+    """Executa EXPLAIN QUERY PLAN nas consultas quentes.
+
+    Retorna lista de (descricao, detalhes_do_plano, ok); ``ok`` é False quando
+    algum passo do plano é uma varredura completa de tabela (SCAN sem índice).
+    """
+    resultado = []
+    for descricao, sql, params in (consultas or CONSULTAS_QUENTES):
+        detalhes = [row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+        varredura = any(d.startswith('SCAN ') and ' USING ' not in d for d in detalhes)
+        resultado.append((descricao, detalhes, not varredura))
+    return resultado
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Migrações do banco de dados SQLite.')
+    parser.add_argument('comando', nargs='?', default='status', choices=['status', 'migrar', 'planos'],
+                        help='status: lista migrações pendentes; migrar: aplica as pendentes; '
+                             'planos: verifica se as consultas quentes usam índices')
+    parser.add_argument('--banco', default=DATABASE, help='Caminho do arquivo SQLite')
+    args = parser.parse_args()
+
+    if args.comando == 'planos':
+        # Schema completo em memória: o resultado não depende dos dados do banco
+        conn = conectar(':memory:')
+        migrar(conn)
+        falhas = 0
+        for descricao, detalhes, ok in verificar_planos(conn):
+            print(f"{'✓' if ok else '✗'} {descricao}: {' | '.join(detalhes)}")
+            falhas += 0 if ok else 1
+        conn.close()
+        raise SystemExit(1 if falhas else 0)
+
+    conn = conectar(args.banco)
+    try:
+        if args.comando == 'migrar':
+            aplicadas = migrar(conn)
+            if not aplicadas:
+                print('Nenhuma migração pendente.')
+        print(f"Versão do schema: {versao_schema(conn)} (mais recente: {versao_mais_recente()})")
+        pendentes = migracoes_pendentes(conn)
+        if pendentes:
+            print('Migrações pendentes:')
+            for versao, descricao in pendentes:
+                print(f"  {versao}: {descricao}")
+    finally:
+        conn.close()
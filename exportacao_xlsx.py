@@ -0,0 +1,256 @@
+"""Exportações XLSX em modo write-only do openpyxl.
+
+As linhas vão do cursor SQLite direto para a aba, em lotes de
+``TAMANHO_LOTE`` (o openpyxl grava cada aba write-only num arquivo temporário
+próprio), sem lista de dicts nem DataFrame intermediários. O arquivo final é
+montado num ``SpooledTemporaryFile``: fica em memória até ``XLSX_SPOOL_MB`` e
+passa para o disco acima disso. ``benchmark_xlsx.py`` compara tempo e pico de
+memória com a exportação anterior via pandas. O custo restante é a
+serialização XML do openpyxl, que usa o ``lxml`` automaticamente quando ele
+está instalado.
+
+A planilha completa (``consultas_op``, uma aba por entidade) é gerada por
+``gerar_xlsx_paralelo``: as consultas rodam ao mesmo tempo em
+``XLSX_WORKERS`` threads, cada uma com conexão somente leitura própria, e as
+linhas ficam em arquivos temporários até a gravação, que segue a ordem das
+abas enquanto as extrações seguintes continuam.
+"""
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+
+import database
+import listagem_ops
+
+TAMANHO_LOTE = int(os.getenv('XLSX_LOTE', '1000'))
+LIMITE_SPOOL = int(float(os.getenv('XLSX_SPOOL_MB', '8')) * 1024 * 1024)
+WORKERS = int(os.getenv('XLSX_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+CONSULTA_VIATURAS = '''
+    SELECT v.id, o.nome AS orgao_nome, o.sigla AS orgao_sigla,
+           v.categoria, v.tipo_veiculo, v.especializacao, v.placa,
+           v.marca, v.modelo, v.ano_fabricacao, v.capacidade_carga_kg,
+           v.lotacao_pessoas, v.tipo_refrigeracao, v.temperatura_min, v.temperatura_max,
+           v.situacao, v.km_atual, v.ultima_manutencao, v.proxima_manutencao,
+           v.valor_recuperacao, v.patrimonio, v.numero_inventario, v.observacoes
+    FROM viaturas v
+    JOIN orgao_provedor o ON o.id = v.orgao_provedor_id
+    ORDER BY o.nome, v.tipo_veiculo, v.placa
+'''
+
+CONSULTA_EMPILHADEIRAS = '''
+    SELECT e.id, o.nome AS orgao_nome, o.sigla AS orgao_sigla,
+           i.tipo_instalacao, i.descricao AS instalacao_descricao,
+           e.tipo, e.capacidade, e.quantidade, e.ano_fabricacao,
+           e.situacao, e.valor_recuperacao
+    FROM empilhadeiras e
+    JOIN instalacoes i ON i.id = e.instalacao_id
+    JOIN orgao_provedor o ON o.id = i.orgao_provedor_id
+    ORDER BY o.nome, i.tipo_instalacao, e.tipo
+'''
+
+_JOIN_OP = 'JOIN orgao_provedor o ON o.id = t.orgao_provedor_id'
+_JOIN_INSTALACAO = '''JOIN instalacoes i ON i.id = t.instalacao_id
+                      JOIN orgao_provedor o ON o.id = i.orgao_provedor_id'''
+_COLUNAS_OP = 'o.sigla AS op_sigla, o.nome AS op_nome'
+_COLUNAS_INSTALACAO = f'{_COLUNAS_OP}, i.nome_identificacao AS instalacao'
+
+# Abas da planilha completa: (título, tabela ``t``, colunas de contexto, JOIN até ``orgao_provedor o``, ORDER BY).
+# ``t.*`` acompanha as colunas novas das tabelas sem mudança aqui.
+ABAS_OP = [
+    ('Órgãos provedores', 'orgao_provedor', None, None, 'o.nome, o.id'),
+    ('Instalações', 'instalacoes', _COLUNAS_OP, _JOIN_OP, 'o.nome, t.id'),
+    ('Empilhadeiras', 'empilhadeiras', _COLUNAS_INSTALACAO, _JOIN_INSTALACAO, 'o.nome, i.id, t.id'),
+    ('Sistemas de segurança', 'sistemas_seguranca', _COLUNAS_INSTALACAO, _JOIN_INSTALACAO, 'o.nome, i.id, t.id'),
+    ('Equipamentos de unitização', 'equipamentos_unitizacao', _COLUNAS_INSTALACAO, _JOIN_INSTALACAO,
+     'o.nome, i.id, t.id'),
+    ('Viaturas', 'viaturas', _COLUNAS_OP, _JOIN_OP, 'o.nome, t.id'),
+    ('Geradores', 'geradores', _COLUNAS_OP, _JOIN_OP, 'o.nome, t.id'),
+    ('Energia elétrica', 'energia_eletrica', _COLUNAS_OP, _JOIN_OP, 'o.nome, t.id'),
+    ('Pessoal', 'pessoal', _COLUNAS_OP, _JOIN_OP, 'o.nome, t.id'),
+]
+
+
+def _valor(valor):
+    # Caracteres de controle colados em campos de texto tornam o XLSX inválido
+    if isinstance(valor, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', valor)
+    return valor
+
+
+def consultas_op(ids=None, subordinacao=None):
+    """``[(titulo, sql, params)]`` da planilha completa, filtrada por ids de OP e/ou subordinação."""
+    condicoes, params = listagem_ops.filtros_sql(subordinacao=subordinacao)
+    if ids:
+        condicoes.append(f"o.id IN ({', '.join(['?'] * len(ids))})")
+        params.extend(ids)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    abas = []
+    for titulo, tabela, colunas, join, ordem in ABAS_OP:
+        if join is None:
+            sql = f'SELECT o.* FROM {tabela} o {where} ORDER BY {ordem}'
+        else:
+            sql = f'SELECT {colunas}, t.* FROM {tabela} t {join} {where} ORDER BY {ordem}'
+        abas.append((titulo, sql, list(params)))
+    return abas
+
+
+def _criar_aba(wb, titulo, colunas):
+    ws = wb.create_sheet(title=titulo)
+    negrito = Font(bold=True)
+    cabecalho = []
+    for nome in colunas:
+        celula = WriteOnlyCell(ws, value=nome)
+        celula.font = negrito
+        cabecalho.append(celula)
+    ws.append(cabecalho)
+    return ws
+
+
+def escrever_aba(wb, titulo, cursor, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Cria a aba ``titulo`` com o cabeçalho do cursor e todas as suas linhas; retorna quantas.
+
+    ``progresso(linhas)``, se informado, é chamado após cada lote.
+    """
+    ws = _criar_aba(wb, titulo, [descricao[0] for descricao in cursor.description])
+    linhas = 0
+    while True:
+        lote = cursor.fetchmany(tamanho_lote)
+        if not lote:
+            break
+        for row in lote:
+            ws.append([_valor(v) for v in row])
+        linhas += len(lote)
+        if progresso:
+            progresso(linhas)
+    return linhas
+
+
+def gerar_xlsx(db, abas, destino, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Grava em ``destino`` (caminho ou arquivo) um XLSX com uma aba por ``(titulo, sql, params)``.
+
+    ``progresso(linhas_escritas, total_linhas)``, se informado, acompanha a
+    gravação (o total vem de um COUNT prévio de cada consulta). Retorna
+    ``{titulo: linhas}``.
+    """
+    abas = list(abas)
+    total = _total_linhas(db, abas) if progresso else None
+    wb = Workbook(write_only=True)
+    linhas = {}
+    escritas = 0
+    for titulo, sql, params in abas:
+        cursor = db.execute(sql, params)
+        try:
+            avanco = (lambda n, anteriores=escritas: progresso(anteriores + n, total)) if progresso else None
+            linhas[titulo] = escrever_aba(wb, titulo, cursor, tamanho_lote, avanco)
+        finally:
+            cursor.close()
+        escritas += linhas[titulo]
+    wb.save(destino)
+    return linhas
+
+
+def _total_linhas(db, abas):
+    return sum(db.execute(f'SELECT COUNT(*) FROM ({sql})', params).fetchone()[0] for _, sql, params in abas)
+
+
+def _extrair(caminho, sql, params, tamanho_lote, limite_spool):
+    """Executa a consulta numa conexão somente leitura própria e guarda os lotes (pickle) num temporário.
+
+    Retorna ``(colunas, linhas, versao_dados, arquivo)``; a versão é lida na
+    mesma transação da consulta.
+    """
+    conn = database.conectar_leitura(caminho)
+    conn.row_factory = None
+    arquivo = tempfile.SpooledTemporaryFile(max_size=limite_spool)
+    try:
+        conn.execute('BEGIN')
+        versao = database.versao_dados(conn)
+        cursor = conn.execute(sql, params)
+        colunas = [descricao[0] for descricao in cursor.description]
+        linhas = 0
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            pickle.dump(lote, arquivo, pickle.HIGHEST_PROTOCOL)
+            linhas += len(lote)
+        arquivo.seek(0)
+        return colunas, linhas, versao, arquivo
+    except Exception:
+        arquivo.close()
+        raise
+    finally:
+        conn.close()
+
+
+def _lotes(arquivo):
+    while True:
+        try:
+            yield pickle.load(arquivo)
+        except EOFError:
+            return
+
+
+def gerar_xlsx_paralelo(db, abas, destino, workers=WORKERS, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Como ``gerar_xlsx``, mas com as consultas das abas executadas em paralelo.
+
+    Cada thread usa conexão somente leitura própria sobre o arquivo de ``db``.
+    Como as conexões não compartilham a transação, a versão dos dados lida em
+    cada uma é comparada com a de ``db``: se houve escrita no meio, levanta
+    RuntimeError em vez de gravar abas de momentos diferentes.
+    """
+    abas = list(abas)
+    caminho = db.execute('PRAGMA database_list').fetchone()[2]
+    versao = database.versao_dados(db)
+    total = _total_linhas(db, abas) if progresso else None
+    wb = Workbook(write_only=True)
+    linhas = {}
+    escritas = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='xlsx') as pool:
+        futuros = [pool.submit(_extrair, caminho, sql, params, tamanho_lote, LIMITE_SPOOL)
+                   for _, sql, params in abas]
+        try:
+            for (titulo, _, _), futuro in zip(abas, futuros):
+                colunas, quantidade, versao_aba, arquivo = futuro.result()
+                with arquivo:
+                    if versao_aba != versao:
+                        raise RuntimeError('Os dados foram alterados durante a exportação; gere a planilha novamente.')
+                    ws = _criar_aba(wb, titulo, colunas)
+                    for lote in _lotes(arquivo):
+                        for row in lote:
+                            ws.append([_valor(v) for v in row])
+                        escritas += len(lote)
+                        if progresso:
+                            progresso(escritas, total)
+                linhas[titulo] = quantidade
+        except BaseException:
+            for futuro in futuros:
+                if not futuro.cancel() and futuro.exception() is None:
+                    futuro.result()[3].close()
+            raise
+    wb.save(destino)
+    return linhas
+
+
+def exportar(db, abas, limite_spool=LIMITE_SPOOL, paralelo=False):
+    """XLSX das ``abas`` num arquivo temporário (memória até ``limite_spool``), já posicionado no início.
+
+    ``paralelo`` usa ``gerar_xlsx_paralelo`` (várias abas pesadas).
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=limite_spool, suffix='.xlsx')
+    try:
+        (gerar_xlsx_paralelo if paralelo else gerar_xlsx)(db, abas, arquivo)
+    except Exception:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return arquivo
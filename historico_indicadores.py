@@ -0,0 +1,278 @@
+"""Histórico diário dos indicadores por OP (tabela append-only ``op_snapshot``).
+
+``registrar_snapshot`` grava uma linha por OP e por dia com a disponibilidade
+de viaturas, a situação dos geradores, a verticalização dos depósitos e a
+cobertura de estocagem, lidas de ``op_analytics`` e de ``analise_capacidade``.
+Um dia já registrado nunca é regravado, e as linhas de OPs excluídos
+permanecem (são histórico). ``tendencia`` monta as séries direto dessa tabela,
+sem recalcular o passado a partir das tabelas base.
+
+O registro do dia é disparado pelo ``AgendadorSnapshot`` (verificação barata
+a cada requisição, execução numa thread a partir de ``SNAPSHOT_HORARIO``) ou
+pelo cron com ``python historico_indicadores.py registrar``.
+"""
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import analise_capacidade
+import database
+
+# Horário local (HH:MM) a partir do qual o snapshot do dia é registrado; vazio desativa
+SNAPSHOT_HORARIO = os.getenv('SNAPSHOT_HORARIO', '02:00')
+INTERVALO_VERIFICACAO = float(os.getenv('SNAPSHOT_INTERVALO_VERIFICACAO', '60'))
+TENDENCIA_DIAS_PADRAO = int(os.getenv('TENDENCIA_DIAS_PADRAO', '90'))
+TENDENCIA_DIAS_MAX = int(os.getenv('TENDENCIA_DIAS_MAX', '1830'))
+
+COLUNAS_SNAPSHOT = [
+    'viaturas_total', 'viaturas_operacional',
+    'geradores_total', 'geradores_operacional', 'geradores_manutencao', 'geradores_baixada',
+    'depositos_classificados', 'depositos_verticalizados',
+    'cobertura_secos', 'cobertura_frigo', 'frigo_deficit', 'falta_frigo_ton',
+]
+
+# Chave primária (data, op_id): as séries agregadas leem um intervalo de datas
+# contíguo; o índice (op_id, data) atende a série de um OP. Coberturas ficam
+# NULL quando o OP não declara consumo (não entram nas médias).
+SQL_CRIAR_TABELA = '''
+    CREATE TABLE IF NOT EXISTS op_snapshot (
+        data TEXT NOT NULL,
+        op_id INTEGER NOT NULL,
+        viaturas_total INTEGER NOT NULL DEFAULT 0,
+        viaturas_operacional INTEGER NOT NULL DEFAULT 0,
+        geradores_total INTEGER NOT NULL DEFAULT 0,
+        geradores_operacional INTEGER NOT NULL DEFAULT 0,
+        geradores_manutencao INTEGER NOT NULL DEFAULT 0,
+        geradores_baixada INTEGER NOT NULL DEFAULT 0,
+        depositos_classificados INTEGER NOT NULL DEFAULT 0,
+        depositos_verticalizados INTEGER NOT NULL DEFAULT 0,
+        cobertura_secos REAL,
+        cobertura_frigo REAL,
+        frigo_deficit INTEGER NOT NULL DEFAULT 0,
+        falta_frigo_ton REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (data, op_id)
+    ) WITHOUT ROWID
+'''
+
+
+def calcular_snapshot(db):
+    """Métricas atuais de todos os OPs: ``{op_id: {coluna: valor}}``."""
+    base = analise_capacidade.carregar_base(db)
+    metricas = analise_capacidade.calcular(base)
+    resultado = {}
+    for i, op_id in enumerate(base.ids.tolist()):
+        linha = dict.fromkeys(COLUNAS_SNAPSHOT, 0)
+        linha['cobertura_secos'] = round(float(metricas['cobertura_secos'][i]), 2) if base.consumo_secos[i] > 0 else None
+        linha['cobertura_frigo'] = round(float(metricas['cobertura_frigo'][i]), 2) if base.consumo_frigo[i] > 0 else None
+        linha['frigo_deficit'] = int(metricas['deficit_frigo'][i])
+        linha['falta_frigo_ton'] = round(float(metricas['falta_frigo_ton'][i]), 2)
+        resultado[op_id] = linha
+
+    for r in db.execute('''
+        SELECT op_id, geradores_total, geradores_operacional, geradores_manutencao,
+               geradores_baixada, verticalizacao
+        FROM op_analytics
+    '''):
+        linha = resultado.get(r['op_id'])
+        if linha is None:
+            continue
+        for coluna in ('geradores_total', 'geradores_operacional', 'geradores_manutencao', 'geradores_baixada'):
+            linha[coluna] = r[coluna]
+        for classe in json.loads(r['verticalizacao'] or '{}').values():
+            linha['depositos_classificados'] += classe['total']
+            linha['depositos_verticalizados'] += classe['verticalizado']
+
+    for r in db.execute('''
+        SELECT orgao_provedor_id AS op_id, COUNT(*) AS total,
+               SUM(CASE WHEN situacao = 'operacional' THEN 1 ELSE 0 END) AS operacional
+        FROM viaturas GROUP BY orgao_provedor_id
+    '''):
+        linha = resultado.get(r['op_id'])
+        if linha is not None:
+            linha['viaturas_total'] = r['total']
+            linha['viaturas_operacional'] = r['operacional'] or 0
+    return resultado
+
+
+def ultimo_snapshot(db):
+    """Data (YYYY-MM-DD) do snapshot mais recente, ou None."""
+    return db.execute('SELECT MAX(data) FROM op_snapshot').fetchone()[0]
+
+
+def registrar_snapshot(db, dia=None):
+    """Grava o snapshot de ``dia`` (padrão: hoje) se ele ainda não existir (sem commit).
+
+    Retorna o número de OPs gravados; 0 quando o dia já estava registrado.
+    """
+    dia = dia or date.today().isoformat()
+    if db.execute('SELECT 1 FROM op_snapshot WHERE data = ? LIMIT 1', (dia,)).fetchone():
+        return 0
+    linhas = calcular_snapshot(db)
+    colunas = ['data', 'op_id'] + COLUNAS_SNAPSHOT
+    db.executemany(
+        f"INSERT OR IGNORE INTO op_snapshot ({', '.join(colunas)}) VALUES ({', '.join(['?'] * len(colunas))})",
+        [[dia, op_id] + [linha[c] for c in COLUNAS_SNAPSHOT] for op_id, linha in linhas.items()]
+    )
+    return len(linhas)
+
+
+def _percentual(parte, total):
+    return round(parte / total * 100, 1) if total else None
+
+
+def tendencia(db, inicio, fim, op_id=None, subordinacao=None):
+    """Série diária (``inicio``..``fim``, inclusive) somada sobre os OPs selecionados."""
+    condicoes, params = ['s.data BETWEEN ? AND ?'], [inicio, fim]
+    juncao = ''
+    if op_id is not None:
+        condicoes.append('s.op_id = ?')
+        params.append(op_id)
+    if subordinacao:
+        juncao = 'JOIN orgao_provedor o ON o.id = s.op_id'
+        condicoes.append('o.subordinacao = ?')
+        params.append(subordinacao)
+    serie = []
+    for r in db.execute(f'''
+        SELECT s.data, COUNT(*) AS ops,
+               SUM(s.viaturas_total) AS viaturas_total,
+               SUM(s.viaturas_operacional) AS viaturas_operacional,
+               SUM(s.geradores_total) AS geradores_total,
+               SUM(s.geradores_operacional) AS geradores_operacional,
+               SUM(s.geradores_manutencao) AS geradores_manutencao,
+               SUM(s.geradores_baixada) AS geradores_baixada,
+               SUM(s.depositos_classificados) AS depositos_classificados,
+               SUM(s.depositos_verticalizados) AS depositos_verticalizados,
+               AVG(s.cobertura_secos) AS cobertura_secos_media,
+               AVG(s.cobertura_frigo) AS cobertura_frigo_media,
+               SUM(s.frigo_deficit) AS ops_deficit_frigo,
+               SUM(s.falta_frigo_ton) AS falta_frigo_ton
+        FROM op_snapshot s {juncao}
+        WHERE {' AND '.join(condicoes)}
+        GROUP BY s.data
+        ORDER BY s.data
+    ''', params):
+        ponto = dict(r)
+        ponto['viaturas_disponibilidade'] = _percentual(r['viaturas_operacional'], r['viaturas_total'])
+        ponto['geradores_disponibilidade'] = _percentual(r['geradores_operacional'], r['geradores_total'])
+        ponto['verticalizacao_perc'] = _percentual(r['depositos_verticalizados'], r['depositos_classificados'])
+        for chave in ('cobertura_secos_media', 'cobertura_frigo_media', 'falta_frigo_ton'):
+            if ponto[chave] is not None:
+                ponto[chave] = round(ponto[chave], 2)
+        serie.append(ponto)
+    return serie
+
+
+def periodo(inicio=None, fim=None, dias=None):
+    """(inicio, fim) validados em YYYY-MM-DD; ValueError para datas ou intervalo inválidos."""
+    try:
+        data_fim = datetime.strptime(fim, '%Y-%m-%d').date() if fim else date.today()
+        if inicio:
+            data_inicio = datetime.strptime(inicio, '%Y-%m-%d').date()
+        else:
+            data_inicio = data_fim - timedelta(days=int(dias or TENDENCIA_DIAS_PADRAO) - 1)
+    except (TypeError, ValueError) as e:
+        raise ValueError('datas devem estar no formato AAAA-MM-DD e dias deve ser inteiro') from e
+    if data_inicio > data_fim:
+        raise ValueError('inicio deve ser anterior ou igual a fim')
+    if (data_fim - data_inicio).days >= TENDENCIA_DIAS_MAX:
+        raise ValueError(f'intervalo máximo de {TENDENCIA_DIAS_MAX} dias')
+    return data_inicio.isoformat(), data_fim.isoformat()
+
+
+class AgendadorSnapshot:
+    """Dispara o snapshot diário dentro do processo da aplicação.
+
+    ``verificar`` é chamado a cada requisição e só faz algo no máximo uma vez
+    a cada ``intervalo`` segundos: passado o ``horario`` de um dia ainda não
+    registrado por este worker, o snapshot roda numa thread com conexão
+    própria. Com vários workers o ``BEGIN IMMEDIATE`` serializa as execuções e
+    só a primeira grava; as demais encontram o dia já registrado.
+    """
+
+    def __init__(self, horario=SNAPSHOT_HORARIO, intervalo=INTERVALO_VERIFICACAO):
+        self.horario = (horario or '').strip()
+        if self.horario:
+            datetime.strptime(self.horario, '%H:%M')
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._ultimo_dia = None
+        self._executando = False
+        self._proxima_verificacao = 0.0
+        self._stats = {'registros': 0, 'falhas': 0, 'ultimo_dia': None, 'ultima_execucao_ms': None,
+                       'ultimo_erro': None}
+
+    def verificar(self):
+        """Inicia o snapshot do dia em segundo plano quando ele é devido."""
+        if not self.horario:
+            return False
+        agora = time.monotonic()
+        if agora < self._proxima_verificacao:
+            return False
+        self._proxima_verificacao = agora + self.intervalo
+        momento = datetime.now()
+        dia = momento.date().isoformat()
+        if dia == self._ultimo_dia or momento.strftime('%H:%M') < self.horario:
+            return False
+        with self._lock:
+            if self._executando:
+                return False
+            self._executando = True
+        threading.Thread(target=self._executar, args=(dia,), name='snapshot-indicadores', daemon=True).start()
+        return True
+
+    def reiniciar_apos_fork(self):
+        self._lock = threading.Lock()
+        self._executando = False
+
+    def _executar(self, dia):
+        inicio = time.perf_counter()
+        conn = None
+        try:
+            conn = database.conectar()
+            conn.execute('BEGIN IMMEDIATE')
+            total = registrar_snapshot(conn, dia)
+            conn.commit()
+            self._ultimo_dia = dia
+            self._stats['ultimo_dia'] = dia
+            self._stats['ultimo_erro'] = None
+            if total:
+                self._stats['registros'] += 1
+                print(f"✓ Snapshot dos indicadores de {dia} registrado para {total} OP(s)")
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            self._stats['falhas'] += 1
+            self._stats['ultimo_erro'] = str(e)
+            print(f"✗ Falha ao registrar snapshot dos indicadores: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+            self._stats['ultima_execucao_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+            self._executando = False
+
+    def estatisticas(self):
+        return dict(self._stats, horario=self.horario or None)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Snapshots diários de op_analytics (histórico de tendências).')
+    parser.add_argument('comando', choices=['registrar'],
+                        help='registrar: grava o snapshot do dia, se ainda não existir (para uso no cron)')
+    parser.add_argument('--data', help='Dia do snapshot (AAAA-MM-DD); padrão: hoje')
+    parser.add_argument('--banco', default=database.DATABASE, help='Caminho do arquivo SQLite')
+    args = parser.parse_args()
+
+    dia = datetime.strptime(args.data, '%Y-%m-%d').date().isoformat() if args.data else None
+    conn = database.conectar(args.banco)
+    try:
+        database.migrar(conn)
+        conn.execute('BEGIN IMMEDIATE')
+        total = registrar_snapshot(conn, dia)
+        conn.commit()
+        print(f"✓ Snapshot registrado para {total} OP(s)" if total else '✓ Snapshot do dia já existia')
+    finally:
+        conn.close()
@@ -0,0 +1,502 @@
+"""Tabela-resumo ``op_analytics`` usada pelo painel administrativo.
+
+Cada OP tem uma linha com os agregados que o dashboard exibe (empilhadeiras,
+viaturas, geradores, pessoal, instalações, energia, sistemas em depósitos,
+verticalização e cobertura frigorificada). As rotas que gravam dados de um OP
+chamam ``atualizar_indicadores_op`` antes do ``commit``; o painel apenas lê a
+tabela via ``carregar_analiticos``.
+
+As colunas de classificação de ``viaturas`` (``is_frigo``, ``is_bau``,
+``is_vte``) e ``instalacoes`` (``is_deposito``, ``deposito_classe``) são
+calculadas por ``classificar_viatura``/``classificar_instalacao`` no INSERT,
+para que os agregados filtrem por colunas indexadas em vez de ``LIKE``.
+
+``calcular_indicadores`` lê cada tabela uma única vez (agrupando por OP e pelas
+chaves dos detalhamentos), tanto para um OP quanto para todos de uma vez;
+``python benchmark_indicadores.py`` compara com a bateria de consultas por OP.
+
+Recalcular tudo a partir das tabelas base: ``python indicadores.py reconstruir``.
+"""
+import json
+import string
+from datetime import datetime
+
+from analise_capacidade import COBERTURA_MIN_FRIGO
+
+# Ordem de busca das classes: 'cl10' precisa ser testado antes de 'cl1'
+CLASSES_DEPOSITO = ['10', '9', '8', '7', '6', '5', '4', '3', '2', '1']
+
+COLUNAS_INDICADORES = [
+    'instalacoes_total', 'depositos_total',
+    'emp_total', 'emp_cap_estoque', 'emp_situacoes',
+    'sistemas_total', 'equipamentos_total',
+    'viaturas_total', 'viaturas_cap_total', 'viaturas_cap_frigo', 'viaturas_cap_seco',
+    'vte_total',
+    'bau_seco_total', 'bau_seco_operacional', 'bau_seco_manutencao', 'bau_seco_inoperante',
+    'bau_frigo_total', 'bau_frigo_operacional', 'bau_frigo_manutencao', 'bau_frigo_inoperante',
+    'pessoal_registros', 'pessoal_total', 'pessoal_por_posto',
+    'geradores_total', 'geradores_cap_kva', 'geradores_operacional',
+    'geradores_manutencao', 'geradores_baixada',
+    'energia_registros', 'energia_dimensionamento', 'energia_capacidade_kva',
+    'dep_com_sistema', 'dep_sistemas_total', 'dep_sis_operacional',
+    'dep_sis_manutencao', 'dep_sis_inoperante',
+    'verticalizacao',
+    'frigo_cap', 'frigo_consumo', 'frigo_area_disp', 'frigo_cobertura', 'frigo_deficit',
+]
+
+SQL_CRIAR_TABELA = '''
+    CREATE TABLE IF NOT EXISTS op_analytics (
+        op_id INTEGER PRIMARY KEY,
+        instalacoes_total INTEGER NOT NULL DEFAULT 0,
+        depositos_total INTEGER NOT NULL DEFAULT 0,
+        emp_total INTEGER NOT NULL DEFAULT 0,
+        emp_cap_estoque REAL NOT NULL DEFAULT 0,
+        emp_situacoes TEXT,
+        sistemas_total INTEGER NOT NULL DEFAULT 0,
+        equipamentos_total INTEGER NOT NULL DEFAULT 0,
+        viaturas_total INTEGER NOT NULL DEFAULT 0,
+        viaturas_cap_total REAL NOT NULL DEFAULT 0,
+        viaturas_cap_frigo REAL NOT NULL DEFAULT 0,
+        viaturas_cap_seco REAL NOT NULL DEFAULT 0,
+        vte_total INTEGER NOT NULL DEFAULT 0,
+        bau_seco_total INTEGER NOT NULL DEFAULT 0,
+        bau_seco_operacional INTEGER NOT NULL DEFAULT 0,
+        bau_seco_manutencao INTEGER NOT NULL DEFAULT 0,
+        bau_seco_inoperante INTEGER NOT NULL DEFAULT 0,
+        bau_frigo_total INTEGER NOT NULL DEFAULT 0,
+        bau_frigo_operacional INTEGER NOT NULL DEFAULT 0,
+        bau_frigo_manutencao INTEGER NOT NULL DEFAULT 0,
+        bau_frigo_inoperante INTEGER NOT NULL DEFAULT 0,
+        pessoal_registros INTEGER NOT NULL DEFAULT 0,
+        pessoal_total INTEGER NOT NULL DEFAULT 0,
+        pessoal_por_posto TEXT,
+        geradores_total INTEGER NOT NULL DEFAULT 0,
+        geradores_cap_kva REAL NOT NULL DEFAULT 0,
+        geradores_operacional INTEGER NOT NULL DEFAULT 0,
+        geradores_manutencao INTEGER NOT NULL DEFAULT 0,
+        geradores_baixada INTEGER NOT NULL DEFAULT 0,
+        energia_registros INTEGER NOT NULL DEFAULT 0,
+        energia_dimensionamento TEXT,
+        energia_capacidade_kva REAL,
+        dep_com_sistema INTEGER NOT NULL DEFAULT 0,
+        dep_sistemas_total INTEGER NOT NULL DEFAULT 0,
+        dep_sis_operacional INTEGER NOT NULL DEFAULT 0,
+        dep_sis_manutencao INTEGER NOT NULL DEFAULT 0,
+        dep_sis_inoperante INTEGER NOT NULL DEFAULT 0,
+        verticalizacao TEXT,
+        frigo_cap REAL NOT NULL DEFAULT 0,
+        frigo_consumo REAL NOT NULL DEFAULT 0,
+        frigo_area_disp REAL NOT NULL DEFAULT 0,
+        frigo_cobertura REAL NOT NULL DEFAULT 0,
+        frigo_deficit INTEGER NOT NULL DEFAULT 0,
+        atualizado_em TIMESTAMP,
+        FOREIGN KEY (op_id) REFERENCES orgao_provedor (id)
+    )
+'''
+
+
+def map_cl(tipo_val):
+    """Extrai a classe ('CL1'..'CL10') do tipo de instalação 'deposito_clN'."""
+    tipo = tipo_val or ''
+    for num in CLASSES_DEPOSITO:
+        if f"cl{num}" in tipo:
+            return f"CL{num}"
+    return ''
+
+
+# LOWER() do SQLite só converte ASCII; a classificação segue a mesma regra
+_MINUSCULAS_ASCII = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def classificar_viatura(tipo_veiculo, especializacao):
+    """(is_frigo, is_bau, is_vte) de uma viatura, gravados junto com ela."""
+    esp = (especializacao or '').translate(_MINUSCULAS_ASCII)
+    tipo = (tipo_veiculo or '').translate(_MINUSCULAS_ASCII)
+    return int('frigo' in esp), int('bau' in esp), int(tipo.startswith('vte'))
+
+
+def classificar_instalacao(tipo_instalacao):
+    """(is_deposito, deposito_classe) de uma instalação; classe 'CL1'..'CL10' ou ''."""
+    tipo = (tipo_instalacao or '').translate(_MINUSCULAS_ASCII)
+    # Mesmo critério do antigo LIKE 'deposito_cl%' ('_' casa qualquer caractere)
+    classe = map_cl(tipo) if tipo.startswith('deposito') and tipo[9:11] == 'cl' else ''
+    return int('deposit' in tipo), classe
+
+
+def classificar_registros(db):
+    """Recalcula as colunas de classificação de todas as viaturas e instalações (sem commit)."""
+    db.executemany(
+        'UPDATE viaturas SET is_frigo = ?, is_bau = ?, is_vte = ? WHERE id = ?',
+        [classificar_viatura(r[1], r[2]) + (r[0],)
+         for r in db.execute('SELECT id, tipo_veiculo, especializacao FROM viaturas').fetchall()]
+    )
+    db.executemany(
+        'UPDATE instalacoes SET is_deposito = ?, deposito_classe = ? WHERE id = ?',
+        [classificar_instalacao(r[1]) + (r[0],)
+         for r in db.execute('SELECT id, tipo_instalacao FROM instalacoes').fetchall()]
+    )
+
+
+# Colunas da consulta de viaturas a partir da sexta, na mesma ordem do SELECT
+_COLUNAS_BAU = [
+    'vte_total',
+    'bau_seco_total', 'bau_seco_operacional', 'bau_seco_manutencao', 'bau_seco_inoperante',
+    'bau_frigo_total', 'bau_frigo_operacional', 'bau_frigo_manutencao', 'bau_frigo_inoperante',
+]
+
+
+def _filtro_op(coluna, op_id):
+    if op_id is None:
+        return '1 = 1', ()
+    return f'{coluna} = ?', (op_id,)
+
+
+def calcular_indicadores(db, op_id=None):
+    """Agregados de um OP (ou de todos, com ``op_id=None``) a partir das tabelas base.
+
+    Cada tabela é lida uma vez: uma consulta agrupada por OP e pelas chaves dos
+    detalhamentos devolve os grupos, e os totais são somados aqui a partir
+    deles. Retorna ``{op_id: indicadores}``.
+    """
+    if op_id is None:
+        ids = [r[0] for r in db.execute('SELECT id FROM orgao_provedor').fetchall()]
+    else:
+        ids = [op_id]
+    resultado = {i: dict.fromkeys(COLUNAS_INDICADORES, 0) for i in ids}
+    situacoes = {i: {} for i in ids}
+    por_posto = {i: {} for i in ids}
+    vert = {i: {} for i in ids}
+
+    # Uma linha por instalação (em ordem de id) com as contagens de empilhadeiras,
+    # equipamentos e sistemas por situação, somadas aqui por OP; a verticalização
+    # por classe segue a ordem em que a classe aparece. Sem GROUP BY/ORDER BY
+    # externos, não há B-tree temporária e um OP só custa as buscas nos índices
+    filtro, params = _filtro_op('i.orgao_provedor_id', op_id)
+    for r in db.execute(f'''
+        SELECT i.orgao_provedor_id AS op_id, i.is_deposito, i.deposito_classe,
+               substr(LOWER(COALESCE(i.verticalizacao, '')), 1, 8) = 'vertical' AS vertical,
+               COALESCE(i.capacidade_toneladas, 0)
+                   * MAX((SELECT COUNT(*) FROM empilhadeiras e WHERE e.instalacao_id = i.id), 1) AS cap_estoque,
+               (SELECT COUNT(*) FROM equipamentos_unitizacao eq WHERE eq.instalacao_id = i.id) AS equipamentos,
+               COUNT(s.id) AS sistemas,
+               SUM(LOWER(COALESCE(s.situacao,'')) = 'operacional') AS operacional,
+               SUM(LOWER(COALESCE(s.situacao,'')) = 'em_manutencao') AS manutencao,
+               SUM(LOWER(COALESCE(s.situacao,'')) = 'inoperante') AS inoperante
+        FROM instalacoes i
+        LEFT JOIN sistemas_seguranca s ON s.instalacao_id = i.id
+        WHERE {filtro}
+        GROUP BY i.id
+        ORDER BY i.id
+    ''', params):
+        # Desempacotado por posição: o acesso por nome de sqlite3.Row compara os
+        # nomes das colunas um a um
+        op, deposito, classe, vertical, cap_estoque, equipamentos, sistemas, operacional, manutencao, inoperante = r
+        ind = resultado.get(op)
+        if ind is None:
+            continue
+        ind['instalacoes_total'] += 1
+        ind['emp_cap_estoque'] += cap_estoque
+        ind['sistemas_total'] += sistemas
+        ind['equipamentos_total'] += equipamentos
+        if deposito:
+            ind['depositos_total'] += 1
+            if sistemas:
+                ind['dep_com_sistema'] += 1
+                ind['dep_sistemas_total'] += sistemas
+                ind['dep_sis_operacional'] += operacional
+                ind['dep_sis_manutencao'] += manutencao
+                ind['dep_sis_inoperante'] += inoperante
+        if classe:
+            entry = vert[op].setdefault(classe, {'verticalizado': 0, 'nao_verticalizado': 0, 'total': 0})
+            entry['verticalizado' if vertical else 'nao_verticalizado'] += 1
+            entry['total'] += 1
+
+    filtro, params = _filtro_op('i.orgao_provedor_id', op_id)
+    for r in db.execute(f'''
+        SELECT i.orgao_provedor_id AS op_id, LOWER(COALESCE(e.situacao,'')) AS situacao,
+               COUNT(*) AS registros, COALESCE(SUM(COALESCE(e.quantidade,1)),0) AS total
+        FROM empilhadeiras e
+        JOIN instalacoes i ON i.id = e.instalacao_id
+        WHERE {filtro}
+        GROUP BY i.orgao_provedor_id, LOWER(COALESCE(e.situacao,''))
+        ORDER BY 1, 2
+    ''', params):
+        op, situacao, registros, total = r
+        if op not in resultado:
+            continue
+        resultado[op]['emp_total'] += registros
+        situacoes[op][situacao or 'indefinida'] = total or 0
+
+    filtro, params = _filtro_op('orgao_provedor_id', op_id)
+    for r in db.execute(f'''
+        SELECT orgao_provedor_id AS op_id,
+               COUNT(*) as total,
+               COALESCE(SUM(capacidade_carga_kg),0) as cap_total,
+               COALESCE(SUM(CASE WHEN is_frigo = 1 THEN capacidade_carga_kg ELSE 0 END),0) as cap_frigo,
+               COALESCE(SUM(CASE WHEN is_frigo = 1 THEN 0 ELSE capacidade_carga_kg END),0) as cap_seco,
+               SUM(is_vte) as vte_total,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 0 THEN 1 ELSE 0 END) as bau_seco_total,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 0 AND situacao = 'operacional' THEN 1 ELSE 0 END) as bau_seco_operacional,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 0 AND situacao = 'em_manutencao' THEN 1 ELSE 0 END) as bau_seco_manutencao,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 0 AND situacao IN ('inoperante','baixada') THEN 1 ELSE 0 END) as bau_seco_inoperante,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 1 THEN 1 ELSE 0 END) as bau_frigo_total,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 1 AND situacao = 'operacional' THEN 1 ELSE 0 END) as bau_frigo_operacional,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 1 AND situacao = 'em_manutencao' THEN 1 ELSE 0 END) as bau_frigo_manutencao,
+               SUM(CASE WHEN is_vte = 1 AND is_bau = 1 AND is_frigo = 1 AND situacao IN ('inoperante','baixada') THEN 1 ELSE 0 END) as bau_frigo_inoperante
+        FROM viaturas WHERE {filtro}
+        GROUP BY orgao_provedor_id
+    ''', params):
+        ind = resultado.get(r[0])
+        if ind is None:
+            continue
+        ind['viaturas_total'], ind['viaturas_cap_total'], ind['viaturas_cap_frigo'], ind['viaturas_cap_seco'] = r[1:5]
+        for chave, valor in zip(_COLUNAS_BAU, r[5:]):
+            ind[chave] = valor or 0
+
+    for r in db.execute(f'''
+        SELECT orgao_provedor_id AS op_id, posto_graduacao,
+               COUNT(*) as registros, COALESCE(SUM(quantidade),0) as total
+        FROM pessoal WHERE {filtro}
+        GROUP BY orgao_provedor_id, posto_graduacao
+        ORDER BY 1, 2
+    ''', params):
+        op, posto, registros, total = r
+        ind = resultado.get(op)
+        if ind is None:
+            continue
+        ind['pessoal_registros'] += registros
+        ind['pessoal_total'] += total
+        por_posto[op][posto or 'outro'] = total or 0
+
+    for r in db.execute(f'''
+        SELECT orgao_provedor_id AS op_id,
+               COUNT(*) as total,
+               COALESCE(SUM(capacidade_kva),0) as cap_kva,
+               SUM(CASE WHEN situacao = 'operacional' THEN 1 ELSE 0 END) as operacional,
+               SUM(CASE WHEN situacao = 'em_manutencao' THEN 1 ELSE 0 END) as manutencao,
+               SUM(CASE WHEN situacao = 'baixada' THEN 1 ELSE 0 END) as baixada
+        FROM geradores WHERE {filtro}
+        GROUP BY orgao_provedor_id
+    ''', params):
+        op, total, cap_kva, operacional, manutencao, baixada = r
+        ind = resultado.get(op)
+        if ind is None:
+            continue
+        ind['geradores_total'] = total
+        ind['geradores_cap_kva'] = cap_kva
+        ind['geradores_operacional'] = operacional or 0
+        ind['geradores_manutencao'] = manutencao or 0
+        ind['geradores_baixada'] = baixada or 0
+
+    # Último registro de energia de cada OP
+    for ind in resultado.values():
+        ind['energia_dimensionamento'] = None
+        ind['energia_capacidade_kva'] = None
+    for r in db.execute(f'''
+        SELECT orgao_provedor_id AS op_id, dimensionamento_adequado, capacidade_total_kva
+        FROM energia_eletrica e
+        WHERE {filtro}
+          AND id = (SELECT MAX(id) FROM energia_eletrica WHERE orgao_provedor_id = e.orgao_provedor_id)
+    ''', params):
+        op, dimensionamento, capacidade_kva = r
+        ind = resultado.get(op)
+        if ind is None:
+            continue
+        ind['energia_registros'] = 1
+        ind['energia_dimensionamento'] = dimensionamento
+        ind['energia_capacidade_kva'] = capacidade_kva
+
+    filtro, params = _filtro_op('id', op_id)
+    orgaos = {r['id']: r for r in db.execute(f'''
+        SELECT id, capacidade_total_toneladas_seco, consumo_frigorificados_mensal, area_edificavel_disponivel
+        FROM orgao_provedor WHERE {filtro}
+    ''', params)}
+
+    for i, ind in resultado.items():
+        ind['emp_situacoes'] = json.dumps(situacoes[i])
+        ind['pessoal_por_posto'] = json.dumps(por_posto[i])
+        ind['verticalizacao'] = json.dumps(vert[i])
+
+        orgao = orgaos.get(i)
+        cap_frigo = (orgao['capacidade_total_toneladas_seco'] or 0) if orgao else 0
+        cons_frigo = (orgao['consumo_frigorificados_mensal'] or 0) if orgao else 0
+        cobertura = (cap_frigo / cons_frigo) if cons_frigo else 0
+        ind['frigo_cap'] = cap_frigo
+        ind['frigo_consumo'] = cons_frigo
+        ind['frigo_area_disp'] = (orgao['area_edificavel_disponivel'] or 0) if orgao else 0
+        ind['frigo_cobertura'] = cobertura
+        # Déficit apenas quando existe consumo declarado e cobertura < 4 FC
+        ind['frigo_deficit'] = 1 if (cons_frigo and cobertura < COBERTURA_MIN_FRIGO) else 0
+
+    return resultado
+
+
+def _gravar_indicadores(db, indicadores_por_op):
+    colunas = ['op_id'] + COLUNAS_INDICADORES + ['atualizado_em']
+    agora = datetime.now()
+    db.executemany(
+        f"INSERT OR REPLACE INTO op_analytics ({', '.join(colunas)}) "
+        f"VALUES ({', '.join(['?'] * len(colunas))})",
+        [[op_id] + [ind[c] for c in COLUNAS_INDICADORES] + [agora] for op_id, ind in indicadores_por_op.items()]
+    )
+
+
+def atualizar_indicadores_op(db, op_id):
+    """Recalcula e grava a linha de ``op_analytics`` do OP (sem commit)."""
+    if not op_id:
+        return
+    _gravar_indicadores(db, calcular_indicadores(db, op_id))
+
+
+def remover_indicadores_op(db, op_id):
+    db.execute('DELETE FROM op_analytics WHERE op_id = ?', (op_id,))
+
+
+def reconstruir_indicadores(db):
+    """Recalcula ``op_analytics`` inteira a partir das tabelas base (sem commit)."""
+    db.execute('DELETE FROM op_analytics')
+    todos = calcular_indicadores(db)
+    _gravar_indicadores(db, todos)
+    return len(todos)
+
+
+def carregar_analiticos(db):
+    """Monta o dicionário ``analiticos`` do painel a partir de ``op_analytics``."""
+    analiticos = {
+        'empilhadeiras': {}, 'sistemas': {}, 'equipamentos': {}, 'viaturas': {},
+        'viaturas_bau': {}, 'pessoal': {}, 'pessoal_por_posto': {}, 'geradores': {},
+        'geradores_resumo': {}, 'instalacoes': {}, 'energia': {}, 'sistemas_depositos': {},
+        'verticalizacao_depositos': {}, 'verticalizacao_lista': [], 'frigo_deficit': [],
+        'empilhadeiras_situacao': {},
+    }
+    rows = db.execute('''
+        SELECT a.*, o.sigla, o.nome
+        FROM op_analytics a
+        JOIN orgao_provedor o ON o.id = a.op_id
+        ORDER BY o.data_cadastro DESC
+    ''').fetchall()
+
+    for r in rows:
+        op_id = r['op_id']
+        situacoes = json.loads(r['emp_situacoes'] or '{}')
+
+        if r['instalacoes_total']:
+            analiticos['empilhadeiras'][op_id] = {'total': r['emp_total'], 'cap_estoque': r['emp_cap_estoque'] or 0}
+            analiticos['instalacoes'][op_id] = r['instalacoes_total']
+        if r['sistemas_total']:
+            analiticos['sistemas'][op_id] = r['sistemas_total']
+        if r['equipamentos_total']:
+            analiticos['equipamentos'][op_id] = r['equipamentos_total']
+
+        if r['viaturas_total']:
+            analiticos['viaturas'][op_id] = {
+                'total': r['viaturas_total'],
+                'cap_total': r['viaturas_cap_total'],
+                'cap_frigo': r['viaturas_cap_frigo'],
+                'cap_seco': r['viaturas_cap_seco']
+            }
+        if r['vte_total']:
+            analiticos['viaturas_bau'][op_id] = {
+                'bau_seco': {
+                    'total': r['bau_seco_total'],
+                    'operacional': r['bau_seco_operacional'],
+                    'manutencao': r['bau_seco_manutencao'],
+                    'inoperante': r['bau_seco_inoperante']
+                },
+                'bau_frigo': {
+                    'total': r['bau_frigo_total'],
+                    'operacional': r['bau_frigo_operacional'],
+                    'manutencao': r['bau_frigo_manutencao'],
+                    'inoperante': r['bau_frigo_inoperante']
+                }
+            }
+
+        if r['pessoal_registros']:
+            analiticos['pessoal'][op_id] = r['pessoal_total']
+            analiticos['pessoal_por_posto'][op_id] = json.loads(r['pessoal_por_posto'] or '{}')
+
+        if r['geradores_total']:
+            analiticos['geradores'][op_id] = r['geradores_total']
+            analiticos['geradores_resumo'][op_id] = {
+                'total': r['geradores_total'],
+                'cap_kva': r['geradores_cap_kva'] or 0,
+                'operacional': r['geradores_operacional'],
+                'manutencao': r['geradores_manutencao'],
+                'baixada': r['geradores_baixada']
+            }
+
+        if r['energia_registros']:
+            analiticos['energia'][op_id] = {
+                'dimensionamento': r['energia_dimensionamento'],
+                'capacidade_kva': r['energia_capacidade_kva']
+            }
+
+        dep_total = r['depositos_total']
+        if dep_total:
+            dep_com = r['dep_com_sistema']
+            analiticos['sistemas_depositos'][op_id] = {
+                'depositos_total': dep_total,
+                'depositos_com_sistema': dep_com,
+                'depositos_sem_sistema': max(dep_total - dep_com, 0),
+                'sistemas_total': r['dep_sistemas_total'],
+                'operacional': r['dep_sis_operacional'],
+                'manutencao': r['dep_sis_manutencao'],
+                'inoperante': r['dep_sis_inoperante']
+            }
+
+        vert = json.loads(r['verticalizacao'] or '{}')
+        if vert:
+            analiticos['verticalizacao_depositos'][op_id] = vert
+            for cl_key, entry in vert.items():
+                total = entry.get('total', 0) or 0
+                vert_qtd = entry.get('verticalizado', 0) or 0
+                analiticos['verticalizacao_lista'].append({
+                    'op_id': op_id,
+                    'cl': cl_key,
+                    'total': total,
+                    'verticalizado': vert_qtd,
+                    'nao_verticalizado': entry.get('nao_verticalizado', 0) or 0,
+                    'perc': (vert_qtd * 100 / total) if total else 0
+                })
+
+        if r['frigo_deficit']:
+            analiticos['frigo_deficit'].append({
+                'id': op_id,
+                'sigla': r['sigla'] or r['nome'],
+                'cap_frigo': r['frigo_cap'],
+                'cons_frigo': r['frigo_consumo'],
+                'cobertura': r['frigo_cobertura'],
+                'area_disp': r['frigo_area_disp'],
+                'tem_area': (r['frigo_area_disp'] or 0) > 0
+            })
+
+        if situacoes or dep_total:
+            analiticos['empilhadeiras_situacao'][op_id] = {
+                'situacoes': situacoes,
+                'depositos': dep_total
+            }
+
+    # Ordena do pior atendimento para o melhor
+    analiticos['frigo_deficit'].sort(key=lambda x: x['cobertura'])
+    return analiticos
+
+
+if __name__ == '__main__':
+    import argparse
+    import database
+
+    parser = argparse.ArgumentParser(description='Manutenção da tabela op_analytics.')
+    parser.add_argument('comando', choices=['reconstruir'],
+                        help='reconstruir: reclassifica viaturas/instalações e recalcula todos os OPs')
+    parser.add_argument('--banco', default=database.DATABASE, help='Caminho do arquivo SQLite')
+    args = parser.parse_args()
+
+    conn = database.conectar(args.banco)
+    try:
+        database.migrar(conn)
+        classificar_registros(conn)
+        total = reconstruir_indicadores(conn)
+        conn.commit()
+        print(f"✓ op_analytics reconstruída para {total} OP(s)")
+    finally:
+        conn.close()
@@ -0,0 +1,118 @@
+"""Listagem paginada de OPs (paginação por chave) para o painel do admin.
+
+Cada página é lida com ``WHERE (chave, id) > (?, ?) ORDER BY chave, id LIMIT n``
+a partir do cursor devolvido na página anterior, de modo que o custo não cresce
+com a posição na lista. As expressões de ordenação são as mesmas dos índices
+criados nas migrações 8 e 10 de ``database.py``; os filtros por classe e por déficit
+frigorificado usam ``op_classe_provedor`` e ``op_analytics``.
+"""
+import base64
+import json
+import os
+
+LIMITE_PADRAO = int(os.getenv('LISTAGEM_OPS_LIMITE', '24'))
+LIMITE_MAXIMO = int(os.getenv('LISTAGEM_OPS_LIMITE_MAX', '100'))
+
+# Chave de ordenação -> (expressão SQL, direção padrão)
+ORDENACOES = {
+    'data_cadastro': ("COALESCE(o.data_cadastro, '')", 'desc'),
+    'nome': ('o.nome', 'asc'),
+    'sigla': ('o.sigla', 'asc'),
+    # Mesmo efetivo exibido: o declarado ou, sem ele, o das OMs apoiadas
+    # (``efetivo_referencia``, mantido pelo app a partir das planilhas)
+    'efetivo': ('COALESCE(NULLIF(o.efetivo_atendimento, 0), o.efetivo_referencia)', 'desc'),
+    'capacidade': ('COALESCE(o.capacidade_total_toneladas, 0)', 'desc'),
+}
+
+COLUNAS = '''o.id, o.nome, o.sigla, o.subordinacao, o.unidade_gestora, o.codom,
+             COALESCE(NULLIF(o.efetivo_atendimento, 0), o.efetivo_referencia) AS efetivo_atendimento,
+             o.capacidade_total_toneladas, o.capacidade_total_toneladas_seco, o.data_cadastro,
+             u.username AS criado_por_nome'''
+
+
+def codificar_cursor(valor, op_id):
+    texto = json.dumps([valor, op_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(valor, id) do cursor; ValueError se ele não veio de ``codificar_cursor``."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        valor, op_id = json.loads(texto)
+    except (ValueError, TypeError) as e:
+        raise ValueError('cursor inválido') from e
+    if not isinstance(op_id, int) or not isinstance(valor, (str, int, float)):
+        raise ValueError('cursor inválido')
+    return valor, op_id
+
+
+def filtros_sql(subordinacao=None, classe=None, frigo_deficit=False):
+    """(condições, parâmetros) dos filtros da listagem sobre ``orgao_provedor o``."""
+    condicoes, params = [], []
+    if subordinacao:
+        condicoes.append('o.subordinacao = ?')
+        params.append(subordinacao)
+    if classe:
+        condicoes.append('o.id IN (SELECT op_id FROM op_classe_provedor WHERE classe = ?)')
+        params.append(classe)
+    if frigo_deficit:
+        condicoes.append('o.id IN (SELECT op_id FROM op_analytics WHERE frigo_deficit = 1)')
+    return condicoes, params
+
+
+def listar_ops(db, ordem='data_cadastro', direcao=None, subordinacao=None, classe=None,
+               frigo_deficit=False, apos=None, limite=LIMITE_PADRAO):
+    """Uma página da listagem de OPs.
+
+    Retorna ``{'itens': [...], 'proximo': cursor ou None}``; na primeira página
+    (sem ``apos``) inclui também ``total`` de OPs que atendem aos filtros.
+    Levanta ValueError para ordenação, direção, limite ou cursor inválidos.
+    """
+    if ordem not in ORDENACOES:
+        raise ValueError(f'ordenação inválida: {ordem}')
+    expressao, direcao_padrao = ORDENACOES[ordem]
+    direcao = (direcao or direcao_padrao).lower()
+    if direcao not in ('asc', 'desc'):
+        raise ValueError(f'direção inválida: {direcao}')
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ValueError(f'limite deve estar entre 1 e {LIMITE_MAXIMO}')
+
+    condicoes, params = filtros_sql(subordinacao, classe, frigo_deficit)
+    resultado = {}
+    if apos is None:
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+        resultado['total'] = db.execute(f'SELECT COUNT(*) FROM orgao_provedor o {where}', params).fetchone()[0]
+
+    condicoes_pagina, params_pagina = list(condicoes), list(params)
+    if apos is not None:
+        valor, op_id = decodificar_cursor(apos)
+        comparacao = '<' if direcao == 'desc' else '>'
+        # A comparação só da chave permite ao SQLite buscar direto no índice;
+        # a comparação de tupla desempata pelo id
+        condicoes_pagina.append(f'{expressao} {comparacao}= ? AND ({expressao}, o.id) {comparacao} (?, ?)')
+        params_pagina += [valor, valor, op_id]
+    where = f"WHERE {' AND '.join(condicoes_pagina)}" if condicoes_pagina else ''
+    rows = db.execute(f'''
+        SELECT {COLUNAS}, {expressao} AS chave_ordem
+        FROM orgao_provedor o
+        LEFT JOIN usuarios u ON u.id = o.criado_por
+        {where}
+        ORDER BY {expressao} {direcao.upper()}, o.id {direcao.upper()}
+        LIMIT ?
+    ''', params_pagina + [limite + 1]).fetchall()
+
+    itens = [dict(r) for r in rows[:limite]]
+    ultimo = itens[-1] if len(rows) > limite else None
+    resultado['itens'] = [{k: v for k, v in item.items() if k != 'chave_ordem'} for item in itens]
+    resultado['proximo'] = codificar_cursor(ultimo['chave_ordem'], ultimo['id']) if ultimo else None
+    return resultado
+
+
+def opcoes_filtro(db):
+    """Valores disponíveis para os filtros de RM/subordinação e classe."""
+    return {
+        'subordinacoes': [r[0] for r in db.execute(
+            "SELECT DISTINCT subordinacao FROM orgao_provedor WHERE subordinacao != '' ORDER BY subordinacao")],
+        'classes': [r[0] for r in db.execute('SELECT DISTINCT classe FROM op_classe_provedor ORDER BY classe')],
+    }
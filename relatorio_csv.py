@@ -0,0 +1,129 @@
+"""Relatórios CSV da análise (``/analise/relatorio``) gerados em streaming.
+
+``preparar`` valida o tipo e os filtros e monta a consulta; ``gerar_csv`` lê o
+cursor em lotes de ``TAMANHO_LOTE`` linhas e devolve cada lote já formatado
+pelo módulo ``csv`` (aspas quando necessário), de modo que a memória não
+cresce com o tamanho do relatório e o cabeçalho sai antes da primeira leitura.
+
+O tipo ``geral`` tem um registro por OP, com os totais lidos de
+``op_analytics``; os demais detalham os registros de cada OP (viaturas,
+pessoal, instalações...).
+"""
+import csv
+import io
+import os
+
+import listagem_ops
+
+TAMANHO_LOTE = int(os.getenv('RELATORIO_CSV_LOTE', '500'))
+
+_COLUNAS_OP = [('op_id', 'o.id'), ('op_sigla', 'o.sigla'), ('op_nome', 'o.nome')]
+
+# tipo -> (colunas [(cabeçalho, expressão SQL)], FROM/JOIN a partir de ``orgao_provedor o``, ORDER BY)
+RELATORIOS = {
+    'geral': ([
+        ('id', 'o.id'), ('nome', 'o.nome'), ('sigla', 'o.sigla'), ('subordinacao', 'o.subordinacao'),
+        ('unidade_gestora', "COALESCE(o.unidade_gestora, '')"), ('codom', "COALESCE(o.codom, '')"),
+        ('efetivo_atendimento', 'COALESCE(o.efetivo_atendimento, 0)'),
+        ('capacidade_total_toneladas', 'COALESCE(o.capacidade_total_toneladas, 0)'),
+        ('capacidade_total_toneladas_seco', 'COALESCE(o.capacidade_total_toneladas_seco, 0)'),
+        ('consumo_secos_mensal', 'COALESCE(o.consumo_secos_mensal, 0)'),
+        ('consumo_frigorificados_mensal', 'COALESCE(o.consumo_frigorificados_mensal, 0)'),
+        ('viaturas_capacidade_kg', 'COALESCE(a.viaturas_cap_total, 0)'),
+        ('viaturas_qtd', 'COALESCE(a.viaturas_total, 0)'),
+        ('pessoal_total', 'COALESCE(a.pessoal_total, 0)'),
+        ('empilhadeiras_qtd', 'COALESCE(a.emp_total, 0)'),
+        ('data_cadastro', "COALESCE(o.data_cadastro, '')"),
+    ], 'orgao_provedor o LEFT JOIN op_analytics a ON a.op_id = o.id', 'o.nome'),
+    'viaturas': (_COLUNAS_OP + [
+        ('id', 'v.id'), ('categoria', 'v.categoria'), ('tipo_veiculo', 'v.tipo_veiculo'),
+        ('especializacao', 'v.especializacao'), ('placa', 'v.placa'), ('marca', 'v.marca'),
+        ('modelo', 'v.modelo'), ('ano_fabricacao', 'v.ano_fabricacao'),
+        ('capacidade_carga_kg', 'v.capacidade_carga_kg'), ('lotacao_pessoas', 'v.lotacao_pessoas'),
+        ('tipo_refrigeracao', 'v.tipo_refrigeracao'), ('situacao', 'v.situacao'), ('km_atual', 'v.km_atual'),
+        ('ultima_manutencao', 'v.ultima_manutencao'), ('proxima_manutencao', 'v.proxima_manutencao'),
+        ('valor_recuperacao', 'v.valor_recuperacao'), ('patrimonio', 'v.patrimonio'),
+    ], 'orgao_provedor o JOIN viaturas v ON v.orgao_provedor_id = o.id', 'o.nome, v.id'),
+    'pessoal': (_COLUNAS_OP + [
+        ('id', 'p.id'), ('posto_graduacao', 'p.posto_graduacao'), ('arma_quadro_servico', 'p.arma_quadro_servico'),
+        ('especialidade', 'p.especialidade'), ('funcao', 'p.funcao'), ('tipo_servico', 'p.tipo_servico'),
+        ('quantidade', 'p.quantidade'),
+    ], 'orgao_provedor o JOIN pessoal p ON p.orgao_provedor_id = o.id', 'o.nome, p.id'),
+    'geradores': (_COLUNAS_OP + [
+        ('id', 'g.id'), ('capacidade_kva', 'g.capacidade_kva'), ('marca_modelo', 'g.marca_modelo'),
+        ('ano_fabricacao', 'g.ano_fabricacao'), ('situacao', 'g.situacao'),
+        ('valor_recuperacao', 'g.valor_recuperacao'), ('pode_operar_24h', 'g.pode_operar_24h'),
+        ('horas_operacao_continuas', 'g.horas_operacao_continuas'),
+        ('ultima_manutencao', 'g.ultima_manutencao'), ('proxima_manutencao', 'g.proxima_manutencao'),
+    ], 'orgao_provedor o JOIN geradores g ON g.orgao_provedor_id = o.id', 'o.nome, g.id'),
+    'energia': (_COLUNAS_OP + [
+        ('id', 'en.id'), ('dimensionamento_adequado', 'en.dimensionamento_adequado'),
+        ('capacidade_total_kva', 'en.capacidade_total_kva'),
+    ], 'orgao_provedor o JOIN energia_eletrica en ON en.orgao_provedor_id = o.id', 'o.nome, en.id'),
+    'instalacoes': (_COLUNAS_OP + [
+        ('id', 'i.id'), ('tipo_instalacao', 'i.tipo_instalacao'), ('nome_identificacao', 'i.nome_identificacao'),
+        ('deposito_classe', 'i.deposito_classe'), ('tipo_cobertura', 'i.tipo_cobertura'),
+        ('capacidade_toneladas', 'i.capacidade_toneladas'), ('largura', 'i.largura'),
+        ('comprimento', 'i.comprimento'), ('altura', 'i.altura'), ('verticalizacao', 'i.verticalizacao'),
+    ], 'orgao_provedor o JOIN instalacoes i ON i.orgao_provedor_id = o.id', 'o.nome, i.id'),
+    'empilhadeiras': (_COLUNAS_OP + [
+        ('instalacao_id', 'i.id'), ('instalacao', 'i.nome_identificacao'),
+        ('id', 'e.id'), ('tipo', 'e.tipo'), ('capacidade', 'e.capacidade'), ('quantidade', 'e.quantidade'),
+        ('ano_fabricacao', 'e.ano_fabricacao'), ('situacao', 'e.situacao'),
+        ('valor_recuperacao', 'e.valor_recuperacao'),
+    ], '''orgao_provedor o JOIN instalacoes i ON i.orgao_provedor_id = o.id
+          JOIN empilhadeiras e ON e.instalacao_id = i.id''', 'o.nome, i.id, e.id'),
+    'sistemas': (_COLUNAS_OP + [
+        ('instalacao_id', 'i.id'), ('instalacao', 'i.nome_identificacao'),
+        ('id', 's.id'), ('tipo', 's.tipo'), ('situacao', 's.situacao'),
+        ('ultima_manutencao', 's.ultima_manutencao'), ('proxima_manutencao', 's.proxima_manutencao'),
+    ], '''orgao_provedor o JOIN instalacoes i ON i.orgao_provedor_id = o.id
+          JOIN sistemas_seguranca s ON s.instalacao_id = i.id''', 'o.nome, i.id, s.id'),
+    'equipamentos': (_COLUNAS_OP + [
+        ('instalacao_id', 'i.id'), ('instalacao', 'i.nome_identificacao'),
+        ('id', 'eq.id'), ('tipo', 'eq.tipo'), ('quantidade', 'eq.quantidade'),
+        ('capacidade_kg', 'eq.capacidade_kg'), ('situacao', 'eq.situacao'),
+    ], '''orgao_provedor o JOIN instalacoes i ON i.orgao_provedor_id = o.id
+          JOIN equipamentos_unitizacao eq ON eq.instalacao_id = i.id''', 'o.nome, i.id, eq.id'),
+}
+
+
+def preparar(tipo='geral', ids=None, subordinacao=None, classe=None):
+    """(cabeçalho, sql, parâmetros) do relatório; ValueError para tipo desconhecido."""
+    if tipo not in RELATORIOS:
+        raise ValueError(f'tipo de relatório inválido: {tipo}')
+    colunas, origem, ordem = RELATORIOS[tipo]
+    condicoes, params = listagem_ops.filtros_sql(subordinacao=subordinacao, classe=classe)
+    if ids:
+        condicoes.append(f"o.id IN ({', '.join(['?'] * len(ids))})")
+        params.extend(ids)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    sql = f"SELECT {', '.join(expressao for _, expressao in colunas)} FROM {origem} {where} ORDER BY {ordem}"
+    return [cabecalho for cabecalho, _ in colunas], sql, params
+
+
+def gerar_csv(db, cabecalho, sql, params=(), tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Gera o CSV em pedaços de texto: o cabeçalho e depois um pedaço por lote do cursor.
+
+    ``progresso(linhas)``, se informado, é chamado após cada lote.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(cabecalho)
+    yield buffer.getvalue()
+    cursor = db.execute(sql, params)
+    linhas = 0
+    try:
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(lote)
+            linhas += len(lote)
+            if progresso:
+                progresso(linhas)
+            yield buffer.getvalue()
+    finally:
+        cursor.close()
@@ -0,0 +1,354 @@
+"""Tarefas em segundo plano para exportações pesadas e backups (``/admin/jobs``).
+
+``ExecutorTarefas`` enfileira a geração num pool de threads do próprio worker
+(``TAREFAS_WORKERS``), cada tarefa com conexão SQLite própria, e responde na
+hora com o id. O estado (pendente, executando, concluida, erro) e o progresso
+ficam num JSON por tarefa em ``TAREFAS_DIR``, de modo que qualquer worker do
+gunicorn atende o acompanhamento e o download.
+
+O resultado das exportações é gravado em ``TAREFAS_DIR/resultados`` com nome
+derivado do tipo, dos parâmetros e da versão dos dados
+(``database.versao_dados``, lida na mesma transação de leitura da exportação):
+um pedido idêntico sem escrita no meio é servido do arquivo já gerado. Backups
+não usam esse cache. Estados e resultados mais antigos que
+``TAREFAS_RETENCAO_HORAS`` são apagados ao enfileirar novas tarefas.
+
+Novos tipos são registrados com ``@tipo_tarefa``.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import backup_banco
+import database
+import exportacao_xlsx
+import relatorio_csv
+
+TAREFAS_DIR = os.getenv('TAREFAS_DIR', os.path.join(tempfile.gettempdir(), 'op_tarefas'))
+TAREFAS_WORKERS = int(os.getenv('TAREFAS_WORKERS', '2'))
+TAREFAS_RETENCAO_HORAS = float(os.getenv('TAREFAS_RETENCAO_HORAS', '24'))
+# Intervalo mínimo (s) entre gravações do progresso e entre limpezas do diretório
+INTERVALO_PROGRESSO = 0.5
+INTERVALO_LIMPEZA = 600
+
+ESTADOS_ATIVOS = ('pendente', 'executando')
+_ID_VALIDO = re.compile(r'[0-9a-f]{32}')
+
+
+class TipoTarefa:
+    """Tipo registrado: ``gerar(db, parametros, destino, progresso)`` grava o resultado em ``destino``.
+
+    ``validar(parametros)`` devolve os parâmetros normalizados (ou levanta
+    ValueError); ``prefixo`` é o início do nome do arquivo baixado, texto ou
+    função dos parâmetros.
+    """
+
+    def __init__(self, nome, gerar, extensao, mimetype, prefixo, validar, cache=True):
+        self.nome = nome
+        self.gerar = gerar
+        self.extensao = extensao
+        self.mimetype = mimetype
+        self.prefixo = prefixo
+        self.validar = validar
+        self.cache = cache
+
+    def nome_arquivo(self, parametros, momento):
+        prefixo = self.prefixo(parametros) if callable(self.prefixo) else self.prefixo
+        return f"{prefixo}_{momento.strftime('%Y%m%d_%H%M%S')}{self.extensao}"
+
+
+TIPOS = {}
+
+
+def tipo_tarefa(nome, extensao, mimetype, prefixo, validar, cache=True):
+    """Decorador que registra a função geradora como tipo de tarefa ``nome``."""
+    def decorador(gerar):
+        TIPOS[nome] = TipoTarefa(nome, gerar, extensao, mimetype, prefixo, validar, cache)
+        return gerar
+    return decorador
+
+
+def _sem_parametros(parametros):
+    return {}
+
+
+@tipo_tarefa('viaturas_xlsx', '.xlsx', exportacao_xlsx.MIMETYPE, 'relatorio_viaturas', _sem_parametros)
+def _gerar_viaturas_xlsx(db, parametros, destino, progresso):
+    exportacao_xlsx.gerar_xlsx(db, [('Viaturas', exportacao_xlsx.CONSULTA_VIATURAS, ())], destino,
+                               progresso=progresso)
+
+
+@tipo_tarefa('empilhadeiras_xlsx', '.xlsx', exportacao_xlsx.MIMETYPE, 'relatorio_empilhadeiras', _sem_parametros)
+def _gerar_empilhadeiras_xlsx(db, parametros, destino, progresso):
+    exportacao_xlsx.gerar_xlsx(db, [('Empilhadeiras', exportacao_xlsx.CONSULTA_EMPILHADEIRAS, ())], destino,
+                               progresso=progresso)
+
+
+def _ids_op(parametros):
+    ids = parametros.get('ids') or []
+    if isinstance(ids, str):
+        ids = [i for i in ids.split(',') if i.strip()]
+    try:
+        return sorted({int(i) for i in ids})
+    except (TypeError, ValueError):
+        raise ValueError('ids deve ser uma lista de ids de OP')
+
+
+def _validar_ops_xlsx(parametros):
+    return {'ids': _ids_op(parametros), 'subordinacao': parametros.get('subordinacao') or None}
+
+
+@tipo_tarefa('ops_xlsx', '.xlsx', exportacao_xlsx.MIMETYPE, 'relatorio_ops', _validar_ops_xlsx)
+def _gerar_ops_xlsx(db, parametros, destino, progresso):
+    exportacao_xlsx.gerar_xlsx_paralelo(db, exportacao_xlsx.consultas_op(**parametros), destino, progresso=progresso)
+
+
+def _validar_relatorio_csv(parametros):
+    normalizados = {
+        'tipo': parametros.get('tipo') or 'geral',
+        'ids': _ids_op(parametros),
+        'subordinacao': parametros.get('subordinacao') or None,
+        'classe': parametros.get('classe') or None,
+    }
+    relatorio_csv.preparar(**normalizados)
+    return normalizados
+
+
+def _prefixo_relatorio_csv(parametros):
+    tipo = parametros['tipo']
+    return 'relatorio_analise' if tipo == 'geral' else f'relatorio_analise_{tipo}'
+
+
+@tipo_tarefa('relatorio_csv', '.csv', 'text/csv', _prefixo_relatorio_csv, _validar_relatorio_csv)
+def _gerar_relatorio_csv(db, parametros, destino, progresso):
+    cabecalho, sql, params = relatorio_csv.preparar(**parametros)
+    total = db.execute(f'SELECT COUNT(*) FROM ({sql})', params).fetchone()[0]
+    with open(destino, 'w', newline='', encoding='utf-8') as arquivo:
+        for pedaco in relatorio_csv.gerar_csv(db, cabecalho, sql, params, progresso=lambda n: progresso(n, total)):
+            arquivo.write(pedaco)
+
+
+@tipo_tarefa('backup', backup_banco.EXTENSAO, backup_banco.MIMETYPE, 'backup_op', _sem_parametros, cache=False)
+def _gerar_backup(db, parametros, destino, progresso):
+    backup_banco.gerar_arquivo(db, destino)
+
+
+def chave_resultado(tipo, parametros, versao):
+    """Nome do resultado em cache: muda com o tipo, os parâmetros ou a versão dos dados."""
+    conteudo = json.dumps([tipo, parametros, versao], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _agora():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ExecutorTarefas:
+    """Fila de tarefas do worker: pool de threads criado no primeiro envio (também após fork)."""
+
+    def __init__(self, diretorio=TAREFAS_DIR, workers=TAREFAS_WORKERS, retencao_horas=TAREFAS_RETENCAO_HORAS):
+        self.diretorio = os.path.abspath(diretorio)
+        self.dir_estados = os.path.join(self.diretorio, 'tarefas')
+        self.dir_resultados = os.path.join(self.diretorio, 'resultados')
+        self.workers = workers
+        self.retencao = retencao_horas * 3600
+        self._lock = threading.Lock()
+        self._pool = None
+        self._em_andamento = {}
+        self._ativas = 0
+        self._proxima_limpeza = 0.0
+        self._stats = {'enfileiradas': 0, 'concluidas': 0, 'do_cache': 0, 'falhas': 0, 'ultimo_erro': None}
+
+    def reiniciar_apos_fork(self):
+        # As threads do pool não existem no processo filho
+        self._lock = threading.Lock()
+        self._pool = None
+        self._em_andamento = {}
+        self._ativas = 0
+
+    # --- estado em disco ---
+
+    def _caminho_estado(self, tarefa_id):
+        return os.path.join(self.dir_estados, f'{tarefa_id}.json')
+
+    def _gravar(self, tarefa):
+        caminho = self._caminho_estado(tarefa['id'])
+        temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(tarefa, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def obter(self, tarefa_id):
+        """Estado da tarefa (dict) ou None se o id não existe."""
+        if not _ID_VALIDO.fullmatch(tarefa_id or ''):
+            return None
+        try:
+            with open(self._caminho_estado(tarefa_id), encoding='utf-8') as arquivo:
+                tarefa = json.load(arquivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if tarefa['estado'] in ESTADOS_ATIVOS and not _processo_vivo(tarefa['pid']):
+            tarefa.update(estado='erro', erro='Tarefa interrompida: o processo que a executava foi encerrado.')
+        return tarefa
+
+    def arquivo_resultado(self, tarefa):
+        """Caminho do resultado de uma tarefa concluída, ou None se não está (mais) disponível."""
+        if tarefa['estado'] != 'concluida' or not tarefa.get('resultado'):
+            return None
+        caminho = os.path.join(self.dir_resultados, tarefa['resultado'])
+        return caminho if os.path.exists(caminho) else None
+
+    # --- envio e execução ---
+
+    def enviar(self, tipo, parametros, db, usuario=None):
+        """Valida e enfileira uma tarefa; devolve o estado inicial (já concluída se veio do cache).
+
+        ValueError para tipo ou parâmetros inválidos.
+        """
+        if tipo not in TIPOS:
+            raise ValueError(f'tipo de tarefa inválido: {tipo}')
+        definicao = TIPOS[tipo]
+        parametros = definicao.validar(parametros or {})
+        os.makedirs(self.dir_estados, exist_ok=True)
+        os.makedirs(self.dir_resultados, exist_ok=True)
+        self.limpar()
+
+        tarefa = {
+            'id': uuid.uuid4().hex, 'tipo': tipo, 'parametros': parametros, 'estado': 'pendente',
+            'progresso': None, 'criado_em': _agora(), 'iniciado_em': None, 'concluido_em': None,
+            'usuario': usuario, 'resultado': None, 'arquivo': None, 'do_cache': False, 'erro': None,
+            'pid': os.getpid(),
+        }
+        chave = None
+        if definicao.cache:
+            chave = chave_resultado(tipo, parametros, database.versao_dados(db))
+            resultado = chave + definicao.extensao
+            caminho = os.path.join(self.dir_resultados, resultado)
+            if os.path.exists(caminho):
+                os.utime(caminho)  # a retenção conta a partir do último uso
+                tarefa.update(estado='concluida', concluido_em=tarefa['criado_em'], resultado=resultado,
+                              arquivo=definicao.nome_arquivo(parametros, datetime.now()), do_cache=True)
+                self._gravar(tarefa)
+                self._stats['do_cache'] += 1
+                return tarefa
+
+        with self._lock:
+            if chave is not None and chave in self._em_andamento:
+                existente = self.obter(self._em_andamento[chave])
+                if existente and existente['estado'] in ESTADOS_ATIVOS:
+                    return existente
+            self._gravar(tarefa)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tarefa')
+            if chave is not None:
+                self._em_andamento[chave] = tarefa['id']
+            self._ativas += 1
+            self._pool.submit(self._executar, dict(tarefa), chave)
+        self._stats['enfileiradas'] += 1
+        return tarefa
+
+    def _executar(self, tarefa, chave):
+        definicao = TIPOS[tarefa['tipo']]
+        inicio = time.perf_counter()
+        conn = None
+        temporario = None
+        try:
+            tarefa.update(estado='executando', iniciado_em=_agora())
+            self._gravar(tarefa)
+            conn = database.conectar()
+            if definicao.cache:
+                # Versão e dados lidos no mesmo snapshot: o arquivo corresponde à versão do nome
+                conn.execute('BEGIN')
+                resultado = chave_resultado(tarefa['tipo'], tarefa['parametros'], database.versao_dados(conn))
+                resultado += definicao.extensao
+            else:
+                resultado = tarefa['id'] + definicao.extensao
+            final = os.path.join(self.dir_resultados, resultado)
+            if not os.path.exists(final):
+                temporario = f"{final}.{tarefa['id']}.tmp"
+                definicao.gerar(conn, tarefa['parametros'], temporario, self._progresso(tarefa))
+                os.replace(temporario, final)
+                temporario = None
+            if conn.in_transaction:
+                conn.rollback()
+            tarefa.update(estado='concluida', concluido_em=_agora(), resultado=resultado,
+                          arquivo=definicao.nome_arquivo(tarefa['parametros'], datetime.now()))
+            self._gravar(tarefa)
+            self._stats['concluidas'] += 1
+            print(f"✓ Tarefa {tarefa['tipo']} {tarefa['id']} concluída em "
+                  f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+        except Exception as e:
+            self._stats['falhas'] += 1
+            self._stats['ultimo_erro'] = str(e)
+            print(f"✗ Falha na tarefa {tarefa['tipo']} {tarefa['id']}: {e}")
+            tarefa.update(estado='erro', concluido_em=_agora(), erro=str(e))
+            try:
+                self._gravar(tarefa)
+            except OSError:
+                pass
+            if temporario and os.path.exists(temporario):
+                os.remove(temporario)
+        finally:
+            if conn is not None:
+                conn.close()
+            with self._lock:
+                self._ativas -= 1
+                if chave is not None and self._em_andamento.get(chave) == tarefa['id']:
+                    del self._em_andamento[chave]
+
+    def _progresso(self, tarefa):
+        ultima = [0.0]
+
+        def registrar(feito, total=None):
+            agora = time.monotonic()
+            if agora - ultima[0] < INTERVALO_PROGRESSO:
+                return
+            ultima[0] = agora
+            percentual = round(100 * feito / total, 1) if total else None
+            tarefa['progresso'] = {'feito': feito, 'total': total, 'percentual': percentual}
+            self._gravar(tarefa)
+        return registrar
+
+    # --- manutenção ---
+
+    def limpar(self, forcar=False):
+        """Apaga estados e resultados mais antigos que a retenção; retorna quantos arquivos removeu."""
+        agora = time.monotonic()
+        if not forcar and agora < self._proxima_limpeza:
+            return 0
+        self._proxima_limpeza = agora + INTERVALO_LIMPEZA
+        limite = time.time() - self.retencao
+        removidos = 0
+        for pasta in (self.dir_estados, self.dir_resultados):
+            try:
+                entradas = list(os.scandir(pasta))
+            except FileNotFoundError:
+                continue
+            for entrada in entradas:
+                try:
+                    if entrada.is_file() and entrada.stat().st_mtime < limite:
+                        os.remove(entrada.path)
+                        removidos += 1
+                except OSError:
+                    pass
+        return removidos
+
+    def estatisticas(self):
+        return dict(self._stats, workers=self.workers, em_andamento=self._ativas, diretorio=self.diretorio)
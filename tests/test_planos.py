@@ -0,0 +1,28 @@
+"""As consultas quentes (``database.CONSULTAS_QUENTES``) precisam usar índice.
+
+Mesma verificação de ``python database.py planos``: falha quando alguma delas
+cai numa varredura completa de tabela (SCAN sem índice) no schema produzido
+pelas migrações. O banco é novo, para o plano não depender dos dados (em
+tabelas quase vazias o SQLite prefere varrer mesmo havendo índice).
+"""
+import pytest
+
+import database
+
+
+@pytest.fixture(scope='module')
+def banco(tmp_path_factory):
+    conn = database.conectar(str(tmp_path_factory.mktemp('planos') / 'database.db'))
+    database.migrar(conn)
+    yield conn
+    conn.close()
+
+
+def test_schema_migrado(banco):
+    assert database.versao_schema(banco) == database.versao_mais_recente()
+
+
+@pytest.mark.parametrize('consulta', database.CONSULTAS_QUENTES, ids=[c[0] for c in database.CONSULTAS_QUENTES])
+def test_consulta_quente_usa_indice(banco, consulta):
+    [(descricao, detalhes, ok)] = database.verificar_planos(banco, [consulta])
+    assert ok, f"{descricao} faz varredura completa: {' | '.join(detalhes)}"